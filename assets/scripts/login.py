@@ -1,42 +1,29 @@
-import uiautomator2 as u2
 import pyotp
 import time
 import sys
 import os
-import yaml
-import threading
+from utils import progress, session
+from utils.config import get_config_store
 
-# --- Thread-safe Account Management Logic (Self-contained) ---
+# --- Account Management Logic ---
 
-# Global lock to prevent race conditions when multiple scripts access the config file.
-config_lock = threading.Lock()
-
-def get_config_path():
-    """Determines the correct path to config.yaml, whether in dev or bundled."""
-    # This logic ensures the script can find config.yaml from the project root
-    # whether it's run directly or as part of a PyInstaller bundle.
-    if hasattr(sys, '_MEIPASS'):
-        # In bundled app, the base directory is the one containing the executable
-        base_dir = os.path.dirname(sys.executable)
-    else:
-        # In development, go up two levels from /assets/scripts/ to project root
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    return os.path.join(base_dir, 'assets', 'scripts', 'config.yaml')
+# config.yaml is shared with the app and with other login runs. The store
+# serializes writers with an OS file lock and replaces the file atomically.
+config_store = get_config_store()
 
 def get_first_account_without_ip():
     """
     Finds the first account without device_ip (3 parts only) from config.yaml.
     Returns tuple: (account_dict, account_index) or (None, None) if no account found.
     """
-    config_file = get_config_path()
+    config_file = config_store.path
     
     if not os.path.exists(config_file):
         print(f"[LoginScript] CRITICAL: config.yaml not found at {config_file}")
         return None, None
 
     try:
-        with open(config_file, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        config = config_store.load()
     except Exception as e:
         print(f"[LoginScript] CRITICAL: Failed to read or parse config.yaml: {e}")
         return None, None
@@ -69,70 +56,17 @@ def get_first_account_without_ip():
     print("[LoginScript] No accounts without IP found.")
     return None, None
 
-def setup_uiautomator2(device_ip):
-    """
-    Setup UIAutomator2 on the device if not already installed.
-    """
-    try:
-        print(f"[{device_ip}] Checking UIAutomator2 setup...")
-        d = u2.connect(device_ip)
-        d.info  # Test connection
-        print(f"[{device_ip}] UIAutomator2 is already set up and working.")
-        return True
-    except Exception as e:
-        print(f"[{device_ip}] UIAutomator2 setup needed: {e}")
-        try:
-            print(f"[{device_ip}] Installing UIAutomator2...")
-            d = u2.connect(device_ip)
-            d.uiautomator.start()
-            print(f"[{device_ip}] UIAutomator2 setup completed.")
-            return True
-        except Exception as setup_error:
-            print(f"[{device_ip}] Failed to setup UIAutomator2: {setup_error}")
-            return False
-
 def mark_account_with_ip(account_index, device_ip):
     """
     Mark an account at the given index with device_ip after successful login.
-    Uses file-based lock for thread safety.
+    The read-modify-write runs as one locked, atomic config transaction.
     """
-    config_file = get_config_path()
-    lock_file = config_file + ".lock"
-    
-    # --- Acquire Lock ---
-    timeout = 30  # seconds to wait for the lock
-    start_time = time.time()
-    while True:
-        try:
-            # Atomically create the lock file. Fails if it already exists.
-            lock_fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
-            os.close(lock_fd)
-            break # Lock acquired
-        except FileExistsError:
-            if time.time() - start_time > timeout:
-                print(f"[LoginScript] CRITICAL: Timed out waiting for lock file {lock_file}.")
-                # As a fallback, try to remove a potentially stale lock file.
-                try:
-                    os.remove(lock_file)
-                    print("[LoginScript] Removed stale lock file.")
-                except OSError as e:
-                    print(f"[LoginScript] CRITICAL: Could not remove stale lock file: {e}")
-                return False # Could not acquire lock
-            time.sleep(0.2) # Wait before retrying
-
-    try:
-        # --- Safely Modify Config ---
-        if not os.path.exists(config_file):
-            print(f"[LoginScript] CRITICAL: config.yaml not found at {config_file}")
-            return False
-
-        try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-        except Exception as e:
-            print(f"[LoginScript] CRITICAL: Failed to read or parse config.yaml: {e}")
-            return False
+    config_file = config_store.path
+    if not os.path.exists(config_file):
+        print(f"[LoginScript] CRITICAL: config.yaml not found at {config_file}")
+        return False
 
+    def mark(config):
         if (not config 
             or 'login.py' not in config 
             or 'ACCOUNTS' not in config['login.py'] 
@@ -150,24 +84,16 @@ def mark_account_with_ip(account_index, device_ip):
             updated_account_string = f"{user}|{pwd}|{secret}|{device_ip}"
             config['login.py']['ACCOUNTS'][account_index] = updated_account_string
             print(f"[LoginScript] Marked account {user} with IP {device_ip}")
+            return True
         else:
             print(f"[LoginScript] Account at index {account_index} already has IP or is malformed.")
             return False
 
-        try:
-            with open(config_file, 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
-            return True
-        except Exception as e:
-            print(f"[LoginScript] CRITICAL: Failed to write updated config.yaml: {e}")
-            return False
-
-    finally:
-        # --- Release Lock ---
-        try:
-            os.remove(lock_file)
-        except OSError as e:
-            print(f"[LoginScript] WARNING: Could not remove lock file {lock_file}: {e}")
+    try:
+        return config_store.update(mark)
+    except Exception as e:
+        print(f"[LoginScript] CRITICAL: Failed to write updated config.yaml: {e}")
+        return False
 
 # --- Main Login Logic ---
 
@@ -177,14 +103,23 @@ def login_instagram(device_ip):
     Only marks the account with IP if login is successful.
     device_ip: IP of the Android device.
     """
+    progress.phase("account")
     account, account_index = get_first_account_without_ip()
     if not account:
         print(f"[{device_ip}] Could not get an account. Exiting.")
         return False
 
-    # Setup UIAutomator2 if needed
-    if not setup_uiautomator2(device_ip):
-        print(f"[{device_ip}] Could not setup UIAutomator2. Exiting.")
+    # Connect to the Android device. The app usually keeps a uiautomator2
+    # session warm for it; otherwise this retries with backoff.
+    progress.phase("setup")
+    print(f"[{device_ip}] Connecting to device...")
+    try:
+        d = session.connect(device_ip)
+    except Exception as conn_error:
+        print(f"[{device_ip}] Failed to connect: {conn_error}. Please check:")
+        print(f"[{device_ip}] 1. Device is connected via ADB")
+        print(f"[{device_ip}] 2. UIAutomator2 is installed on device")
+        print(f"[{device_ip}] 3. Network connection is stable")
         return False
 
     try:
@@ -193,30 +128,8 @@ def login_instagram(device_ip):
         password = account['pass']
         secret_code = account['secret']
         
-        # Connect to the Android device with retry logic
-        print(f"[{device_ip}] Connecting to device...")
-        d = None
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                d = u2.connect(device_ip)
-                # Test connection by getting device info
-                device_info = d.info
-                print(f"[{device_ip}] Connected to device: {device_info.get('productName', 'Unknown')}")
-                break
-            except Exception as conn_error:
-                print(f"[{device_ip}] Connection attempt {attempt + 1}/{max_retries} failed: {conn_error}")
-                if attempt < max_retries - 1:
-                    print(f"[{device_ip}] Retrying in 3 seconds...")
-                    time.sleep(3)
-                else:
-                    print(f"[{device_ip}] Failed to connect after {max_retries} attempts. Please check:")
-                    print(f"[{device_ip}] 1. Device is connected via ADB")
-                    print(f"[{device_ip}] 2. UIAutomator2 is installed on device")
-                    print(f"[{device_ip}] 3. Network connection is stable")
-                    return False
-        
         # Open Instagram URL
+        progress.phase("login")
         print(f"[{device_ip}] Opening Instagram")
         d.open_url("https://instagram.com")
         time.sleep(3)
@@ -265,6 +178,7 @@ def login_instagram(device_ip):
         auth_prompt = d(description="Go to your authentication app")
         if auth_prompt.wait(timeout=15):
             print(f"[{device_ip}] Reached 2FA screen.")
+            progress.phase("2fa")
             
             # Generate and enter 2FA code
             totp = pyotp.TOTP(secret_code)
@@ -331,10 +245,13 @@ def main(device_id):
         success = login_instagram(device_id)
         if success:
             print(f"--- RESULT: Login Succeeded for {device_id} ---")
+            progress.result("ok", "Login succeeded")
         else:
             print(f"--- RESULT: Login Failed for {device_id} ---")
+            progress.result("login_failed", "Login failed")
     except Exception as e:
         print(f"--- An error occurred in main: {e} ---")
+        progress.result("error", str(e))
 
 if __name__ == "__main__":
     """
@@ -5,18 +5,17 @@ if hasattr(sys, '_MEIPASS'):
 else:
     BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 
-import uiautomator2 as u2
 import time
 import random
-import yaml
+from utils import hierarchy, progress, session
+from utils.config import load_params
 
 # ===================================================================
 # LOAD PARAMETERS FROM CONFIG.YAML
 # ===================================================================
-config_path = os.path.join(BASE_DIR, "assets/scripts/config.yaml")
-with open(config_path, "r", encoding="utf-8") as f:
-    config = yaml.safe_load(f)
-params = config.get(os.path.basename(__file__), {})
+# The controller passes this script's section along with the job; run
+# standalone, it is read from the file.
+params = load_params(__file__)
 
 MIN_WATCH_TIME_S = params.get("MIN_WATCH_TIME_S", 4.0)
 MAX_WATCH_TIME_S = params.get("MAX_WATCH_TIME_S", 8.0)
@@ -40,10 +39,12 @@ def main(device_id):
 
     try:
         # Connect to the device
-        d = u2.connect(device_id)
+        progress.phase("connect")
+        d = session.connect(device_id)
         #package_name = "com.instagram.android"
 
         # Launch Instagram
+        progress.phase("navigate")
         print(f"[{device_id}] Opening Instagram...")
         #d.app_start(package_name, stop=True)
         d.open_url("https://www.instagram.com/")
@@ -53,6 +54,7 @@ def main(device_id):
         reels_tab_selector = d(description="Reels")
         if not reels_tab_selector.wait(timeout=20.0):
             print(f"[{device_id}] ERROR: Reels tab not found. Stopping script.")
+            progress.result("reels_tab_not_found", "Reels tab not found")
             return
         reels_tab_selector.click()
         time.sleep(3) # Wait for the first video to load
@@ -63,13 +65,19 @@ def main(device_id):
         start_y = int(height * 0.8)
         end_y = int(height * 0.2)
 
+        # One hierarchy dump answers the checks of a video; see utils/hierarchy.py
+        screen = hierarchy.Screen(d)
+
         # Start the limited scroll loop
+        progress.phase("videos")
         print(f"[{device_id}] Starting scroll loop for {VIDEOS_TO_SCROLL} videos...")
         for i in range(VIDEOS_TO_SCROLL):
             print(f"[{device_id}] Video {i + 1}/{VIDEOS_TO_SCROLL}...")
+            progress.step(i + 1, VIDEOS_TO_SCROLL, "Video")
+            screen.invalidate()  # a new video is on screen
 
             #Check for ads before performing any actions
-            if d(description="Sponsored").exists:
+            if screen.exists(description="Sponsored"):
                 print(f"[{device_id}] -> Ad detected, skipping.")
                 d.swipe(start_x, start_y, start_x, end_y, duration=0.5)
                 time.sleep(random.uniform(1, 2))
@@ -83,13 +91,12 @@ def main(device_id):
             # 2. Follow action
             if random.randint(1, 100) <= FOLLOW_CHANCE_PERCENT:
                 try:
-                    follow_button = d(text="Follow")
-                    if follow_button.exists:
-                        follow_button.click()
+                    # Still the snapshot of the Sponsored check: a like does not touch the Follow button.
+                    if screen.click(text="Follow"):
                         time.sleep(1.5) # Wait for potential pop-up
 
                         # If collaborator pop-up appears, press back
-                        if d(resourceId="com.instagram.android:id/layout_container_bottom_sheet").exists:
+                        if screen.exists(resourceId="com.instagram.android:id/layout_container_bottom_sheet"):
                             d.press("back")
                 except Exception:
                     pass
@@ -132,11 +139,14 @@ def main(device_id):
             time.sleep(random.uniform(1, 2))
 
         print(f"[{device_id}] Scroll target of {VIDEOS_TO_SCROLL} videos reached.")
+        progress.result("ok")
 
     except KeyboardInterrupt:
         print(f"[{device_id}] Script stopped by user.")
+        progress.result("stopped", "Script stopped by user")
     except Exception as e:
         print(f"[{device_id}] An unexpected error occurred: {e}")
+        progress.result("error", str(e))
     finally:
         print(f"[{device_id}] Script finished.")
 
@@ -1,10 +1,10 @@
-import uiautomator2 as u2
 import sys
 import time
 import random
 import itertools
-import yaml
 import os
+from utils import hierarchy, progress, session
+from utils.config import load_params
 
 # ===================================================================
 # DEFINE BASE_DIR
@@ -19,10 +19,9 @@ else:
 # ===================================================================
 # LOAD PARAMETERS FROM CONFIG.YAML
 # ===================================================================
-config_path = os.path.join(BASE_DIR, "assets/scripts/config.yaml")
-with open(config_path, "r", encoding="utf-8") as f:
-    config = yaml.safe_load(f)
-params = config.get(os.path.basename(__file__), {})
+# The controller passes this script's section along with the job; run
+# standalone, it is read from the file.
+params = load_params(__file__)
 
 SEARCH_KEYWORD = params.get("SEARCH_KEYWORD", "bitcoin")
 MIN_WATCH_TIME_S = params.get("MIN_WATCH_TIME_S", 4.0)
@@ -45,7 +44,9 @@ def main(device_id):
     print(f"[{device_id}] Starting Instagram 'Search & Reel' script for keyword: '{SEARCH_KEYWORD}'")
 
     try:
-        d = u2.connect(device_id)
+        progress.phase("connect")
+        d = session.connect(device_id)
+        progress.phase("navigate")
         d.open_url("https://www.instagram.com/")
 
         print(f"[{device_id}] Navigating to search...")
@@ -60,6 +61,7 @@ def main(device_id):
         reels_search_tab = d(text="Reels")
         if not reels_search_tab.exists:
             print(f"[{device_id}] ERROR: 'Reels' tab not found in search results.")
+            progress.result("reels_tab_not_found", "'Reels' tab not found in search results")
             return
         reels_search_tab.click()
         time.sleep(3)
@@ -72,11 +74,17 @@ def main(device_id):
         # Create an iterator that cycles through the comment list endlessly
         comment_cycler = itertools.cycle(COMMENT_LIST)
 
+        # One hierarchy dump answers the checks of a video; see utils/hierarchy.py
+        screen = hierarchy.Screen(d)
+
+        progress.phase("videos")
         print(f"[{device_id}] Starting action loop for {VIDEOS_TO_SCROLL} videos...")
         for i in range(VIDEOS_TO_SCROLL):
             print(f"[{device_id}] Video {i + 1}/{VIDEOS_TO_SCROLL}...")
+            progress.step(i + 1, VIDEOS_TO_SCROLL, "Video")
+            screen.invalidate()  # a new video is on screen
 
-            if d(description="Sponsored").exists:
+            if screen.exists(description="Sponsored"):
                 print(f"[{device_id}] -> Ad detected, skipping.")
                 d.swipe(width / 2, height * 0.8, width / 2, height * 0.2, 0.5)
                 time.sleep(1.5)
@@ -87,10 +95,10 @@ def main(device_id):
 
             if random.randint(1, 100) <= FOLLOW_CHANCE_PERCENT:
                 try:
-                    if d(text="Follow").exists:
-                        d(text="Follow").click()
+                    # Still the snapshot of the Sponsored check: a like does not touch the Follow button.
+                    if screen.click(text="Follow"):
                         time.sleep(1.5)
-                        if d(resourceId="com.instagram.android:id/layout_container_bottom_sheet").exists:
+                        if screen.exists(resourceId="com.instagram.android:id/layout_container_bottom_sheet"):
                             d.press("back")
                 except Exception:
                     pass
@@ -120,11 +128,14 @@ def main(device_id):
             time.sleep(random.uniform(1, 2))
 
         print(f"[{device_id}] Action loop finished after {VIDEOS_TO_SCROLL} videos.")
+        progress.result("ok")
 
     except KeyboardInterrupt:
         print(f"[{device_id}] Script stopped by user.")
+        progress.result("stopped", "Script stopped by user")
     except Exception as e:
         print(f"[{device_id}] An unexpected error occurred: {e}")
+        progress.result("error", str(e))
     finally:
         print(f"[{device_id}] Script finished.")
 
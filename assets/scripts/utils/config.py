@@ -0,0 +1,43 @@
+import json
+import os
+import sys
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# The controller passes the script's already parsed config section in this
+# environment variable, so a run does not have to re-read config.yaml.
+PARAMS_ENV = "AUTOPILOT_SCRIPT_PARAMS"
+
+if hasattr(sys, '_MEIPASS'):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+def get_config_path():
+    """Determines the correct path to config.yaml, whether in dev or bundled."""
+    return os.path.join(BASE_DIR, 'assets', 'scripts', 'config.yaml')
+
+def get_config_store():
+    """
+    Returns the ConfigStore shared with the app (src/config_store.py), for
+    scripts that write to config.yaml. It locks and commits atomically.
+    """
+    if BASE_DIR not in sys.path:
+        # Run standalone, only assets/scripts is on the path.
+        sys.path.insert(0, BASE_DIR)
+    from src.config_store import ConfigStore
+    return ConfigStore(get_config_path())
+
+def load_params(script_file):
+    """Returns the config section of the script at `script_file`."""
+    raw = os.environ.get(PARAMS_ENV)
+    if raw is not None:
+        return json.loads(raw)
+    with open(get_config_path(), "r", encoding="utf-8") as f:
+        config = yaml.load(f, Loader=SafeLoader) or {}
+    return config.get(os.path.basename(script_file), {})
@@ -0,0 +1,221 @@
+"""
+Selector queries answered from one UI hierarchy dump.
+
+Every `d(...).exists` is a round trip to the on-device server. A `Screen`
+takes one `dump_hierarchy()` instead, parses it into an indexed tree and
+answers any number of selector queries locally, with the same keyword
+arguments as uiautomator2 selectors. The snapshot stays until it is
+invalidated, so call `invalidate()` after anything that changes the screen
+(a swipe, a key press, a tap through `d`). `screen.click(...)` does so itself.
+
+    from utils import hierarchy
+    screen = hierarchy.Screen(d)
+    if screen.exists(description="Sponsored"):
+        ...
+    if screen.click(text="Follow"):
+        time.sleep(1.5)
+        if screen.exists(resourceId="com.instagram.android:id/layout_container_bottom_sheet"):
+            d.press("back")
+    d.swipe(...)
+    screen.invalidate()
+"""
+import re
+import time
+import xml.etree.ElementTree as ET
+
+# Selector keyword -> dump attribute, for the string matchers
+_FIELDS = {
+    "text": "text",
+    "description": "content-desc",
+    "resourceId": "resource-id",
+    "className": "class",
+    "packageName": "package",
+}
+_STRING_MATCHERS = {
+    "": lambda value, wanted: value == wanted,
+    "Contains": lambda value, wanted: wanted in value,
+    "StartsWith": lambda value, wanted: value.startswith(wanted),
+    "Matches": lambda value, wanted: re.fullmatch(wanted, value, re.S) is not None,
+}
+_FLAGS = {
+    "checkable": "checkable",
+    "checked": "checked",
+    "clickable": "clickable",
+    "longClickable": "long-clickable",
+    "scrollable": "scrollable",
+    "enabled": "enabled",
+    "focusable": "focusable",
+    "focused": "focused",
+    "selected": "selected",
+}
+# Attributes with an exact-match index
+_INDEXED = tuple(_FIELDS.values())
+
+_BOUNDS = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+class Node:
+    """One element of a snapshot."""
+    __slots__ = ("attrib", "parent", "position")
+
+    def __init__(self, attrib, parent, position):
+        self.attrib = attrib
+        self.parent = parent
+        self.position = position  # document order
+
+    @property
+    def text(self):
+        return self.attrib.get("text", "")
+
+    @property
+    def description(self):
+        return self.attrib.get("content-desc", "")
+
+    @property
+    def resource_id(self):
+        return self.attrib.get("resource-id", "")
+
+    @property
+    def class_name(self):
+        return self.attrib.get("class", "")
+
+    @property
+    def bounds(self):
+        """(left, top, right, bottom) in pixels, or None."""
+        match = _BOUNDS.fullmatch(self.attrib.get("bounds", ""))
+        return tuple(int(v) for v in match.groups()) if match else None
+
+    @property
+    def center(self):
+        bounds = self.bounds
+        if bounds is None:
+            return None
+        left, top, right, bottom = bounds
+        return (left + right) // 2, (top + bottom) // 2
+
+    def __repr__(self):
+        label = self.text or self.description or self.resource_id
+        return f"<Node {self.class_name} {label!r}>"
+
+def _compile_selector(selector):
+    """Splits selector kwargs into exact index lookups and per-node checks."""
+    lookups, checks = [], []
+    index, instance = selector.get("index"), selector.get("instance", 0)
+    for key, wanted in selector.items():
+        if key in ("index", "instance"):
+            continue
+        if key in _FLAGS:
+            attr, flag = _FLAGS[key], "true" if wanted else "false"
+            checks.append(lambda node, a=attr, f=flag: node.attrib.get(a, "false") == f)
+            continue
+        for field, attr in _FIELDS.items():
+            if key.startswith(field) and key[len(field):] in _STRING_MATCHERS:
+                suffix = key[len(field):]
+                if suffix == "":
+                    lookups.append((attr, wanted))
+                else:
+                    match = _STRING_MATCHERS[suffix]
+                    checks.append(lambda node, a=attr, w=wanted, m=match: m(node.attrib.get(a, ""), w))
+                break
+        else:
+            raise TypeError(f"unsupported selector keyword: {key}")
+    if index is not None:
+        checks.append(lambda node, i=str(index): node.attrib.get("index") == i)
+    return lookups, checks, instance
+
+class Snapshot:
+    """A parsed hierarchy dump with exact-match indexes on text, description, resource id, class and package."""
+    def __init__(self, xml, taken_at=None):
+        self.taken_at = time.monotonic() if taken_at is None else taken_at
+        self.nodes = []
+        self._index = {attr: {} for attr in _INDEXED}
+        root = ET.fromstring(xml.encode("utf-8") if isinstance(xml, str) else xml)
+        self._add_children(root, None)
+
+    def _add_children(self, element, parent):
+        for child in element:
+            if child.tag != "node":
+                continue
+            node = Node(child.attrib, parent, len(self.nodes))
+            self.nodes.append(node)
+            for attr in _INDEXED:
+                value = child.attrib.get(attr)
+                if value:
+                    self._index[attr].setdefault(value, []).append(node)
+            self._add_children(child, node)
+
+    def find_all(self, **selector):
+        """All nodes matching the selector, in document order."""
+        lookups, checks, _ = _compile_selector(selector)
+        if lookups:
+            buckets = [self._index[attr].get(wanted, ()) for attr, wanted in lookups]
+            candidates = min(buckets, key=len)
+            for attr, wanted in lookups:
+                checks.append(lambda node, a=attr, w=wanted: node.attrib.get(a, "") == w)
+        else:
+            candidates = self.nodes
+        return [node for node in candidates if all(check(node) for check in checks)]
+
+    def find(self, **selector):
+        """The selector's match (its `instance`-th, like uiautomator2), or None."""
+        instance = selector.get("instance", 0)
+        matches = self.find_all(**selector)
+        return matches[instance] if instance < len(matches) else None
+
+    def exists(self, **selector):
+        return self.find(**selector) is not None
+
+    def count(self, **selector):
+        selector.pop("instance", None)
+        return len(self.find_all(**selector))
+
+class Screen:
+    """
+    The current screen of device `d`, dumped at most once between
+    invalidations. Queries take the snapshot on first use.
+    """
+    def __init__(self, d):
+        self.d = d
+        self.dumps = 0
+        self._snapshot = None
+
+    @property
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = Snapshot(self.d.dump_hierarchy())
+            self.dumps += 1
+        return self._snapshot
+
+    def invalidate(self):
+        """Drops the snapshot; call after every action that may change the screen."""
+        self._snapshot = None
+
+    def find(self, **selector):
+        return self.snapshot.find(**selector)
+
+    def find_all(self, **selector):
+        return self.snapshot.find_all(**selector)
+
+    def exists(self, **selector):
+        return self.snapshot.exists(**selector)
+
+    def count(self, **selector):
+        return self.snapshot.count(**selector)
+
+    def wait(self, timeout=10.0, interval=0.5, **selector):
+        """Re-dumps until the selector matches or `timeout` passes. Returns the node or None."""
+        deadline = time.monotonic() + timeout
+        while True:
+            node = self.find(**selector)
+            if node is not None or time.monotonic() >= deadline:
+                return node
+            time.sleep(interval)
+            self.invalidate()
+
+    def click(self, **selector):
+        """Taps the center of the selector's match. Returns False if there is none."""
+        node = self.find(**selector)
+        if node is None or node.center is None:
+            return False
+        self.d.click(*node.center)
+        self.invalidate()
+        return True
@@ -0,0 +1,47 @@
+"""
+Progress events for the controller.
+
+Each event is written to stdout as a single line: an ASCII record separator
+(\\x1e) followed by compact JSON. The controller parses these lines into the
+progress bar and run summary of the device row and treats every other line
+as plain status text. Run standalone, the events are just extra output lines.
+
+    from utils import progress
+    progress.phase("login")
+    progress.step(3, 50, "Video")
+    progress.result("ok", "Login succeeded")
+"""
+import json
+import sys
+import time
+
+EVENT_PREFIX = "\x1e"
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+def emit(event, **fields):
+    """Writes one event line. `event` is the event type, e.g. "phase", "step" or "result"."""
+    fields["e"] = event
+    fields["t"] = round(time.time(), 3)
+    sys.stdout.write(EVENT_PREFIX + _dumps(fields) + "\n")
+    sys.stdout.flush()
+
+def phase(name):
+    """Marks the start of a named phase; it ends when the next phase starts or the run reports a result."""
+    emit("phase", name=name)
+
+def step(current, total=None, label=None):
+    """Reports progress through a countable loop, e.g. step(3, 50, "Video")."""
+    fields = {"n": current}
+    if total is not None:
+        fields["of"] = total
+    if label is not None:
+        fields["label"] = label
+    emit("step", **fields)
+
+def result(code, message=None):
+    """Reports the outcome of the run. `code` is "ok" for success, anything else is a failure reason."""
+    if message is None:
+        emit("result", code=code)
+    else:
+        emit("result", code=code, message=message)
@@ -0,0 +1,40 @@
+import os
+import time
+
+# Set by the controller for every run: "warm" when it holds a healthy
+# uiautomator2 session for the device, "cold" otherwise.
+SESSION_ENV = "AUTOPILOT_U2_SESSION"
+
+_devices = {}
+
+def connect(device_id, retries=3, backoff_s=2.0):
+    """
+    Returns a uiautomator2 device for `device_id`, connected once per process.
+
+    When the controller keeps a warm session, the on-device server is already
+    running and connecting only attaches to it. Otherwise (or if that attach
+    fails) the connection is retried with exponential backoff and probed
+    before it is handed out.
+    """
+    device = _devices.get(device_id)
+    if device is not None:
+        return device
+
+    import uiautomator2 as u2
+
+    warm = os.environ.get(SESSION_ENV) == "warm"
+    for attempt in range(retries):
+        try:
+            device = u2.connect(device_id)
+            if not warm:
+                device.info  # Test the connection
+            _devices[device_id] = device
+            return device
+        except Exception as e:
+            warm = False
+            print(f"[{device_id}] Connection attempt {attempt + 1}/{retries} failed: {e}")
+            if attempt == retries - 1:
+                raise
+            delay = backoff_s * 2 ** attempt
+            print(f"[{device_id}] Retrying in {delay:.0f} seconds...")
+            time.sleep(delay)
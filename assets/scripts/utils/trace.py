@@ -0,0 +1,52 @@
+"""
+Custom spans for the controller's run trace.
+
+When the app traces runs (AUTOPILOT_TRACE), a span is sent to it as a
+progress event and shows up on the device's "script" timeline next to the
+phases, uiautomator2 waits and sleeps. Otherwise `span()` does nothing.
+
+    from utils import trace
+    with trace.span("open profile", user=username):
+        ...
+"""
+import os
+import time
+
+from utils import progress
+
+# Must match TRACE_ENV and trace_enabled() in src/tracing.py
+TRACE_ENV = "AUTOPILOT_TRACE"
+
+enabled = os.environ.get(TRACE_ENV, "") not in ("", "0")
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time_ns() // 1000
+        return self
+
+    def __exit__(self, *exc):
+        fields = {"name": self.name, "cat": "script", "ts": self.start,
+                  "dur": time.time_ns() // 1000 - self.start}
+        if self.args:
+            fields["args"] = self.args
+        progress.emit("span", **fields)
+        return False
+
+def span(name, **args):
+    """Times the enclosed block as a span named `name`; keyword arguments are shown with it."""
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
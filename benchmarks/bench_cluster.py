@@ -0,0 +1,150 @@
+# benchmarks/bench_cluster.py
+"""
+Multi-host benchmark on loopback: several agents, each an Orchestrator with
+its own fake ADB server and its API on a free port, driven by a Coordinator.
+
+Agents can differ in size, run slots (`--capacity`) and runs already going
+(`--busy`, queued on the agent directly, as another operator would). The
+Coordinator merges the inventories, places `--count` runs of
+benchmarks/synthetic_script.py by load and waits for them. The report has
+the inventory latency, where the runs went and how they ended, as JSON.
+The agents share this process; the scripts run in their own workers.
+
+    python -m benchmarks.bench_cluster --agents 20 20 20 --capacity 10 5 5 --busy 0 5 0 --count 30
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import socket
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.bench_fleet import _git_commit
+from benchmarks.fleet import FakeFleet
+from src.adb_client import AdbClient
+from src.api_server import ApiServer
+from src.coordinator import Coordinator
+from src.orchestrator import Orchestrator
+from src.session_broker import SessionBroker
+
+SCRIPT = "synthetic_script.py"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _per_agent(values, count):
+    """One value per agent; a single value applies to all."""
+    if len(values) == 1:
+        return values * count
+    if len(values) != count:
+        raise SystemExit(f"expected 1 or {count} values, got {len(values)}")
+    return values
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def start_agent(size, capacity, seed):
+    fleet = await FakeFleet(size, seed=seed).start()
+    core = Orchestrator(script_dir=SCRIPT_DIR, log_dir=None, adb=AdbClient(port=fleet.port), echo_output=False,
+                        history_path=None, log_index_path=None)
+    core.session_broker = SessionBroker(connect=fleet.connect, max_workers=capacity)
+    core.scheduler.max_concurrent = capacity
+    core.load_scripts()
+    await core.scan()
+    await core.start(watch_scripts=False)
+    server = await ApiServer(core, port=0).start()
+    return fleet, core, server
+
+async def run_cluster(args):
+    sizes = args.agents
+    capacity = _per_agent(args.capacity, len(sizes))
+    busy = _per_agent(args.busy, len(sizes))
+    agents = [await start_agent(size, capacity[i], seed=i) for i, size in enumerate(sizes)]
+    addresses = [f"agent{i}=127.0.0.1:{server.port}" for i, (_, _, server) in enumerate(agents)]
+    if args.dead_agent:
+        addresses.append(f"dead=127.0.0.1:{_closed_port()}")
+    for (_, core, _), n in zip(agents, busy):
+        core.submit(SCRIPT, core.online_devices()[:n])
+
+    coordinator = Coordinator(addresses, timeout=5)
+    try:
+        t0 = time.perf_counter()
+        await coordinator.start()
+        inventory_s = time.perf_counter() - t0
+        loads_before = {name: round(node.load, 3) for name, node in coordinator.nodes.items()}
+
+        t0 = time.perf_counter()
+        submitted = await coordinator.submit(SCRIPT, count=args.count)
+        submit_s = time.perf_counter() - t0
+        runs = await asyncio.wait_for(coordinator.wait(submitted), args.timeout)
+        wall_s = time.perf_counter() - t0
+    finally:
+        await coordinator.shutdown()
+        for fleet, core, server in agents:
+            await server.stop()
+            await core.shutdown()
+            await fleet.stop()
+
+    states = {}
+    for run in runs.values():
+        states[run["state"]] = states.get(run["state"], 0) + 1
+    return {
+        "agents": len(sizes),
+        "devices": sum(sizes),
+        "inventory_s": round(inventory_s, 3),
+        "inventory_devices": len(coordinator.inventory()),
+        "reachable_agents": sum(1 for node in coordinator.nodes.values() if node.reachable),
+        "load_before": loads_before,
+        "capacity": dict(zip((f"agent{i}" for i in range(len(sizes))), capacity)),
+        "placement": submitted["placement"],
+        "skipped": len(submitted["skipped"]),
+        "submit_s": round(submit_s, 3),
+        "wall_s": round(wall_s, 3),
+        "run_states": states,
+    }
+
+async def main(args):
+    os.environ.update({"BENCH_LINES": str(args.lines), "BENCH_INTERVAL_S": str(args.interval)})
+    print(f"[bench_cluster] {len(args.agents)} agents, {args.count} runs...", file=sys.stderr)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = await run_cluster(args)
+    return {
+        "benchmark": "cluster",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "agents": args.agents, "capacity": args.capacity, "busy": args.busy, "count": args.count,
+            "lines": args.lines, "interval_s": args.interval, "dead_agent": args.dead_agent,
+        },
+        "result": result,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 10, 10], help="devices per agent")
+    parser.add_argument("--capacity", type=int, nargs="+", default=[5], help="max concurrent runs per agent")
+    parser.add_argument("--busy", type=int, nargs="+", default=[0], help="runs already queued per agent")
+    parser.add_argument("--count", type=int, default=12, help="runs to place through the coordinator")
+    parser.add_argument("--lines", type=int, default=20, help="stdout lines per run")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between lines")
+    parser.add_argument("--dead-agent", action="store_true", help="also list an agent that is not running")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
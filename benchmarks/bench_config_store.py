@@ -0,0 +1,119 @@
+# benchmarks/bench_config_store.py
+"""
+Write latency and contention of ConfigStore with many concurrent writers.
+
+Every writer process increments a shared counter in a scratch copy of
+config.yaml a number of times. With correct locking the final counter equals
+writers * writes; the `--naive` mode does the same with plain unlocked
+read-modify-write for comparison.
+
+    python -m benchmarks.bench_config_store --writers 100 --writes 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import yaml
+
+from src.config_store import ConfigStore
+
+CONFIG_PATH = os.path.join(BASE_DIR, "assets/scripts/config.yaml")
+
+def _increment(config):
+    bench = config.setdefault("bench", {"counter": 0})
+    bench["counter"] += 1
+
+def _naive_increment(path):
+    with open(path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    _increment(config)
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(config, f, allow_unicode=True)
+
+def _writer(path, writes, naive, start_event, results):
+    store = ConfigStore(path)
+    latencies = []
+    errors = 0
+    start_event.wait()
+    for _ in range(writes):
+        started = time.perf_counter()
+        try:
+            if naive:
+                _naive_increment(path)
+            else:
+                store.update(_increment)
+        except Exception:
+            # Unlocked writers can read a half-written file.
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    results.put((latencies, errors))
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run(writers, writes, naive):
+    workdir = tempfile.mkdtemp(prefix="config-bench-")
+    path = os.path.join(workdir, "config.yaml")
+    shutil.copy(CONFIG_PATH, path)
+    try:
+        ctx = multiprocessing.get_context("spawn")
+        start_event = ctx.Event()
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(target=_writer, args=(path, writes, naive, start_event, results))
+            for _ in range(writers)
+        ]
+        for proc in procs:
+            proc.start()
+        started = time.perf_counter()
+        start_event.set()
+        latencies, errors = [], 0
+        for _ in procs:
+            proc_latencies, proc_errors = results.get()
+            latencies.extend(proc_latencies)
+            errors += proc_errors
+        elapsed = time.perf_counter() - started
+        for proc in procs:
+            proc.join()
+
+        with open(path, "r", encoding="utf-8") as f:
+            final = (yaml.safe_load(f) or {}).get("bench", {}).get("counter", 0)
+        expected = writers * writes
+        return {
+            "mode": "naive" if naive else "config_store",
+            "writers": writers,
+            "writes_per_writer": writes,
+            "expected_counter": expected,
+            "final_counter": final,
+            "lost_updates": expected - final,
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "writes_per_s": round(expected / elapsed, 1),
+            "latency_ms": {
+                "mean": round(statistics.mean(latencies) * 1000, 2),
+                "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+                "p95": round(_percentile(latencies, 0.95) * 1000, 2),
+                "p99": round(_percentile(latencies, 0.99) * 1000, 2),
+                "max": round(max(latencies) * 1000, 2),
+            },
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=100)
+    parser.add_argument("--writes", type=int, default=20, help="writes per writer")
+    parser.add_argument("--naive", action="store_true", help="unlocked in-place writes, for comparison")
+    args = parser.parse_args()
+    print(json.dumps(run(args.writers, args.writes, args.naive), indent=2))
@@ -0,0 +1,134 @@
+# benchmarks/bench_device_filter.py
+"""
+Device filter benchmark: builds the GUI's device list for `--devices` fake
+devices with tags, groups and probe results, then types filter queries one
+character at a time, as the filter box does. Per keystroke it times the
+FilterIndex lookup alone and the whole update (lookup, filtering the rows,
+rendering the window). Reports setup cost and keystroke latency as JSON.
+
+    python -m benchmarks.bench_device_filter --devices 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import flet as ft
+
+from benchmarks.bench_fleet import _git_commit
+from benchmarks.fleet import HeadlessPage
+from src.device_probe import DeviceInfo
+from src.main_app import AppLogic
+
+MODELS = ("Pixel 7", "Pixel 6a", "SM-G991B", "SM-A525F", "Redmi Note 12", "moto g52")
+ANDROID = ("11", "12", "13", "14")
+QUERIES = (
+    "tag:hub3",
+    "tag:hub3 android:13",
+    "pixel android:14",
+    "group:night",
+    "ser0012",
+    "sm-a52 tag:lab",
+)
+
+def _ms(values):
+    values = sorted(values)
+    return {
+        "median": round(statistics.median(values) * 1000, 3),
+        "p95": round(values[int(0.95 * (len(values) - 1))] * 1000, 3),
+        "max": round(values[-1] * 1000, 3),
+    }
+
+async def run(args):
+    rng = random.Random(0)
+    page = HeadlessPage()
+    app = AppLogic(page, ft.ProgressRing(), log_dir=None, history_path=None, log_index_path=None,
+                   devices_path=None)
+    page.list_view = app.device_list_view
+    core = app.core
+    serials = [f"SER{i:05d}" for i in range(args.devices)]
+
+    started = time.perf_counter()
+    for hub in range(args.hubs):
+        core.device_tags.change_tags(serials[hub::args.hubs], add=[f"hub{hub}"])
+    core.device_tags.change_tags(rng.sample(serials, len(serials) // 3), add=["lab"])
+    core.device_tags.save_group("night", rng.sample(serials, len(serials) // 10))
+    tags_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    core.device_model.apply_scan({serial: "device" for serial in serials})
+    scan_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for serial in serials:
+        core._on_probe_result(serial, DeviceInfo(model=rng.choice(MODELS), android=rng.choice(ANDROID)))
+    probes_s = time.perf_counter() - started
+
+    lookups, keystrokes, shown = [], [], {}
+    for _ in range(args.repeat):
+        for query in QUERIES:
+            for end in range(1, len(query) + 1):
+                if end == 1:
+                    # Start each query cold, as after a probe result or tag change.
+                    core.device_filter._cache.clear()
+                t0 = time.perf_counter()
+                core.device_filter.match(query[:end])
+                lookups.append(time.perf_counter() - t0)
+                app.filter_field.value = query[:end]
+                t0 = time.perf_counter()
+                await app.on_filter_change(None)
+                keystrokes.append(time.perf_counter() - t0)
+            shown[query] = len(app.device_list_view.shown)
+            app.filter_field.value = ""
+            await app.on_filter_change(None)
+
+    app.update_pump.stop()
+    await core.shutdown()
+    return {
+        "devices": args.devices,
+        "tags_s": round(tags_s, 3),
+        "scan_and_index_s": round(scan_s, 3),
+        "probe_results_s": round(probes_s, 3),
+        "keystrokes": len(keystrokes),
+        "index_lookup_ms": _ms(lookups),
+        "keystroke_update_ms": _ms(keystrokes),
+        "shown": shown,
+    }
+
+async def main(args):
+    print(f"[bench_device_filter] {args.devices} devices...", file=sys.stderr)
+    result = await run(args)
+    return {
+        "benchmark": "device_filter",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {"devices": args.devices, "hubs": args.hubs, "repeat": args.repeat},
+        "result": result,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--hubs", type=int, default=10, help="devices are tagged hub0..hubN-1 round robin")
+    parser.add_argument("--repeat", type=int, default=5, help="times each query is typed")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
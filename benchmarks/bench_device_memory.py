@@ -0,0 +1,121 @@
+# benchmarks/bench_device_memory.py
+"""
+Device list memory benchmark: for each fleet size, builds the GUI headlessly
+(AppLogic on a HeadlessPage), scans the fake devices, applies a probe result,
+tags and a running status to each, renders the list, and measures with
+tracemalloc what that cost per device. It also measures the DeviceRow
+states alone, and what a bound DeviceControl costs, i.e. what keeping one
+widget tree per device would add. Reports bytes per device as JSON.
+
+    python -m benchmarks.bench_device_memory --sizes 100 1000 5000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import flet as ft
+
+from benchmarks.bench_fleet import _git_commit
+from benchmarks.fleet import HeadlessPage
+from src.device_probe import DeviceInfo
+from src.device_rows import DeviceRow
+from src.main_app import AppLogic
+from src.ui_components import DeviceControl
+
+def _traced():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+async def measure(size, widget_sample):
+    page = HeadlessPage()
+    app = AppLogic(page, ft.ProgressRing(), log_dir=None, history_path=None, log_index_path=None,
+                   devices_path=None)
+    page.list_view = app.device_list_view
+    serials = [f"SER{i:05d}" for i in range(size)]
+    app.core.device_tags.change_tags(serials[::2], add=["hub3", "lab"])
+
+    before = _traced()
+    started = time.perf_counter()
+    app.core.device_model.apply_scan({serial: "device" for serial in serials})
+    for i, serial in enumerate(serials):
+        app.core._on_probe_result(serial, DeviceInfo(model="Pixel 7", android="14", battery=i % 100,
+                                                     screen_on=True, agent=True))
+        app.on_core_event({"type": "status", "serial": serial, "status": f"Watching reel {i % 50}",
+                           "fraction": (i % 100) / 100})
+    page.update()
+    build_s = time.perf_counter() - started
+    gui_bytes = _traced() - before
+
+    # The states alone, as the list holds them.
+    before = _traced()
+    rows = [DeviceRow(serial) for serial in serials]
+    for i, row in enumerate(rows):
+        row.info, row.tags, row.status = f"Pixel 7 · Android 14 · {i % 100}%", ("hub3", "lab"), f"Reel {i % 50}"
+    row_bytes = _traced() - before
+    del rows
+
+    # One widget tree per device, as the list kept before.
+    sample = serials[:widget_sample]
+    before = _traced()
+    widgets = []
+    for serial in sample:
+        widget = DeviceControl(app)
+        widget.bind(app.device_list_view.rows[serial])
+        widgets.append(widget)
+    widget_bytes = (_traced() - before) / len(sample)
+    del widgets
+
+    result = {
+        "devices": size,
+        "build_s": round(build_s, 3),
+        "widgets": len(app.device_list_view.widgets),
+        "gui_bytes_per_device": round(gui_bytes / size),
+        "row_state_bytes_per_device": round(row_bytes / size),
+        "widget_tree_bytes_per_device": round(widget_bytes),
+        "widget_per_device_would_add_mb": round(widget_bytes * size / 1e6, 1),
+    }
+    app.update_pump.stop()
+    await app.core.shutdown()
+    return result
+
+async def main(args):
+    tracemalloc.start()
+    results = []
+    for size in args.sizes:
+        print(f"[bench_device_memory] {size} devices...", file=sys.stderr)
+        results.append(await measure(size, min(size, args.widget_sample)))
+    tracemalloc.stop()
+    return {
+        "benchmark": "device_memory",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {"sizes": args.sizes, "widget_sample": args.widget_sample},
+        "results": results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--widget-sample", type=int, default=500, help="widget trees built to price one")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
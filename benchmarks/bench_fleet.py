@@ -0,0 +1,228 @@
+# benchmarks/bench_fleet.py
+"""
+End-to-end controller benchmark against a fake ADB server and fake devices.
+
+For each fleet size it drives AppLogic and DeviceControl headlessly: a scan
+of all devices, the device probes, then "Run on Selected" for every device
+with benchmarks/synthetic_script.py. It reports scan latency, probe time,
+time to first output per device, run throughput, UI update rate and the
+controller's RSS/CPU as JSON, so results of two commits can be diffed.
+
+    python -m benchmarks.bench_fleet --fleet 10 100 1000 --output fleet.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import flet as ft
+
+from benchmarks.fleet import FakeFleet, HeadlessPage
+from src.adb_client import AdbClient
+from src.main_app import AppLogic
+from src.orchestrator import ACTIVE_RUN_STATES
+from src.run_log import LogBuffer, SegmentSpill, safe_filename
+from src.session_broker import SessionBroker
+
+SCRIPT = "synthetic_script.py"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class TimedLogBuffer(LogBuffer):
+    """LogBuffer that remembers when it was created and when its first line arrived."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.perf_counter()
+        self.first_line_at = None
+
+    def append(self, stream, line):
+        if self.first_line_at is None:
+            self.first_line_at = time.perf_counter()
+        super().append(stream, line)
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def _cpu_s(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+def _stats(values, scale=1000.0):
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "mean": round(statistics.mean(values) * scale, 2),
+        "p50": round(pick(0.50) * scale, 2),
+        "p95": round(pick(0.95) * scale, 2),
+        "max": round(ordered[-1] * scale, 2),
+    }
+
+async def _wait_for(condition, timeout, poll=0.01):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark step timed out")
+        await asyncio.sleep(poll)
+
+async def run_fleet(size, args):
+    fleet = await FakeFleet(size, hub_size=args.hub_size).start()
+    page = HeadlessPage()
+    log_dir = tempfile.mkdtemp(prefix="fleet-bench-") if args.spill else None
+    index_dir = tempfile.mkdtemp(prefix="fleet-bench-index-") if args.log_index else None
+    app = AppLogic(page, ft.ProgressRing(), log_dir=log_dir, script_dir=SCRIPT_DIR, history_path=None,
+                   log_index_path=os.path.join(index_dir, "log_index.db") if index_dir else None,
+                   adb=AdbClient(port=fleet.port))
+    page.list_view = app.device_list_view
+    core = app.core
+    core.session_broker = SessionBroker(connect=fleet.connect, max_workers=args.max_concurrent)
+    core.scheduler.max_concurrent = args.max_concurrent
+    core.scheduler.max_per_transport = args.max_per_transport
+    core.scheduler.stagger_s = args.stagger
+    app.load_scripts()
+    app.script_dropdown.value = SCRIPT
+
+    logs = []
+    def new_run_log(serial):
+        spill = SegmentSpill(log_dir, safe_filename(serial)) if log_dir else None
+        log = TimedLogBuffer(core.log_lines, spill)
+        logs.append(log)
+        return log
+    core.new_run_log = new_run_log
+
+    finished = []
+    def record_finish(event):
+        if event["type"] == "run" and event["state"] not in ACTIVE_RUN_STATES:
+            finished.append(time.perf_counter())
+    core.subscribe(record_finish)
+
+    result = {"devices": size}
+    rss_start = _rss_mb()
+    try:
+        # Scan and probe
+        started = time.perf_counter()
+        await app.scan_devices()
+        result["scan_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        await _wait_for(lambda: len(core.prober.cache) >= size, args.timeout)
+        result["probe_all_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        result["rows"] = len(app.device_list_view.rows)
+
+        # Run on every device
+        await app.set_selection(True)
+        updates_before = (page.update_calls, page.controls_sent, app.update_pump.requested, app.update_pump.frames)
+        cpu_before, children_before = _cpu_s(resource.RUSAGE_SELF), _cpu_s(resource.RUSAGE_CHILDREN)
+        started = time.perf_counter()
+        await app.run_on_selected(None)
+        await _wait_for(lambda: len(finished) >= size, args.timeout, poll=0.05)
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(2 * app.update_pump.interval)  # let the last frame go out
+
+        ttfo = [log.first_line_at - log.created_at for log in logs if log.first_line_at]
+        queue_wait = [log.created_at - started for log in logs]
+        lines = sum(log.total_lines for log in logs)
+        failed = sum(1 for row in app.device_list_view.rows.values() if row.status != "Finished")
+        result.update({
+            "run_wall_s": round(elapsed, 3),
+            "runs_per_s": round(size / elapsed, 2),
+            "failed_runs": failed,
+            "lines_per_s": round(lines / elapsed, 1),
+            "time_to_first_output_ms": _stats(ttfo),
+            "queue_wait_ms": _stats(queue_wait),
+            "ui": {
+                "page_updates_per_s": round((page.update_calls - updates_before[0]) / elapsed, 1),
+                "controls_sent_per_s": round((page.controls_sent - updates_before[1]) / elapsed, 1),
+                "pump_requests": app.update_pump.requested - updates_before[2],
+                "pump_frames": app.update_pump.frames - updates_before[3],
+                "pump_coalesced": app.update_pump.coalesced,
+            },
+            "controller": {
+                "rss_start_mb": round(rss_start, 1),
+                "rss_end_mb": round(_rss_mb(), 1),
+                "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                "cpu_s": round(_cpu_s(resource.RUSAGE_SELF) - cpu_before, 3),
+                "cpu_percent": round((_cpu_s(resource.RUSAGE_SELF) - cpu_before) / elapsed * 100, 1),
+                "workers_cpu_s": round(_cpu_s(resource.RUSAGE_CHILDREN) - children_before, 3),
+            },
+        })
+        if core.log_index is not None:
+            await core.log_index.flush()
+            result["log_index"] = {"lines": core.log_index.count(), "dropped": core.log_index.dropped}
+    finally:
+        app.update_pump.stop()
+        await core.shutdown()
+        await fleet.stop()
+    return result
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def main(args):
+    # Read by synthetic_script.py in the workers, which inherit this environment.
+    os.environ.update({
+        "BENCH_LINES": str(args.lines),
+        "BENCH_LINE_BYTES": str(args.line_bytes),
+        "BENCH_INTERVAL_S": str(args.interval),
+    })
+    results = []
+    for size in args.fleet:
+        print(f"[bench_fleet] {size} devices...", file=sys.stderr)
+        # The controller prints every script line; keep that off the report.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results.append(await run_fleet(size, args))
+    return {
+        "benchmark": "fleet",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "lines": args.lines, "line_bytes": args.line_bytes, "interval_s": args.interval,
+            "max_concurrent": args.max_concurrent, "max_per_transport": args.max_per_transport,
+            "stagger_s": args.stagger, "hub_size": args.hub_size, "spill": args.spill,
+            "log_index": args.log_index,
+        },
+        "results": results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fleet", type=int, nargs="+", default=[10, 100, 1000], help="fleet sizes to run")
+    parser.add_argument("--lines", type=int, default=50, help="stdout lines per run")
+    parser.add_argument("--line-bytes", type=int, default=80)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between lines")
+    parser.add_argument("--max-concurrent", type=int, default=20)
+    parser.add_argument("--max-per-transport", type=int, default=5)
+    parser.add_argument("--stagger", type=float, default=0.0, help="launch stagger in seconds")
+    parser.add_argument("--hub-size", type=int, default=10, help="fake devices per USB hub")
+    parser.add_argument("--spill", action="store_true", help="also write run logs to files")
+    parser.add_argument("--log-index", action="store_true", help="also index run output for search")
+    parser.add_argument("--timeout", type=float, default=1800)
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,168 @@
+# benchmarks/bench_hierarchy.py
+"""
+Micro-benchmark of selector queries: one uiautomator2 RPC per query against
+one hierarchy dump per screen answered locally (assets/scripts/utils/hierarchy.py).
+
+Each scenario is a screen from benchmarks/hierarchies/ (XML in the
+`dump_hierarchy()` format) and the selectors a script checks on it. The fake
+device charges `--rpc-ms` per selector RPC and `--dump-ms` per dump instead
+of sleeping; local parsing and matching is timed for real. The report lists
+RPCs and latency per screen for both ways, as JSON.
+
+    python -m benchmarks.bench_hierarchy --rpc-ms 40 --dump-ms 120
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "assets", "scripts"))
+
+from utils.hierarchy import Screen, Snapshot
+
+HIERARCHY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hierarchies")
+IG = "com.instagram.android:id/"
+
+# (name, hierarchy file, selectors checked on that screen)
+SCENARIOS = [
+    ("reels video", "reels.xml", [
+        {"description": "Sponsored"},
+        {"text": "Follow"},
+        {"resourceId": IG + "layout_container_bottom_sheet"},
+    ]),
+    ("reels ad", "reels_sponsored.xml", [
+        {"description": "Sponsored"},
+    ]),
+    ("search results", "search_results.xml", [
+        {"resourceId": IG + "action_bar_search_edit_text"},
+        {"text": "Reels"},
+        {"text": "Accounts"},
+        {"resourceId": IG + "image_preview", "instance": 0},
+        {"descriptionContains": "row 3, column 2"},
+        {"className": "android.widget.EditText"},
+        {"textMatches": r"\d+K", "instance": 5},
+        {"description": "Search and explore", "selected": True},
+    ]),
+]
+
+class FakeDevice:
+    """Answers selectors and dumps from one recorded hierarchy and bills simulated device time."""
+    def __init__(self, xml, rpc_ms, dump_ms):
+        self.xml = xml
+        self.rpc_ms = rpc_ms
+        self.dump_ms = dump_ms
+        self.rpcs = 0
+        self.device_ms = 0.0
+        self._truth = Snapshot(xml)
+
+    def dump_hierarchy(self):
+        self.rpcs += 1
+        self.device_ms += self.dump_ms
+        return self.xml
+
+    def __call__(self, **selector):
+        return _FakeSelector(self, selector)
+
+class _FakeSelector:
+    def __init__(self, device, selector):
+        self.device = device
+        self.selector = selector
+
+    @property
+    def exists(self):
+        self.device.rpcs += 1
+        self.device.device_ms += self.device.rpc_ms
+        return self.device._truth.exists(**self.selector)
+
+def _per_selector(xml, selectors, args):
+    d = FakeDevice(xml, args.rpc_ms, args.dump_ms)
+    started = time.perf_counter()
+    answers = [d(**selector).exists for selector in selectors]
+    local_ms = (time.perf_counter() - started) * 1000
+    return d, answers, local_ms
+
+def _snapshot(xml, selectors, args):
+    d = FakeDevice(xml, args.rpc_ms, args.dump_ms)
+    started = time.perf_counter()
+    screen = Screen(d)
+    answers = [screen.exists(**selector) for selector in selectors]
+    local_ms = (time.perf_counter() - started) * 1000
+    return d, answers, local_ms
+
+def _measure(run, xml, selectors, args):
+    local = []
+    for _ in range(args.repeat):
+        d, answers, local_ms = run(xml, selectors, args)
+        local.append(local_ms)
+    local_ms = statistics.median(local)
+    return answers, {
+        "rpcs": d.rpcs,
+        "device_ms": round(d.device_ms, 2),
+        "local_ms": round(local_ms, 3),
+        "total_ms": round(d.device_ms + local_ms, 2),
+    }
+
+def run_scenario(name, filename, selectors, args):
+    with open(os.path.join(HIERARCHY_DIR, filename), "r", encoding="utf-8") as f:
+        xml = f.read()
+    expected, per_selector = _measure(_per_selector, xml, selectors, args)
+    answers, snapshot = _measure(_snapshot, xml, selectors, args)
+    if answers != expected:
+        raise AssertionError(f"{name}: snapshot answers {answers} differ from the device's {expected}")
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        Snapshot(xml)
+    parse_ms = (time.perf_counter() - started) * 1000 / args.repeat
+    return {
+        "scenario": name,
+        "hierarchy": filename,
+        "nodes": len(Snapshot(xml).nodes),
+        "xml_bytes": len(xml.encode("utf-8")),
+        "queries": len(selectors),
+        "parse_ms": round(parse_ms, 3),
+        "per_selector": per_selector,
+        "snapshot": snapshot,
+        "speedup": round(per_selector["total_ms"] / snapshot["total_ms"], 2),
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(args):
+    return {
+        "benchmark": "hierarchy",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"rpc_ms": args.rpc_ms, "dump_ms": args.dump_ms, "repeat": args.repeat},
+        # A snapshot pays off from this many queries per screen on.
+        "break_even_queries": round(args.dump_ms / args.rpc_ms, 1) if args.rpc_ms else None,
+        "results": [run_scenario(name, filename, selectors, args) for name, filename, selectors in SCENARIOS],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rpc-ms", type=float, default=40.0, help="simulated latency of one selector RPC")
+    parser.add_argument("--dump-ms", type=float, default=120.0, help="simulated latency of one hierarchy dump")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per scenario; local times are medians")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    text = json.dumps(main(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
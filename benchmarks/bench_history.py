@@ -0,0 +1,139 @@
+# benchmarks/bench_history.py
+"""
+Run history benchmark: fills a fresh database through RunHistory.record()
+on the event loop, as the Orchestrator does, while a ticker measures how
+late the loop gets. Then it times the history queries ("last runs of a
+device", "failure rate per script", "slowest devices"), all time and over
+the last day. Reports write rate, loop lag, database size and query
+latency as JSON.
+
+    python -m benchmarks.bench_history --rows 1000000 --devices 1000 --output history.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.bench_fleet import _git_commit, _stats
+from src.run_history import RunHistory
+
+TICK_S = 0.005
+PRODUCER_CHUNK = 100  # rows recorded between yields to the loop
+
+def fake_runs(count, devices, scripts, days, failure_rate, seed=0):
+    rng = random.Random(seed)
+    serials = [f"SERIAL{i:05d}" for i in range(devices)]
+    # Some devices are slower than others, so "slowest devices" has an answer.
+    speed = {serial: rng.uniform(0.5, 2.0) for serial in serials}
+    now = time.time()
+    for i in range(count):
+        serial = rng.choice(serials)
+        finished = now - days * 86400 * (count - i) / count
+        duration = rng.uniform(20, 120) * speed[serial]
+        failed = rng.random() < failure_rate
+        yield {
+            "serial": serial, "script": f"script_{rng.randrange(scripts)}.py", "config_hash": "0123456789abcdef",
+            "state": "failed" if failed else "finished", "returncode": 1 if failed else 0,
+            "status": "Error: timeout" if failed else "Finished",
+            "queued_at": finished - duration - 5, "started_at": finished - duration, "finished_at": finished,
+            "duration_s": duration, "queue_s": 5.0, "session_s": 0.8, "launch_s": 0.05,
+            "first_output_s": 1.2, "script_s": duration - 1.0,
+            "log_path": f"logs/{serial}.log", "log_start": 0,
+            "log_end_path": f"logs/{serial}.log", "log_end": 4096, "lines": 120,
+        }
+
+async def _ticker(lags, stop):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(TICK_S)
+        lags.append(time.perf_counter() - t0 - TICK_S)
+
+def _time_query(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"median_ms": round(statistics.median(times) * 1000, 3), "max_ms": round(max(times) * 1000, 3)}
+
+async def run(args, path):
+    history = RunHistory(path)
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    t0 = time.perf_counter()
+    for i, row in enumerate(fake_runs(args.rows, args.devices, args.scripts, args.days, args.failure_rate)):
+        history.record(row)
+        if i % PRODUCER_CHUNK == PRODUCER_CHUNK - 1:
+            await asyncio.sleep(0)
+    await history.flush()
+    write_s = time.perf_counter() - t0
+    stop.set()
+    await ticker
+
+    rng = random.Random(1)
+    day_ago = time.time() - 86400
+    queries = {
+        "last_runs": lambda: history.last_runs(f"SERIAL{rng.randrange(args.devices):05d}", 20),
+        "failure_rates": lambda: history.failure_rates(),
+        "failure_rates_last_day": lambda: history.failure_rates(day_ago),
+        "slowest_devices": lambda: history.slowest_devices(10),
+        "slowest_devices_last_day": lambda: history.slowest_devices(10, day_ago),
+    }
+    timings = {name: _time_query(fn, args.repeat) for name, fn in queries.items()}
+    rows = history.count()
+    await history.close()
+    return {
+        "rows": rows,
+        "write_s": round(write_s, 3),
+        "rows_per_s": round(rows / write_s),
+        "loop_lag_ms": _stats(lags),
+        "db_mb": round(sum(os.path.getsize(path + suffix) for suffix in ("", "-wal")
+                           if os.path.exists(path + suffix)) / 1e6, 1),
+        "queries": timings,
+    }
+
+async def main(args):
+    with tempfile.TemporaryDirectory(prefix="history-bench-") as tmp:
+        print(f"[bench_history] {args.rows} runs...", file=sys.stderr)
+        result = await run(args, os.path.join(tmp, "history.db"))
+    return {
+        "benchmark": "history",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "rows": args.rows, "devices": args.devices, "scripts": args.scripts, "days": args.days,
+            "failure_rate": args.failure_rate, "repeat": args.repeat,
+        },
+        "result": result,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--scripts", type=int, default=10)
+    parser.add_argument("--days", type=float, default=90, help="time span the runs are spread over")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each query")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
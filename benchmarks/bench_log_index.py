@@ -0,0 +1,134 @@
+# benchmarks/bench_log_index.py
+"""
+Log index benchmark: streams script output from `--devices` devices at
+`--rate` lines per second each into LogIndex.add() on the event loop, as
+the Orchestrator does, for `--seconds`, while a ticker measures how late
+the loop gets (what a status update would wait). Every few thousand lines
+a device logs a traceback. Then it times searches: a rare traceback, a
+common word, a prefix and one device's lines. Reports lines indexed and
+dropped, writer backlog, loop lag and search latency as JSON.
+
+    python -m benchmarks.bench_log_index --devices 500 --rate 10 --seconds 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.bench_fleet import _git_commit, _stats
+from src.log_index import LogIndex
+from src.run_log import STDOUT
+
+TICK_S = 0.005
+PRODUCE_EVERY_S = 0.01
+TRACEBACK_EVERY = 5000  # lines between tracebacks
+WORDS = ("scrolling", "video", "liked", "skipped", "sponsored", "search", "follow", "opened", "profile", "waiting")
+
+async def _ticker(lags, stop):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(TICK_S)
+        lags.append(time.perf_counter() - t0 - TICK_S)
+
+def _time_search(index, text, repeat, **kwargs):
+    times, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = index.search(text, **kwargs)
+        times.append(time.perf_counter() - t0)
+    return {"median_ms": round(statistics.median(times) * 1000, 3), "max_ms": round(max(times) * 1000, 3),
+            "lines": len(result["lines"]), "devices": len(result["devices"]), "truncated": result["truncated"]}
+
+async def run(args, path):
+    index = LogIndex(path)
+    rng = random.Random(0)
+    serials = [f"FAKE{i:05d}" for i in range(args.devices)]
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    per_tick = args.devices * args.rate * PRODUCE_EVERY_S
+    produced, backlog, owed = 0, 0, 0.0
+    started = time.perf_counter()
+    next_tick = started
+    while time.perf_counter() - started < args.seconds:
+        owed += per_tick
+        while owed >= 1:
+            serial = rng.choice(serials)
+            produced += 1
+            if produced % TRACEBACK_EVERY == 0:
+                line = f"ZeroDivisionError: division by zero (line {produced})"
+            else:
+                line = f"[{serial}] {rng.choice(WORDS)} {rng.choice(WORDS)} item {produced}"
+            index.add(serial, "reels.py", started, STDOUT, line)
+            owed -= 1
+        backlog = max(backlog, index.pending)
+        next_tick += PRODUCE_EVERY_S
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+    feed_s = time.perf_counter() - started
+    await index.flush()
+    drain_s = time.perf_counter() - started - feed_s
+    stop.set()
+    await ticker
+
+    searches = {
+        "traceback": _time_search(index, "ZeroDivisionError", args.repeat),
+        "phrase": _time_search(index, "division by zero", args.repeat),
+        "common_word": _time_search(index, "video", args.repeat),
+        "prefix": _time_search(index, "sponsor*", args.repeat),
+        "one_device": _time_search(index, "liked", args.repeat, serial=serials[0]),
+    }
+    indexed = index.count()
+    await index.close()
+    return {
+        "lines_produced": produced,
+        "lines_per_s": round(produced / feed_s),
+        "lines_indexed": indexed,
+        "lines_dropped": index.dropped,
+        "max_backlog_lines": backlog,
+        "drain_after_feed_s": round(drain_s, 3),
+        "loop_lag_ms": _stats(lags),
+        "db_mb": round(sum(os.path.getsize(path + suffix) for suffix in ("", "-wal")
+                           if os.path.exists(path + suffix)) / 1e6, 1),
+        "search": searches,
+    }
+
+async def main(args):
+    with tempfile.TemporaryDirectory(prefix="log-index-bench-") as tmp:
+        print(f"[bench_log_index] {args.devices} devices x {args.rate} lines/s for {args.seconds}s...",
+              file=sys.stderr)
+        result = await run(args, os.path.join(tmp, "log_index.db"))
+    return {
+        "benchmark": "log_index",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {"devices": args.devices, "rate": args.rate, "seconds": args.seconds, "repeat": args.repeat},
+        "result": result,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=10, help="lines per second per device")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each search")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
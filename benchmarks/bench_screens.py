@@ -0,0 +1,186 @@
+# benchmarks/bench_screens.py
+"""
+Screen grid benchmark: `--devices` fake phones on USB hubs of limited
+bandwidth (`--hub-mbps`), `--running` of them running a "script" that pulls
+a UI dump over ADB every `--dump-every` seconds and changes its screen every
+`--change-every` seconds. `--visible` devices are in the grid's view, half
+of them running. Each mode runs for `--seconds`:
+
+    off        no screenshots
+    budgeted   ScreenCapturer with its default budget and priorities
+    naive      every device every 2 s, all at once, decoded on the event loop
+
+Reports the scripts' dump latency, screenshot bytes per second, frames
+skipped as unchanged, decode CPU, the refresh interval each priority class
+got and event loop lag as JSON.
+
+    python -m benchmarks.bench_screens --devices 300 --seconds 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.bench_fleet import _git_commit, _stats
+from benchmarks.fleet import FakeFleet, SCREEN_VARIANTS, fake_screen
+from src.adb_client import AdbClient
+from src.scheduler import transport_key
+from src.screen_capture import ScreenCapturer, SCREENCAP_COMMAND, make_thumbnail
+
+MODES = ("off", "budgeted", "naive")
+NAIVE_PERIOD_S = 2.0
+DUMP_COMMAND = "uiautomator dump /dev/tty"
+TICK_S = 0.01
+
+class RecordingAdb:
+    """AdbClient wrapper that notes when each device's screenshots were taken."""
+    def __init__(self, adb):
+        self.adb = adb
+        self.shots = {}  # serial -> [monotonic times]
+
+    async def exec_out(self, serial, command):
+        output = await self.adb.exec_out(serial, command)
+        if command == SCREENCAP_COMMAND:
+            self.shots.setdefault(serial, []).append(time.monotonic())
+        return output
+
+async def _ticker(lags, stop):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(TICK_S)
+        lags.append(time.perf_counter() - t0 - TICK_S)
+
+async def _script(adb, device, args, latencies, stop):
+    """One running script: dumps the UI now and then and moves on to a new screen."""
+    changed_at = time.monotonic()
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await adb.exec_out(device.serial, DUMP_COMMAND)
+        latencies.append(time.perf_counter() - t0)
+        if time.monotonic() - changed_at >= args.change_every:
+            device.frame += 1
+            changed_at = time.monotonic()
+        await asyncio.sleep(args.dump_every)
+
+async def _naive(adb, serials, stop, frames):
+    while not stop.is_set():
+        started = time.monotonic()
+        for png in await asyncio.gather(*(adb.exec_out(serial, SCREENCAP_COMMAND) for serial in serials)):
+            frames.append(make_thumbnail(png))
+        await asyncio.sleep(max(0.0, NAIVE_PERIOD_S - (time.monotonic() - started)))
+
+def _intervals(shots, serials):
+    gaps = [b - a for serial in serials for a, b in zip(shots.get(serial, []), shots.get(serial, [])[1:])]
+    return {"devices_shot": sum(1 for serial in serials if shots.get(serial)),
+            "median_interval_s": round(statistics.median(gaps), 2) if gaps else None}
+
+async def run_mode(mode, args):
+    fleet = await FakeFleet(args.devices, hub_bps=args.hub_mbps * 1e6 / 8).start()
+    adb = RecordingAdb(AdbClient(port=fleet.port))
+    devices = list(fleet.devices.values())
+    serials = [device.serial for device in devices]
+    running = serials[:args.running]
+    visible = serials[max(0, args.running - args.visible // 2):][:args.visible]
+    latencies, lags, stop = [], [], asyncio.Event()
+    tasks = [asyncio.create_task(_ticker(lags, stop))]
+    tasks += [asyncio.create_task(_script(adb, device, args, latencies, stop)) for device in devices[:args.running]]
+
+    capturer, naive_frames = None, []
+    if mode == "budgeted":
+        capturer = ScreenCapturer(adb, lambda serial, image: None)
+        for device in devices:
+            capturer.track(device.serial, transport_key(device.serial, {"usb": device.usb}))
+        for serial in running:
+            capturer.set_active(serial, True)
+        capturer.set_visible(visible)
+        capturer.start()
+    elif mode == "naive":
+        tasks.append(asyncio.create_task(_naive(adb, serials, stop, naive_frames)))
+
+    cpu_before = time.process_time()
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    if capturer is not None:
+        await capturer.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    cpu_s = time.process_time() - cpu_before
+    await fleet.stop()
+
+    shot_bytes = len(fleet.devices[serials[0]].exec_out(SCREENCAP_COMMAND))
+    shots = sum(len(times) for times in adb.shots.values())
+    result = {
+        "mode": mode,
+        "script_dumps": len(latencies),
+        "script_dump_ms": _stats(latencies),
+        "loop_lag_ms": _stats(lags),
+        "process_cpu_s": round(cpu_s, 2),
+        "screenshots": shots,
+        "screenshot_mb_per_s": round(shots * shot_bytes / args.seconds / 1e6, 2),
+    }
+    if capturer is not None:
+        stats = capturer.stats()
+        result.update({
+            "unchanged_skipped": stats["unchanged"],
+            "decoded": stats["decoded"],
+            "decode_cpu_s": stats["decode_cpu_s"],
+            "throttled_ticks": stats["throttled"],
+        })
+    if mode != "off":
+        visible_set, running_set = set(visible), set(running)
+        result["refresh"] = {
+            "visible_running": _intervals(adb.shots, [s for s in visible if s in running_set]),
+            "visible_idle": _intervals(adb.shots, [s for s in visible if s not in running_set]),
+            "running_offscreen": _intervals(adb.shots, [s for s in running if s not in visible_set]),
+            "idle_offscreen": _intervals(adb.shots, [s for s in serials
+                                                     if s not in visible_set and s not in running_set]),
+        }
+    return result
+
+async def main(args):
+    for frame in range(SCREEN_VARIANTS):
+        fake_screen(frame)  # built once, outside the measurements
+    results = []
+    for mode in args.modes:
+        print(f"[bench_screens] {mode}: {args.devices} devices for {args.seconds}s...", file=sys.stderr)
+        results.append(await run_mode(mode, args))
+    return {
+        "benchmark": "screens",
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {key: getattr(args, key) for key in
+                     ("devices", "running", "visible", "hub_mbps", "dump_every", "change_every", "seconds")},
+        "results": results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=300)
+    parser.add_argument("--running", type=int, default=100, help="devices running a script")
+    parser.add_argument("--visible", type=int, default=30, help="devices in the grid's view")
+    parser.add_argument("--hub-mbps", type=float, default=240, help="bandwidth of one USB hub of 10 devices")
+    parser.add_argument("--dump-every", type=float, default=0.5, help="seconds between a script's UI dumps")
+    parser.add_argument("--change-every", type=float, default=1.0, help="seconds between a script's screens")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,91 @@
+# benchmarks/check_import_time.py
+"""
+Import-time budget check for the entry paths of src/main.py.
+
+Runs each path in a fresh interpreter with `-X importtime` and compares the
+total import time and the set of imported modules with
+benchmarks/import_budget.json:
+
+    gui     what `python -m src.main` imports before opening the window
+    worker  a pooled worker from start until it is warm and waiting for a job
+    cli     the headless front end (`python -m src.main run ...`), without Flet
+
+The best of `--runs` cold starts is used. Exits with status 1 if a path is
+over its budget or imports a forbidden module.
+
+    python -m benchmarks.check_import_time --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(BASE_DIR, "benchmarks", "import_budget.json")
+
+PATHS = {
+    "gui": ["-c", "import src.gui"],
+    # With stdin closed the worker prewarms, finds no job and exits.
+    "worker": ["-m", "src.main", "--worker"],
+    "cli": ["-c", "import src.cli"],
+}
+
+def parse_importtime(stderr):
+    """Returns (total µs of top-level imports, {module: cumulative µs}) from `-X importtime` output."""
+    total = 0
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        cumulative = int(cumulative)
+        modules[name.strip()] = cumulative
+        if not name[1:].startswith(" "):
+            total += cumulative
+    return total, modules
+
+def measure(path, runs):
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", *PATHS[path]],
+            cwd=BASE_DIR, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{path} path failed:\n{proc.stderr[-2000:]}")
+        total, modules = parse_importtime(proc.stderr)
+        if best is None or total < best[0]:
+            best = (total, modules)
+    return best
+
+def check(runs):
+    with open(BUDGET_PATH, encoding="utf-8") as f:
+        budgets = json.load(f)
+    report = {}
+    ok = True
+    for path, budget in budgets.items():
+        total, modules = measure(path, runs)
+        forbidden = sorted(name for name in budget.get("forbidden", []) if name in modules)
+        slowest = sorted(
+            (name for name in modules if "." not in name), key=modules.get, reverse=True
+        )[:5]
+        passed = total / 1000 <= budget["max_ms"] and not forbidden
+        ok = ok and passed
+        report[path] = {
+            "import_ms": round(total / 1000, 1),
+            "budget_ms": budget["max_ms"],
+            "modules": len(modules),
+            "forbidden_imported": forbidden,
+            "slowest": {name: round(modules[name] / 1000, 1) for name in slowest},
+            "passed": passed,
+        }
+    return ok, report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per path; the best is used")
+    args = parser.parse_args()
+    ok, report = check(args.runs)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,157 @@
+# benchmarks/fake_adb.py
+"""
+Small stand-in for the ADB server, listening on loopback. It speaks enough of
+the socket protocol (host:version, host:devices, host:track-devices,
+host:transport:<serial> + shell: or exec:) to exercise device discovery without phones; the benchmarks and tests run
+against it.
+
+    python -m benchmarks.fake_adb --port 5038 --devices 20
+"""
+import argparse
+import asyncio
+import inspect
+
+from src.adb_client import encode_request
+from src.device_model import STATE_ONLINE
+
+ADB_SERVER_VERSION = 41
+
+def _payload(text):
+    return encode_request(text)
+
+class FakeAdbServer:
+    """Fake ADB server whose device list is changed from code."""
+    def __init__(self, host="127.0.0.1", port=0, shell_handler=None, exec_handler=None):
+        self.host = host
+        self.port = port
+        self.devices = {}  # serial -> state
+        self.details = {}  # serial -> "usb:1-1.2 model:Pixel_5 ..." for the -l listings
+        # shell_handler(serial, command) -> str, or an awaitable of it to simulate
+        # a slow device; echoes nothing by default
+        self.shell_handler = shell_handler or (lambda serial, command: "")
+        # exec_handler(serial, command) -> bytes (or an awaitable of it); exec: fails without one
+        self.exec_handler = exec_handler
+        self.requests = []
+        self._server = None
+        self._trackers = {}  # writer -> wants the long format
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        for writer in list(self._trackers):
+            writer.close()
+        self._trackers.clear()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    # --- Device list -----------------------------------------------------
+    def device_list(self, long=False):
+        if not long:
+            return "".join(f"{serial}\t{state}\n" for serial, state in self.devices.items())
+        return "".join(
+            f"{serial:<22} {state} {self.details.get(serial, '')}".rstrip() + "\n"
+            for serial, state in self.devices.items()
+        )
+
+    def set_device(self, serial, state=STATE_ONLINE):
+        """Attaches a device or changes its state, notifying track-devices clients."""
+        self.devices[serial] = state
+        self._broadcast()
+
+    def remove_device(self, serial):
+        if self.devices.pop(serial, None) is not None:
+            self._broadcast()
+
+    def _broadcast(self):
+        for writer, long in list(self._trackers.items()):
+            if writer.is_closing():
+                self._trackers.pop(writer, None)
+            else:
+                writer.write(_payload(self.device_list(long)))
+
+    # --- Protocol --------------------------------------------------------
+    async def _read_request(self, reader):
+        length = int(await reader.readexactly(4), 16)
+        request = (await reader.readexactly(length)).decode()
+        self.requests.append(request)
+        return request
+
+    @staticmethod
+    def _fail(writer, message):
+        writer.write(b"FAIL" + _payload(message))
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await self._read_request(reader)
+            if request == "host:version":
+                writer.write(b"OKAY" + _payload(f"{ADB_SERVER_VERSION:04x}"))
+            elif request in ("host:devices", "host:devices-l"):
+                writer.write(b"OKAY" + _payload(self.device_list(request.endswith("-l"))))
+            elif request in ("host:track-devices", "host:track-devices-l"):
+                long = request.endswith("-l")
+                writer.write(b"OKAY" + _payload(self.device_list(long)))
+                self._trackers[writer] = long
+                # Keep the stream open until the client goes away.
+                await reader.read()
+                return
+            elif request.startswith("host:transport:"):
+                await self._handle_transport(request.split(":", 2)[2], reader, writer)
+            else:
+                self._fail(writer, f"unknown host service '{request}'")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down.
+            pass
+        finally:
+            self._trackers.pop(writer, None)
+            writer.close()
+
+    async def _handle_transport(self, serial, reader, writer):
+        state = self.devices.get(serial)
+        if state is None:
+            self._fail(writer, f"device '{serial}' not found")
+            return
+        if state != STATE_ONLINE:
+            self._fail(writer, f"device {state}")
+            return
+        writer.write(b"OKAY")
+        service = await self._read_request(reader)
+        if service.startswith("shell:"):
+            output = self.shell_handler(serial, service[len("shell:"):])
+            if inspect.isawaitable(output):
+                output = await output
+            writer.write(b"OKAY" + output.encode())
+        elif service.startswith("exec:") and self.exec_handler is not None:
+            output = self.exec_handler(serial, service[len("exec:"):])
+            if inspect.isawaitable(output):
+                output = await output
+            writer.write(b"OKAY" + output)
+        else:
+            self._fail(writer, f"unknown service '{service}'")
+
+async def _serve(args):
+    server = FakeAdbServer(port=args.port)
+    for i in range(args.devices):
+        server.devices[f"fake-{i:04d}"] = STATE_ONLINE
+    await server.start()
+    print(f"Fake ADB server with {args.devices} devices on {server.host}:{server.port}")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake ADB server on loopback.")
+    parser.add_argument("--port", type=int, default=5038)
+    parser.add_argument("--devices", type=int, default=10)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
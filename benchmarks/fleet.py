@@ -0,0 +1,161 @@
+# benchmarks/fleet.py
+"""
+Fake devices and a headless page for driving AppLogic without phones or a
+window. The devices sit behind benchmarks.fake_adb.FakeAdbServer and answer the
+device probe like real phones would, and `screencap -p` with a PNG.
+"""
+import asyncio
+import functools
+import random
+import struct
+import time
+import zlib
+
+from src.device_model import STATE_ONLINE
+from src.device_probe import PROBE_COMMAND
+from benchmarks.fake_adb import FakeAdbServer
+
+SCREEN_WIDTH = 720
+SCREEN_HEIGHT = 1600
+DUMP_BYTES = 20_000  # roughly a `uiautomator dump` of a feed
+SCREEN_VARIANTS = 16  # distinct screenshots; frames cycle through them
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+@functools.lru_cache(maxsize=SCREEN_VARIANTS)
+def fake_screen(frame, width=SCREEN_WIDTH, height=SCREEN_HEIGHT, png_bytes=300_000):
+    """
+    An RGB PNG of a phone screen: bands of colour that depend on `frame`,
+    plus a strip of noise sized so the file comes out near `png_bytes`, as
+    real screenshots (photos, video frames) do not compress to nothing.
+    """
+    rng = random.Random(frame)
+    noise_rows = min(height, png_bytes // (width * 3))
+    rows = []
+    for y in range(height - noise_rows):
+        shade = (frame * 37 + y // 200 * 50) % 256
+        rows.append(b"\x00" + bytes((shade, 255 - shade, (shade * 3) % 256)) * width)
+    rows.extend(b"\x00" + rng.randbytes(width * 3) for _ in range(noise_rows))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(b"".join(rows), 1)) + _png_chunk(b"IEND", b""))
+
+class FakeDevice:
+    """One scriptable phone: what it reports and how slow it is."""
+    def __init__(self, serial, model="Pixel 6", android="14", battery=80, screen_on=True,
+                 agent=True, shell_delay_s=0.0, connect_delay_s=0.0, usb="1-1"):
+        self.serial = serial
+        self.model = model
+        self.android = android
+        self.battery = battery
+        self.screen_on = screen_on
+        self.agent = agent
+        self.shell_delay_s = shell_delay_s
+        self.connect_delay_s = connect_delay_s
+        self.usb = usb
+        self.state = STATE_ONLINE
+        self.info = {"productName": model, "sdkInt": android}
+        self.frame = 0  # what is on screen; bump it to change the screenshot
+        self.screen_bytes = 300_000
+
+    def probe_output(self):
+        return (
+            f"{self.model}\n@@\n{self.android}\n@@\n  level: {self.battery}\n@@\n"
+            f"  mWakefulness={'Awake' if self.screen_on else 'Asleep'}\n@@\n"
+            f"{'pong' if self.agent else ''}\n"
+        )
+
+    async def shell(self, command):
+        if self.shell_delay_s:
+            await asyncio.sleep(self.shell_delay_s)
+        if command == PROBE_COMMAND:
+            return self.probe_output()
+        return ""
+
+    def exec_out(self, command):
+        if command.startswith("screencap"):
+            return fake_screen(self.frame % SCREEN_VARIANTS, png_bytes=self.screen_bytes)
+        return b"<node/>" * (DUMP_BYTES // 7)
+
+    def stop_uiautomator(self, wait=True):
+        pass
+
+class FakeFleet:
+    """
+    A set of FakeDevices served by a FakeAdbServer. Devices are spread over
+    USB hubs of `hub_size` ports, so the scheduler's per-transport limit
+    applies as it would on a real rig. With `hub_bps` set, exec: output
+    queues for its hub's bandwidth, as transfers on one real hub do.
+    """
+    def __init__(self, size, hub_size=10, seed=0, hub_bps=None, **device_kwargs):
+        rng = random.Random(seed)
+        self.devices = {}
+        for i in range(size):
+            serial = f"FAKE{i:05d}"
+            kwargs = {"battery": rng.randint(5, 100), **device_kwargs}
+            self.devices[serial] = FakeDevice(serial, usb=f"1-{i // hub_size + 1}.{i % hub_size + 1}", **kwargs)
+        self.hub_bps = hub_bps
+        self._hub_locks = {}
+        self.server = FakeAdbServer(shell_handler=self._shell, exec_handler=self._exec)
+
+    async def _shell(self, serial, command):
+        return await self.devices[serial].shell(command)
+
+    async def _exec(self, serial, command):
+        device = self.devices[serial]
+        output = device.exec_out(command)
+        if self.hub_bps:
+            hub = device.usb.rsplit(".", 1)[0]
+            async with self._hub_locks.setdefault(hub, asyncio.Lock()):
+                await asyncio.sleep(len(output) / self.hub_bps)
+        return output
+
+    async def start(self):
+        for device in self.devices.values():
+            self.server.devices[device.serial] = device.state
+            self.server.details[device.serial] = f"usb:{device.usb} model:{device.model.replace(' ', '_')}"
+        await self.server.start()
+        return self
+
+    async def stop(self):
+        await self.server.stop()
+
+    @property
+    def port(self):
+        return self.server.port
+
+    def connect(self, serial):
+        """Blocking stand-in for uiautomator2.connect, for SessionBroker(connect=...)."""
+        device = self.devices[serial]
+        if device.connect_delay_s:
+            time.sleep(device.connect_delay_s)
+        if not device.agent:
+            raise ConnectionError(f"{serial}: uiautomator2 server not reachable")
+        return device
+
+class HeadlessPage:
+    """
+    Minimal stand-in for ft.Page. It counts updates, and when the device list
+    is sent (or the whole page) it marks the rows in the rendered window as
+    mounted, the way a real page would, so only visible rows send updates.
+    """
+    def __init__(self):
+        self.overlay = []
+        self.list_view = None  # set to AppLogic.device_list_view
+        self.update_calls = 0
+        self.controls_sent = 0
+
+    def update(self, *controls):
+        self.update_calls += 1
+        self.controls_sent += len(controls) or 1
+        if self.list_view is not None and (not controls or self.list_view in controls):
+            self._mount(self.list_view)
+
+    def _mount(self, list_view):
+        visible = {id(c) for c in list_view.controls}
+        for widget in list_view.widgets:
+            widget.page = self if id(widget) in visible else None
+
+    def run_task(self, handler, *args):
+        return asyncio.ensure_future(handler(*args))
@@ -0,0 +1,44 @@
+# benchmarks/synthetic_script.py
+"""
+Stand-in for a device script that produces a configurable amount of output
+without touching a phone. Settings come from the environment, which the
+benchmark sets before the worker pool starts:
+
+    BENCH_LINES          stdout lines per run (default 50)
+    BENCH_LINE_BYTES     length of each line (default 80)
+    BENCH_INTERVAL_S     pause between lines (default 0.01)
+    BENCH_STDERR_EVERY   every Nth line also goes to stderr, 0 for none (default 10)
+    BENCH_STEPS          progress step events per run (default 10)
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "scripts"))
+
+from utils import progress
+
+def _env(name, default, cast=int):
+    return cast(os.environ.get(name, default))
+
+def main(device_id):
+    lines = _env("BENCH_LINES", 50)
+    line_bytes = _env("BENCH_LINE_BYTES", 80)
+    interval = _env("BENCH_INTERVAL_S", 0.01, float)
+    stderr_every = _env("BENCH_STDERR_EVERY", 10)
+    steps = max(1, min(_env("BENCH_STEPS", 10), lines))
+
+    progress.phase("work")
+    filler = "x" * max(0, line_bytes - len(device_id) - 16)
+    for i in range(lines):
+        print(f"[{device_id}] line {i:05d} {filler}")
+        if stderr_every and i % stderr_every == stderr_every - 1:
+            print(f"[{device_id}] warning {i:05d}", file=sys.stderr)
+        if (i + 1) % (lines // steps or 1) == 0:
+            progress.step(min(steps, (i + 1) * steps // lines), steps, "Line")
+        if interval:
+            time.sleep(interval)
+    progress.result("ok")
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "bench")
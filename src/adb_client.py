@@ -0,0 +1,130 @@
+# src/adb_client.py
+import asyncio
+import os
+
+from src.device_model import parse_adb_devices
+
+ADB_HOST = "127.0.0.1"
+ADB_PORT = int(os.environ.get("ANDROID_ADB_SERVER_PORT", 5037))
+
+class AdbError(Exception):
+    """Raised when the ADB server answers a request with FAIL."""
+
+def encode_request(request):
+    """Frames a request the way the ADB server expects it: 4 hex digits of length, then the payload."""
+    data = request.encode()
+    return b"%04x" % len(data) + data
+
+async def read_payload(reader):
+    """Reads one length-prefixed payload (4 hex digits + data)."""
+    length = int(await reader.readexactly(4), 16)
+    return (await reader.readexactly(length)).decode(errors="replace")
+
+async def read_status(reader):
+    """Reads an OKAY/FAIL status. A FAIL is raised as AdbError with the server's message."""
+    status = await reader.readexactly(4)
+    if status == b"OKAY":
+        return
+    if status == b"FAIL":
+        raise AdbError(await read_payload(reader))
+    raise AdbError(f"Unexpected ADB server response: {status!r}")
+
+class AdbClient:
+    """
+    Minimal client for the ADB server's socket protocol. Talking to the server
+    directly avoids spawning an `adb` process for every query.
+    """
+    def __init__(self, host=ADB_HOST, port=ADB_PORT):
+        self.host = host
+        self.port = port
+
+    async def _open(self, request):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(encode_request(request))
+            await writer.drain()
+            await read_status(reader)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def version(self):
+        reader, writer = await self._open("host:version")
+        try:
+            return int(await read_payload(reader), 16)
+        finally:
+            writer.close()
+
+    async def devices(self, long=False):
+        """
+        Returns {serial: state} for every device the server knows about. With
+        `long`, returns ({serial: state}, {serial: details}) from `devices -l`.
+        """
+        reader, writer = await self._open("host:devices-l" if long else "host:devices")
+        try:
+            return self._parse_list(await read_payload(reader), long)
+        finally:
+            writer.close()
+
+    async def track_devices(self, long=False):
+        """
+        Yields the device list right away and then again every time the server
+        reports a change, until the connection is closed. Items have the same
+        shape as the result of `devices(long)`.
+        """
+        reader, writer = await self._open("host:track-devices-l" if long else "host:track-devices")
+        try:
+            while True:
+                try:
+                    payload = await read_payload(reader)
+                except asyncio.IncompleteReadError:
+                    return
+                yield self._parse_list(payload, long)
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_list(payload, long):
+        if not long:
+            return parse_adb_devices(payload, has_header=False)
+        details = {}
+        devices = parse_adb_devices(payload, has_header=False, details=details)
+        return devices, details
+
+    async def open_transport(self, serial, service):
+        """Switches a connection to `serial` and opens `service` on it (e.g. "shell:ls")."""
+        reader, writer = await self._open(f"host:transport:{serial}")
+        try:
+            writer.write(encode_request(service))
+            await writer.drain()
+            await read_status(reader)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def shell(self, serial, command):
+        """Runs a shell command on the device and returns its output."""
+        reader, writer = await self.open_transport(serial, f"shell:{command}")
+        try:
+            return (await reader.read()).decode(errors="replace")
+        finally:
+            writer.close()
+
+    async def exec_out(self, serial, command):
+        """Runs a command without a terminal and returns its raw output, e.g. the PNG of `screencap -p`."""
+        reader, writer = await self.open_transport(serial, f"exec:{command}")
+        try:
+            return await reader.read()
+        finally:
+            writer.close()
+
+async def start_adb_server():
+    """Starts the local ADB server if it is not running yet."""
+    proc = await asyncio.create_subprocess_exec(
+        'adb', 'start-server',
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    await proc.communicate()
+    return proc.returncode == 0
@@ -0,0 +1,367 @@
+# src/api_server.py
+"""
+Local HTTP/WebSocket API of the Orchestrator, on asyncio streams and the
+standard library only (like the ADB client).
+
+    GET  /health                 {"ok": true, "devices": n, "online": n, "running": n, "queued": n,
+                                  "max_concurrent": n}
+    GET  /devices?filter=Q       every known device (or those matching filter Q) with state, tags, probe info and run
+    GET  /scripts                runnable scripts with display names
+    GET  /runs                   current or last run of every device
+    GET  /runs/<serial>?log=N    one run, with the last N output lines
+    POST /runs                   {"script": s, "devices": [serials] | "all"} -> queued (with run ids) and skipped
+    POST /stop                   {"devices": [serials] | "all"} -> stop latency per device
+                                 (both also take {"group": name} or {"filter": q} instead of "devices")
+    GET  /groups                 saved device groups, {name: [serials]}
+    POST /groups                 {"name": n, "devices": [serials]} saves a group, {"name": n, "delete": true} drops it
+    POST /tags                   {"devices": [serials], "add": [tags], "remove": [tags]} -> tags of those devices
+    GET  /history/runs?device=S&limit=N     the device's last runs from the run history
+    GET  /history/scripts?days=N            failure rate per script
+    GET  /history/devices?days=N&limit=N    devices by average run time, slowest first
+    GET  /logs/search?q=TEXT&device=S&limit=N   output lines of past runs matching TEXT, and per-device counts
+    GET  /events?output=1        WebSocket stream of the Orchestrator's events
+                                 (script output lines only with output=1)
+
+Responses are JSON. Every request uses its own connection.
+"""
+import asyncio
+import base64
+import collections
+import hashlib
+import json
+import struct
+import time
+import urllib.parse
+
+from src.scheduler import PRIORITY_BATCH, PRIORITY_MANUAL
+
+DEFAULT_API_HOST = "127.0.0.1"
+DEFAULT_API_PORT = 8765
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+# Events buffered per WebSocket client before it counts as lagging and
+# events are dropped for it.
+MAX_PENDING_EVENTS = 10_000
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_TEXT, WS_CLOSE, WS_PING, WS_PONG = 0x1, 0x8, 0x9, 0xA
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def ws_frame(opcode, payload):
+    """Encodes one unmasked (server to client) WebSocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+async def read_ws_frame(reader):
+    """Reads one client frame. Returns (opcode, payload)."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    if length > MAX_BODY_BYTES:
+        raise ApiError(413, "frame too large")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return first & 0x0F, payload
+
+class _EventClient:
+    """One WebSocket subscriber with its own bounded backlog."""
+    def __init__(self, writer, with_output):
+        self.writer = writer
+        self.with_output = with_output
+        self.pending = collections.deque()
+        self.dropped = 0
+        self.wakeup = asyncio.Event()
+
+    def push(self, event):
+        if event["type"] == "output" and not self.with_output:
+            return
+        if len(self.pending) >= MAX_PENDING_EVENTS:
+            self.dropped += 1
+            return
+        self.pending.append(event)
+        self.wakeup.set()
+
+    async def send_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            if self.dropped:
+                self.writer.write(ws_frame(WS_TEXT, _dumps({"type": "lagged", "dropped": self.dropped}).encode()))
+                self.dropped = 0
+            while self.pending:
+                self.writer.write(ws_frame(WS_TEXT, _dumps(self.pending.popleft()).encode()))
+            await self.writer.drain()
+
+class ApiServer:
+    """Serves the API of `core` (an Orchestrator) on `host`:`port`; loopback only by default."""
+    def __init__(self, core, host=DEFAULT_API_HOST, port=DEFAULT_API_PORT):
+        self.core = core
+        self.host = host
+        self.port = port
+        self._server = None
+        self._clients = set()
+        core.subscribe(self._on_event)
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"[ApiServer] Listening on http://{self.host}:{self.port}")
+        return self
+
+    async def stop(self):
+        self.core.unsubscribe(self._on_event)
+        if self._server is not None:
+            self._server.close()
+            for client in list(self._clients):
+                client.writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _on_event(self, event):
+        for client in self._clients:
+            client.push(event)
+
+    # --- HTTP ------------------------------------------------------------
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        if len(head) > MAX_HEADER_BYTES:
+            raise ApiError(413, "headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, urllib.parse.urlsplit(target), headers, body
+
+    def _respond(self, writer, status, payload):
+        body = _dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode() + body
+        )
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, url, headers, body = await self._read_request(reader)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                raise ApiError(400, "malformed request")
+            if url.path == "/events" and headers.get("upgrade", "").lower() == "websocket":
+                await self._serve_events(reader, writer, headers, urllib.parse.parse_qs(url.query))
+                return
+            status, payload = 200, await self._route(method, url, body)
+        except ApiError as e:
+            status, payload = e.status, {"error": str(e)}
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        except Exception as e:
+            print(f"[ApiServer] Request failed: {e}")
+            status, payload = 500, {"error": str(e)}
+        try:
+            self._respond(writer, status, payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _json_body(body):
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise ApiError(400, "body is not JSON")
+        if not isinstance(data, dict):
+            raise ApiError(400, "body must be a JSON object")
+        return data
+
+    def _serials(self, data):
+        try:
+            if "group" in data:
+                return self.core.group_devices(data["group"])
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        if "filter" in data:
+            if not isinstance(data["filter"], str):
+                raise ApiError(400, '"filter" must be a string')
+            return self.core.find_devices(data["filter"])
+        devices = data.get("devices")
+        if devices == "all":
+            return list(self.core.device_model.devices)
+        if not isinstance(devices, list) or not all(isinstance(s, str) for s in devices):
+            raise ApiError(400, '"devices" must be a list of serials or "all"')
+        # A serial listed twice is one device; keep the first place it was listed.
+        return list(dict.fromkeys(devices))
+
+    async def _route(self, method, url, body):
+        path = url.path.rstrip("/") or "/"
+        query = urllib.parse.parse_qs(url.query)
+        core = self.core
+        if method == "GET":
+            if path == "/health":
+                return {"ok": True, "devices": len(core.device_model), "online": len(core.online_devices()),
+                        "running": core.scheduler.running, "queued": core.scheduler.queue_depth,
+                        "max_concurrent": core.scheduler.max_concurrent}
+            if path == "/devices":
+                return [core.device_summary(serial) for serial in core.find_devices(query.get("filter", [""])[0])]
+            if path == "/groups":
+                return core.device_tags.groups
+            if path == "/scripts":
+                return [{"script": s, "display_name": core.script_registry.get(s).display_name}
+                        for s in core.scripts]
+            if path == "/runs":
+                return [run.to_dict() for run in core.runs.values()]
+            if path == "/logs/search":
+                return await self._search_logs(query)
+            if path.startswith("/history/"):
+                return await self._history(path, query)
+            if path.startswith("/runs/"):
+                run = core.runs.get(urllib.parse.unquote(path[len("/runs/"):]))
+                if run is None:
+                    raise ApiError(404, "no run on this device")
+                try:
+                    log_lines = int(query.get("log", ["0"])[0])
+                except ValueError:
+                    raise ApiError(400, "log must be a number")
+                return run.to_dict(log_lines=log_lines)
+        elif method == "POST":
+            data = self._json_body(body)
+            if path == "/runs":
+                script = data.get("script")
+                priority = PRIORITY_MANUAL if data.get("priority") == "manual" else PRIORITY_BATCH
+                serials = self._serials(data)
+                try:
+                    skipped = core.submit(script, serials, priority)
+                except ValueError as e:
+                    raise ApiError(400, str(e))
+                queued = [s for s in serials if s not in skipped]
+                return {"queued": queued, "run_ids": {s: core.runs[s].run_id for s in queued}, "skipped": skipped}
+            if path == "/stop":
+                results = await core.stop(self._serials(data))
+                return {"stopped": [{"serial": r.serial, "latency_s": round(r.total_s, 3), "killed": r.forced,
+                                     "cleanup_error": r.cleanup_error} for r in results]}
+            if path in ("/tags", "/groups"):
+                return self._change_tags(path, data)
+        else:
+            raise ApiError(405, f"method {method} not allowed")
+        raise ApiError(404, f"no such endpoint: {method} {path}")
+
+    def _change_tags(self, path, data):
+        core = self.core
+        try:
+            if path == "/tags":
+                serials = self._serials(data)
+                add, remove = data.get("add") or [], data.get("remove") or []
+                if not isinstance(add, list) or not isinstance(remove, list):
+                    raise ApiError(400, '"add" and "remove" must be lists of tags')
+                core.change_tags(serials, add, remove)
+                return {serial: core.device_tags.tags_of(serial) for serial in serials}
+            name = data.get("name")
+            if not isinstance(name, str):
+                raise ApiError(400, '"name" is required')
+            if data.get("delete"):
+                core.delete_group(name)
+            else:
+                core.save_group(name, self._serials(data))
+            return core.device_tags.groups
+        except ValueError as e:
+            raise ApiError(400, str(e))
+
+    async def _history(self, path, query):
+        history = self.core.history
+        if history is None:
+            raise ApiError(404, "run history is off")
+        try:
+            limit = int(query.get("limit", ["20"])[0])
+            days = float(query.get("days", ["0"])[0])
+        except ValueError:
+            raise ApiError(400, "limit and days must be numbers")
+        since = time.time() - days * 86400 if days else None
+        # The queries read the database; keep them off the event loop.
+        if path == "/history/runs":
+            device = query.get("device", [None])[0]
+            if not device:
+                raise ApiError(400, "device is required")
+            return await asyncio.to_thread(history.last_runs, device, limit)
+        if path == "/history/scripts":
+            return await asyncio.to_thread(history.failure_rates, since)
+        if path == "/history/devices":
+            return await asyncio.to_thread(history.slowest_devices, limit, since)
+        raise ApiError(404, f"no such endpoint: GET {path}")
+
+    async def _search_logs(self, query):
+        if self.core.log_index is None:
+            raise ApiError(404, "log index is off")
+        text = query.get("q", [""])[0]
+        if not text.strip():
+            raise ApiError(400, "q is required")
+        try:
+            limit = int(query.get("limit", ["100"])[0])
+        except ValueError:
+            raise ApiError(400, "limit must be a number")
+        return await asyncio.to_thread(self.core.log_index.search, text, limit, query.get("device", [None])[0])
+
+    # --- WebSocket -------------------------------------------------------
+    async def _serve_events(self, reader, writer, headers, query):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            raise ApiError(400, "missing Sec-WebSocket-Key")
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        client = _EventClient(writer, query.get("output", ["0"])[0] not in ("0", ""))
+        # A snapshot first, so the client can follow the events from a known state.
+        client.push({"type": "hello", "devices": [self.core.device_summary(s) for s in self.core.device_model.devices],
+                     "queue": {"running": self.core.scheduler.running, "queued": self.core.scheduler.queue_depth}})
+        self._clients.add(client)
+        sender = asyncio.create_task(client.send_loop())
+        try:
+            while True:
+                receive = asyncio.ensure_future(read_ws_frame(reader))
+                done, _ = await asyncio.wait({receive, sender}, return_when=asyncio.FIRST_COMPLETED)
+                if sender in done:
+                    receive.cancel()
+                    break
+                opcode, payload = receive.result()
+                if opcode == WS_CLOSE:
+                    writer.write(ws_frame(WS_CLOSE, payload[:2]))
+                    break
+                if opcode == WS_PING:
+                    writer.write(ws_frame(WS_PONG, payload))
+        except (asyncio.IncompleteReadError, ConnectionError, ApiError):
+            pass
+        finally:
+            self._clients.discard(client)
+            if sender.done() and not sender.cancelled():
+                sender.exception()  # the connection broke while sending
+            sender.cancel()
+            writer.close()
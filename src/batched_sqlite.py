@@ -0,0 +1,125 @@
+# src/batched_sqlite.py
+import abc
+import asyncio
+import sqlite3
+import threading
+
+DEFAULT_FLUSH_INTERVAL_S = 0.5
+DEFAULT_FLUSH_BATCH = 500  # queued rows that trigger a write before the interval is up
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 5000")
+    return conn
+
+class BatchedSqlite(abc.ABC):
+    """
+    A SQLite database in WAL mode that is written in batches off the event
+    loop. `_queue()` only appends a row on the loop; a background task hands
+    the queued rows to `_write_batch(conn, rows)` in a worker thread every
+    `flush_interval` seconds (or every `flush_batch` rows), one transaction
+    per batch and one batch at a time. Reads go through a second connection
+    with `_query()`, which is synchronous; call it through `asyncio.to_thread`
+    from the event loop.
+    """
+    def __init__(self, path, schema, flush_interval=DEFAULT_FLUSH_INTERVAL_S, flush_batch=DEFAULT_FLUSH_BATCH):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._writer = connect(path)
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        # WAL keeps committed data safe on a crash; only the last batches may be lost on power loss.
+        self._writer.execute("PRAGMA synchronous = NORMAL")
+        self._writer.executescript(schema)
+        self._reader = connect(path)
+        self._read_lock = threading.Lock()
+        self._pending = []
+        self._queued = 0  # rows ever queued
+        self._taken = 0  # of those, rows handed to a batch
+        self._write_lock = asyncio.Lock()  # one batch at a time on the writer connection
+        self._wakeup = None
+        self._flusher = None
+        self._closing = False
+        self.written = 0
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def _queue(self, row):
+        self._pending.append(row)
+        self._queued += 1
+        if self._flusher is None:
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if len(self._pending) >= self.flush_batch:
+            self._wakeup.set()
+
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Writes the queued rows now, including any queued while it waits."""
+        await self._flush(None)
+
+    async def flush_queued(self):
+        """
+        Writes the rows queued before the call. Rows queued while it waits
+        are left to the background flusher, so a busy writer cannot keep it
+        waiting for a growing backlog.
+        """
+        await self._flush(self._queued)
+
+    async def _flush(self, upto):
+        async with self._write_lock:
+            while self._pending:
+                if upto is None:
+                    rows, self._pending = self._pending, []
+                else:
+                    count = upto - self._taken
+                    if count <= 0:
+                        break
+                    rows, self._pending = self._pending[:count], self._pending[count:]
+                self._taken += len(rows)
+                try:
+                    await asyncio.to_thread(self._write, rows)
+                except sqlite3.Error as e:
+                    print(f"[{type(self).__name__}] Could not write {len(rows)} row(s): {e}")
+
+    def _write(self, rows):
+        conn = self._writer
+        conn.execute("BEGIN")
+        try:
+            self._write_batch(conn, rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.written += len(rows)
+
+    @abc.abstractmethod
+    def _write_batch(self, conn, rows):
+        """Writes `rows` with `conn`, inside the batch's transaction."""
+
+    async def close(self):
+        """Writes what is still queued and closes the database."""
+        self._closing = True
+        if self._flusher is not None:
+            # Not cancelled: a batch may be in the middle of its transaction.
+            self._wakeup.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+        self._writer.close()
+        self._reader.close()
+
+    def _query(self, sql, params=()):
+        with self._read_lock:
+            return [dict(row) for row in self._reader.execute(sql, params)]
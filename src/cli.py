@@ -0,0 +1,418 @@
+# src/cli.py
+"""
+Headless front end of the Orchestrator, for hosts without a display.
+
+    python -m src.main devices [--json]
+    python -m src.main scripts
+    python -m src.main run reels.py --devices SERIAL [SERIAL ...] [--verbose] [--json results.json]
+    python -m src.main run reels.py --all
+    python -m src.main run reels.py --group hub3 | --filter "tag:lab android:13"
+    python -m src.main serve [--host 127.0.0.1] [--port 8765]
+    python -m src.main history [--device SERIAL | --failures | --slowest] [--days N]
+    python -m src.main search "ZeroDivisionError" [--device SERIAL] [--limit N]
+    python -m src.main tag SERIAL [SERIAL ...] [--add TAG ...] [--remove TAG ...]
+    python -m src.main group [NAME [--set SERIAL ... | --delete]]
+
+With `--agents host[:port] ...`, `devices` and `run` work on the agents
+(hosts running `serve`) through a Coordinator instead of the local ADB
+server, and `run --count N` picks N idle devices on the least loaded agents.
+
+Results go to stdout, one line per device; the app's log lines go to
+stderr. `run` exits with 0 if every device finished, 1 if any failed,
+was stopped or skipped, and 130 if interrupted (its runs are stopped first).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import sys
+import time
+
+from src.adb_client import AdbClient, AdbError, ADB_HOST, ADB_PORT
+from src.api_server import ApiServer, DEFAULT_API_HOST, DEFAULT_API_PORT
+from src.coordinator import Coordinator, AgentError, RUN_LOST
+from src.orchestrator import (
+    Orchestrator, SCRIPT_DIR, LOG_DIR, HISTORY_PATH, LOG_INDEX_PATH, DEVICES_PATH, ACTIVE_RUN_STATES, RUN_FINISHED,
+)
+from src.device_tags import DeviceTags
+from src.log_index import LogIndex
+from src.run_history import RunHistory
+
+def _make_core(args, read_only=False):
+    """The Orchestrator for a command; `read_only` ones run no scripts, so they open no databases."""
+    core = Orchestrator(
+        script_dir=args.script_dir,
+        log_dir=None if args.no_log_files or read_only else LOG_DIR,
+        adb=AdbClient(args.adb_host, args.adb_port),
+        echo_output=getattr(args, "verbose", False),
+        history_path=None if args.no_history or read_only else HISTORY_PATH,
+        log_index_path=None if args.no_log_index or read_only else LOG_INDEX_PATH,
+        devices_path=args.devices_file,
+    )
+    if getattr(args, "max_concurrent", None):
+        core.scheduler.max_concurrent = args.max_concurrent
+        core.session_broker.max_workers = args.max_concurrent
+    if getattr(args, "max_per_transport", None):
+        core.scheduler.max_per_transport = args.max_per_transport
+    return core
+
+def _interrupted():
+    """An event set on SIGINT/SIGTERM, so runs can be stopped before exiting."""
+    event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for name in ("SIGINT", "SIGTERM"):
+        try:
+            loop.add_signal_handler(getattr(signal, name), event.set)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+    return event
+
+async def cmd_devices(args, out):
+    if args.agents and args.filter:
+        print("--filter works on the local ADB server only", file=sys.stderr)
+        return 2
+    if args.agents:
+        return await _cluster_devices(args, out)
+    core = _make_core(args, read_only=True)
+    try:
+        await core.scan()
+        online = core.online_devices()
+        await asyncio.gather(*(core.prober.probe(serial) for serial in online))
+        devices = [core.device_summary(serial) for serial in core.find_devices(args.filter or "")]
+    finally:
+        await core.shutdown()
+    if args.json:
+        out.write(json.dumps(devices, indent=2) + "\n")
+        return 0
+    for device in devices:
+        info = core.prober.cache.get(device["serial"])
+        tags = " ".join(f"#{tag}" for tag in device["tags"])
+        out.write(f"{device['serial']}\t{device['state']}\t{info.summary() if info else ''}\t{tags}\n")
+    return 0
+
+async def cmd_scripts(args, out):
+    core = _make_core(args, read_only=True)
+    try:
+        for script in core.load_scripts():
+            out.write(f"{script}\t{core.script_registry.get(script).display_name}\n")
+    finally:
+        await core.shutdown()
+    return 0
+
+async def cmd_run(args, out):
+    if args.agents and (args.group or args.filter):
+        print("--group and --filter work on the local ADB server only", file=sys.stderr)
+        return 2
+    if args.agents:
+        return await _cluster_run(args, out)
+    if args.count:
+        print("--count needs --agents", file=sys.stderr)
+        return 2
+    core = _make_core(args)
+    if args.script not in core.load_scripts():
+        await core.shutdown()
+        print(f"Unknown script: {args.script}", file=sys.stderr)
+        return 2
+    try:
+        await core.scan()
+        # Follow detaches while running; probes are not needed here.
+        await core.start(probe=False, watch_scripts=False)
+        if args.all:
+            serials = core.online_devices()
+        elif args.group:
+            serials = core.group_devices(args.group)
+        elif args.filter:
+            # The filter can name probed fields (model, android).
+            await asyncio.gather(*(core.prober.probe(serial) for serial in core.online_devices()))
+            serials = core.find_devices(args.filter)
+        else:
+            serials = args.devices
+    except BaseException:
+        await core.shutdown()
+        raise
+
+    pending = set()
+    all_done = asyncio.Event()
+    def on_event(event):
+        if event["type"] != "run" or event["serial"] not in pending or event["state"] in ACTIVE_RUN_STATES:
+            return
+        pending.discard(event["serial"])
+        took = (event["finished_at"] - event["started_at"]) if event["started_at"] else 0.0
+        out.write(f"{event['serial']}\t{event['state']}\t{took:.1f}s\t{event['status']}\n")
+        out.flush()
+        if not pending:
+            all_done.set()
+    core.subscribe(on_event)
+
+    started = time.perf_counter()
+    interrupted = _interrupted()
+    try:
+        skipped = core.submit(args.script, serials)
+        pending.update(serial for serial in serials if serial not in skipped)
+        for serial, reason in skipped.items():
+            out.write(f"{serial}\tskipped\t-\t{reason}\n")
+        if pending:
+            waiters = [asyncio.ensure_future(all_done.wait()), asyncio.ensure_future(interrupted.wait())]
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in waiters:
+                waiter.cancel()
+            if interrupted.is_set():
+                print("Interrupted, stopping runs...", file=sys.stderr)
+                await core.stop(list(pending))
+    finally:
+        await core.shutdown()
+
+    runs = [core.runs[serial] for serial in serials if serial in core.runs]
+    finished = sum(1 for run in runs if run.state == RUN_FINISHED)
+    print(f"{finished}/{len(serials)} finished, {len(skipped)} skipped "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"script": args.script, "runs": [run.to_dict(log_lines=args.log_lines) for run in runs],
+                       "skipped": skipped}, f, indent=2)
+    if interrupted.is_set():
+        return 130
+    return 0 if finished == len(serials) else 1
+
+async def _cluster_devices(args, out):
+    coordinator = await Coordinator(args.agents).start(follow=False)
+    devices = coordinator.inventory()
+    if args.json:
+        out.write(json.dumps({"agents": [node.to_dict() for node in coordinator.nodes.values()],
+                              "devices": devices}, indent=2) + "\n")
+    else:
+        for device in devices:
+            info = device.get("info") or {}
+            out.write(f"{device['id']}\t{device['state']}\t{info.get('model') or ''}\n")
+    return 0 if all(node.reachable for node in coordinator.nodes.values()) else 1
+
+async def _cluster_run(args, out):
+    coordinator = await Coordinator(args.agents).start()
+    interrupted = _interrupted()
+    started = time.perf_counter()
+    try:
+        submitted = await coordinator.submit(
+            args.script, ids="all" if args.all else args.devices, count=args.count)
+        for device_id, reason in submitted["skipped"].items():
+            out.write(f"{device_id}\tskipped\t-\t{reason}\n")
+        def on_event(event):
+            if event["type"] == "run" and submitted["run_ids"].get(event.get("id")) == event["run_id"] \
+                    and event["state"] not in ACTIVE_RUN_STATES:
+                took = (event["finished_at"] - event["started_at"]) if event["started_at"] else 0.0
+                out.write(f"{event['id']}\t{event['state']}\t{took:.1f}s\t{event['status']}\n")
+                out.flush()
+        coordinator.subscribe(on_event)
+        waiter = asyncio.ensure_future(coordinator.wait(submitted))
+        stopper = asyncio.ensure_future(interrupted.wait())
+        await asyncio.wait([waiter, stopper], return_when=asyncio.FIRST_COMPLETED)
+        if interrupted.is_set():
+            print("Interrupted, stopping runs...", file=sys.stderr)
+            await coordinator.stop(submitted["queued"])
+            waiter.cancel()
+            return 130
+        stopper.cancel()
+        runs = waiter.result()
+        for device_id, run in runs.items():
+            if run["state"] == RUN_LOST:
+                out.write(f"{device_id}\t{RUN_LOST}\t-\t{run['status']}\n")
+    finally:
+        await coordinator.shutdown()
+
+    finished = sum(1 for run in runs.values() if run["state"] == RUN_FINISHED)
+    wanted = args.count or len(submitted["queued"]) + len(submitted["skipped"])
+    print(f"{finished}/{wanted} finished on {len(submitted['placement'])} agent(s) "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"script": args.script, "placement": submitted["placement"], "runs": runs,
+                       "skipped": submitted["skipped"]}, f, indent=2)
+    return 0 if finished == wanted else 1
+
+async def cmd_serve(args, out):
+    core = _make_core(args)
+    core.load_scripts()
+    await core.start()
+    server = await ApiServer(core, args.host, args.port).start()
+    if args.host not in ("127.0.0.1", "localhost", "::1"):
+        print(f"[ApiServer] Warning: the API has no authentication and listens on {args.host}", file=sys.stderr)
+    try:
+        await _interrupted().wait()
+    finally:
+        await server.stop()
+        await core.shutdown()
+    return 0
+
+async def cmd_history(args, out):
+    if not os.path.exists(args.db):
+        print(f"No run history at {args.db}", file=sys.stderr)
+        return 1
+    history = RunHistory(args.db)
+    try:
+        since = time.time() - args.days * 86400 if args.days else None
+        if args.failures:
+            rows = history.failure_rates(since)
+            columns = ("script", "runs", "failures", "failure_rate")
+        elif args.slowest:
+            rows = history.slowest_devices(args.limit, since)
+            columns = ("serial", "runs", "avg_s", "max_s")
+        elif args.device:
+            rows = history.last_runs(args.device, args.limit)
+            columns = ("finished_at", "script", "state", "duration_s", "status")
+        else:
+            print("Pass --device SERIAL, --failures or --slowest", file=sys.stderr)
+            return 2
+    finally:
+        await history.close()
+    if args.json:
+        out.write(json.dumps(rows, indent=2) + "\n")
+        return 0
+    for row in rows:
+        values = []
+        for column in columns:
+            value = row[column]
+            if column == "finished_at":
+                value = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(value))
+            elif isinstance(value, float):
+                value = f"{value:.3f}"
+            values.append(str(value))
+        out.write("\t".join(values) + "\n")
+    return 0
+
+async def cmd_tag(args, out):
+    tags = DeviceTags(args.devices_file)
+    if args.add or args.remove:
+        tags.change_tags(args.serials, args.add or (), args.remove or ())
+    for serial in args.serials:
+        out.write(f"{serial}\t{' '.join(tags.tags_of(serial))}\n")
+    return 0
+
+async def cmd_group(args, out):
+    tags = DeviceTags(args.devices_file)
+    if args.name is None:
+        for name, serials in sorted(tags.groups.items()):
+            out.write(f"{name}\t{len(serials)}\n")
+        return 0
+    if args.delete:
+        tags.delete_group(args.name)
+        return 0
+    if args.set:
+        tags.save_group(args.name, args.set)
+    for serial in tags.group(args.name):
+        out.write(serial + "\n")
+    return 0
+
+async def cmd_search(args, out):
+    if not os.path.exists(args.db):
+        print(f"No log index at {args.db}", file=sys.stderr)
+        return 1
+    index = LogIndex(args.db)
+    try:
+        result = index.search(" ".join(args.text), args.limit, args.device)
+    finally:
+        await index.close()
+    if args.json:
+        out.write(json.dumps(result, indent=2) + "\n")
+        return 0
+    for line in reversed(result["lines"]):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(line["ts"]))
+        out.write(f"{stamp}\t{line['serial']}\t{line['text']}\n")
+    more = "+" if result["truncated"] else ""
+    print(f"{sum(d['matches'] for d in result['devices'])}{more} matches on {len(result['devices'])} device(s) "
+          f"in {result['elapsed_ms']:.1f} ms", file=sys.stderr)
+    return 0 if result["lines"] else 1
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.main", description="Run the phone fleet without the window.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--adb-host", default=ADB_HOST)
+    common.add_argument("--adb-port", type=int, default=ADB_PORT)
+    common.add_argument("--script-dir", default=SCRIPT_DIR)
+    common.add_argument("--no-log-files", action="store_true", help="keep run output in memory only")
+    common.add_argument("--no-history", action="store_true", help="do not record runs in the run history")
+    common.add_argument("--no-log-index", action="store_true", help="do not index script output for search")
+    common.add_argument("--devices-file", default=DEVICES_PATH, help="where device tags and groups are kept")
+    cluster = argparse.ArgumentParser(add_help=False)
+    cluster.add_argument("--agents", nargs="+", metavar="[NAME=]HOST[:PORT]",
+                         help="work on these agents instead of the local ADB server")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    devices = commands.add_parser("devices", parents=[common, cluster], help="list devices with their probe results")
+    devices.add_argument("--filter", metavar="QUERY", help='only matching devices, e.g. "tag:hub3 android:13"')
+    devices.add_argument("--json", action="store_true")
+    devices.set_defaults(handler=cmd_devices)
+
+    scripts = commands.add_parser("scripts", parents=[common], help="list the runnable scripts")
+    scripts.set_defaults(handler=cmd_scripts)
+
+    run = commands.add_parser("run", parents=[common, cluster], help="run a script on devices and wait for the results")
+    run.add_argument("script", help="script file name, e.g. reels.py")
+    targets = run.add_mutually_exclusive_group(required=True)
+    targets.add_argument("--devices", nargs="+", metavar="SERIAL")
+    targets.add_argument("--all", action="store_true", help="every online device")
+    targets.add_argument("--group", metavar="NAME", help="the devices of a saved group")
+    targets.add_argument("--filter", metavar="QUERY", help='the devices matching a filter, e.g. "tag:hub3"')
+    targets.add_argument("--count", type=int, help="this many idle devices, placed by agent load (with --agents)")
+    run.add_argument("--max-concurrent", type=int)
+    run.add_argument("--max-per-transport", type=int)
+    run.add_argument("--verbose", action="store_true", help="print the scripts' output")
+    run.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    run.add_argument("--log-lines", type=int, default=50, help="output lines per device in the JSON")
+    run.set_defaults(handler=cmd_run)
+
+    serve = commands.add_parser("serve", parents=[common], help="serve the HTTP/WebSocket API")
+    serve.add_argument("--host", default=DEFAULT_API_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_API_PORT)
+    serve.set_defaults(handler=cmd_serve)
+
+    history = commands.add_parser("history", help="query the run history")
+    history.add_argument("--db", default=HISTORY_PATH)
+    query = history.add_mutually_exclusive_group()
+    query.add_argument("--device", metavar="SERIAL", help="the last runs of one device")
+    query.add_argument("--failures", action="store_true", help="failure rate per script")
+    query.add_argument("--slowest", action="store_true", help="devices by average run time")
+    history.add_argument("--days", type=float, help="only runs of the last N days")
+    history.add_argument("--limit", type=int, default=20)
+    history.add_argument("--json", action="store_true")
+    history.set_defaults(handler=cmd_history)
+
+    tag = commands.add_parser("tag", help="show or change device tags")
+    tag.add_argument("serials", nargs="+", metavar="SERIAL")
+    tag.add_argument("--add", nargs="+", metavar="TAG")
+    tag.add_argument("--remove", nargs="+", metavar="TAG")
+    tag.add_argument("--devices-file", default=DEVICES_PATH)
+    tag.set_defaults(handler=cmd_tag)
+
+    group = commands.add_parser("group", help="list, show, save or delete saved device groups")
+    group.add_argument("name", nargs="?")
+    change = group.add_mutually_exclusive_group()
+    change.add_argument("--set", nargs="+", metavar="SERIAL", help="save the group with these devices")
+    change.add_argument("--delete", action="store_true")
+    group.add_argument("--devices-file", default=DEVICES_PATH)
+    group.set_defaults(handler=cmd_group)
+
+    search = commands.add_parser("search", help="search the script output of past runs")
+    search.add_argument("text", nargs="+", help="words that must all appear; end a word with * for a prefix")
+    search.add_argument("--db", default=LOG_INDEX_PATH)
+    search.add_argument("--device", metavar="SERIAL")
+    search.add_argument("--limit", type=int, default=50)
+    search.add_argument("--json", action="store_true")
+    search.set_defaults(handler=cmd_search)
+    return parser
+
+def main(argv):
+    args = build_parser().parse_args(argv)
+    out = sys.stdout
+    # The components log with print(); keep that apart from the results.
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            return asyncio.run(args.handler(args, out))
+        except KeyboardInterrupt:
+            return 130
+        except (AdbError, AgentError, OSError) as e:
+            print(f"Error: {e}")
+            return 1
+        except ValueError as e:  # a bad --agents entry, tag or group name
+            print(f"Error: {e}")
+            return 2
@@ -0,0 +1,150 @@
+# src/config_store.py
+import contextlib
+import copy
+import hashlib
+import os
+import tempfile
+import time
+
+import yaml
+
+# libyaml's C loader/dumper are several times faster than the pure Python ones.
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+REPLACE_RETRIES = 10
+REPLACE_RETRY_DELAY_S = 0.05
+
+@contextlib.contextmanager
+def file_lock(lock_path):
+    """
+    Holds an exclusive OS advisory lock on `lock_path` (flock on POSIX, a
+    locked byte on Windows). The OS drops the lock if the holder dies, so a
+    crashed writer never leaves a stale lock behind.
+    """
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            # LK_LOCK retries for about 10 seconds before raising OSError.
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+class ConfigStore:
+    """
+    Parsed view of a YAML config file, shared by the app and the scripts.
+
+    Reads are cached: the file is parsed once and only parsed again when its
+    inode/mtime/size change and the content hash differs. Writes are
+    read-modify-write transactions under an OS file lock, committed by writing
+    a temporary file and `os.replace`-ing it over the config, so readers
+    always see either the old or the new file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.parse_count = 0
+        self._data = None
+        self._stat_key = None
+        self._digest = None
+
+    def _refresh(self, force=False):
+        st = os.stat(self.path)
+        stat_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if not force and stat_key == self._stat_key and self._data is not None:
+            return
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        if digest != self._digest or self._data is None:
+            self._data = yaml.load(raw, Loader=SafeLoader) or {}
+            self.parse_count += 1
+            self._digest = digest
+        self._stat_key = stat_key
+
+    def load(self):
+        """Returns the whole config. Treat it as read-only; change it through `update()`."""
+        self._refresh()
+        return self._data
+
+    def section(self, name):
+        """Returns a copy of one top-level section, e.g. the settings of one script."""
+        return copy.deepcopy(self.load().get(name, {}))
+
+    def _write_atomic(self, config):
+        """Commits `config` to the file and returns the content hash of what was written."""
+        text = yaml.dump(config, Dumper=SafeDumper, allow_unicode=True, sort_keys=False)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".config.", suffix=".tmp")
+        try:
+            with contextlib.suppress(OSError):
+                # mkstemp creates the file private; keep the config's permissions.
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            for attempt in range(REPLACE_RETRIES):
+                try:
+                    os.replace(tmp_path, self.path)
+                    break
+                except PermissionError:
+                    # Windows refuses to replace a file another process has open.
+                    if attempt == REPLACE_RETRIES - 1:
+                        raise
+                    time.sleep(REPLACE_RETRY_DELAY_S * (attempt + 1))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def update(self, mutate):
+        """
+        Runs `mutate(config)` on a fresh copy of the config while holding the
+        lock and commits the result atomically. If `mutate` returns False the
+        transaction is dropped without writing. Returns what `mutate` returned.
+        """
+        with file_lock(self.lock_path):
+            # Another process may have committed since our last read.
+            self._refresh(force=True)
+            config = copy.deepcopy(self._data)
+            result = mutate(config)
+            if result is False:
+                return result
+            self._digest = self._write_atomic(config)
+            self._data = config
+            # The next load stats the new file and finds the hash unchanged.
+            self._stat_key = None
+            return result
+
+    def update_section(self, name, values):
+        """Replaces one top-level section in a single transaction."""
+        def apply(config):
+            config[name] = values
+        self.update(apply)
+
+    def save(self, config):
+        """Replaces the whole config in a single transaction."""
+        def apply(current):
+            current.clear()
+            current.update(config)
+        self.update(apply)
@@ -0,0 +1,466 @@
+# src/coordinator.py
+"""
+Coordinator for a fleet spread over several hosts. Every host runs an agent,
+`python -m src.main serve --host 0.0.0.0`: its own ADB server, Orchestrator
+and API. The coordinator follows each agent's event stream, merges their
+device inventories, and places runs across the agents by load.
+
+Devices are addressed as "<node>/<serial>". A bare serial works as long as
+only one agent has it.
+"""
+import asyncio
+import base64
+import json
+import os
+import time
+
+from src.api_server import DEFAULT_API_PORT, read_ws_frame, WS_TEXT, WS_CLOSE, WS_PING, WS_PONG
+from src.device_model import STATE_ONLINE
+from src.device_probe import DeviceInfo
+from src.orchestrator import ACTIVE_RUN_STATES
+
+NODE_SEP = "/"
+STATE_UNREACHABLE = "unreachable"  # the device's agent is not answering
+RUN_LOST = "lost"  # the run's agent went away before the run ended
+DEFAULT_REQUEST_TIMEOUT_S = 30
+RECONNECT_DELAYS_S = (0.5, 1, 2, 5)
+# Runs of an agent that stays unreachable this long are reported lost; a
+# shorter outage (a network blip, a reconnect) is checked against the agent.
+DEFAULT_LOST_AFTER_S = 60
+
+class AgentError(Exception):
+    pass
+
+def parse_agent(text):
+    """Parses "[name=]host[:port]" into (name or None, host, port)."""
+    name, _, address = text.rpartition("=")
+    host, _, port = address.rpartition(":") if ":" in address else (address, "", "")
+    if not host:
+        raise ValueError(f"Bad agent address: {text!r}")
+    return name or None, host, int(port) if port else DEFAULT_API_PORT
+
+def _ws_client_frame(opcode, payload):
+    """Encodes one masked (client to server) WebSocket frame; control frames only, so short."""
+    mask = os.urandom(4)
+    return bytes((0x80 | opcode, 0x80 | len(payload))) + mask + bytes(
+        b ^ mask[i % 4] for i, b in enumerate(payload)
+    )
+
+class AgentClient:
+    """Talks to one agent's API (see src/api_server.py)."""
+    def __init__(self, host, port=DEFAULT_API_PORT, timeout=DEFAULT_REQUEST_TIMEOUT_S):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    @property
+    def address(self):
+        return f"{self.host}:{self.port}"
+
+    async def request(self, method, path, body=None):
+        """Sends one request and returns the decoded JSON. Raises AgentError."""
+        data = json.dumps(body).encode() if body is not None else b""
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+            try:
+                writer.write(
+                    f"{method} {path} HTTP/1.1\r\nHost: {self.address}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                response = await asyncio.wait_for(reader.read(), self.timeout)
+            finally:
+                writer.close()
+        except (OSError, asyncio.TimeoutError) as e:
+            raise AgentError(f"{self.address}: {e or type(e).__name__}")
+        head, _, payload = response.partition(b"\r\n\r\n")
+        try:
+            status = int(head.split(b" ", 2)[1])
+            result = json.loads(payload)
+        except (IndexError, ValueError):
+            raise AgentError(f"{self.address}: malformed response")
+        if status >= 400:
+            raise AgentError(f"{self.address}: {result.get('error', status)}")
+        return result
+
+    async def events(self):
+        """Yields the agent's events (without script output) until the stream ends."""
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        try:
+            key = base64.b64encode(os.urandom(16)).decode()
+            writer.write(
+                f"GET /events HTTP/1.1\r\nHost: {self.address}\r\nUpgrade: websocket\r\n"
+                f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode()
+            )
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.timeout)
+            if b" 101 " not in head.split(b"\r\n", 1)[0]:
+                raise AgentError(f"{self.address}: event stream refused")
+            while True:
+                opcode, payload = await read_ws_frame(reader)
+                if opcode == WS_TEXT:
+                    yield json.loads(payload)
+                elif opcode == WS_PING:
+                    writer.write(_ws_client_frame(WS_PONG, payload[:125]))
+                elif opcode == WS_CLOSE:
+                    return
+        finally:
+            writer.close()
+
+class AgentNode:
+    """What the coordinator knows about one agent."""
+    __slots__ = ("name", "client", "devices", "scripts", "running", "queued", "max_concurrent",
+                 "reachable", "error", "down_since", "follow_task", "refresh_task", "lost_task")
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self.devices = {}  # serial -> the agent's device summary
+        self.scripts = set()
+        self.running = 0
+        self.queued = 0
+        self.max_concurrent = 1
+        self.reachable = False
+        self.error = None
+        self.down_since = None  # monotonic time the agent stopped answering
+        self.follow_task = None
+        self.refresh_task = None
+        self.lost_task = None
+
+    @property
+    def load(self):
+        """Runs started or waiting per run slot of the agent."""
+        return (self.running + self.queued) / max(1, self.max_concurrent)
+
+    def idle_devices(self):
+        """Online devices without an active run, those whose probe found nothing wrong first."""
+        idle = [
+            serial for serial, device in self.devices.items()
+            if device["state"] == STATE_ONLINE
+            and not (device.get("run") and device["run"]["state"] in ACTIVE_RUN_STATES)
+        ]
+        return sorted(idle, key=lambda serial: (bool(self.devices[serial].get("attention")), serial))
+
+    def to_dict(self):
+        return {"node": self.name, "address": self.client.address, "reachable": self.reachable,
+                "error": self.error, "devices": len(self.devices), "running": self.running,
+                "queued": self.queued, "max_concurrent": self.max_concurrent, "load": round(self.load, 3)}
+
+class Coordinator:
+    """
+    Follows the agents in `agents` ("[name=]host[:port]" each) and spreads
+    runs over them. Nodes are named after their host, or host:port where
+    hosts repeat, unless a name is given.
+
+    Listeners get the agents' events with "node" and "id" added, plus
+    {"type": "node", ...AgentNode.to_dict()} when an agent comes or goes.
+
+    A waited-for run is reported lost if its agent stays unreachable for
+    `lost_after` seconds, or if the agent comes back and the device no
+    longer reports that run (e.g. the agent restarted).
+    """
+    def __init__(self, agents, timeout=DEFAULT_REQUEST_TIMEOUT_S, lost_after=DEFAULT_LOST_AFTER_S):
+        parsed = [parse_agent(agent) for agent in agents]
+        hosts = [host for _, host, _ in parsed]
+        self.nodes = {}
+        for name, host, port in parsed:
+            name = name or (host if hosts.count(host) == 1 else f"{host}:{port}")
+            if name in self.nodes or NODE_SEP in name:
+                raise ValueError(f"Bad or repeated agent name: {name!r}")
+            self.nodes[name] = AgentNode(name, AgentClient(host, port, timeout))
+        self.lost_after = lost_after
+        self._listeners = []
+        # (node, serial, run_id) -> (future of the final run dict, monotonic time it was queued),
+        # until wait() takes it
+        self._run_waiters = {}
+
+    # --- Events ----------------------------------------------------------
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, event):
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"[Coordinator] Event listener failed on {event.get('type')}: {e}")
+
+    # --- Lifecycle -------------------------------------------------------
+    async def start(self, follow=True):
+        """Reads every agent's state; with `follow`, keeps it current from their event streams."""
+        await asyncio.gather(*(self._refresh(node) for node in self.nodes.values()))
+        if follow:
+            for node in self.nodes.values():
+                node.follow_task = asyncio.create_task(self._follow(node))
+        reachable = sum(1 for node in self.nodes.values() if node.reachable)
+        print(f"[Coordinator] {reachable}/{len(self.nodes)} agent(s) reachable, "
+              f"{sum(len(node.devices) for node in self.nodes.values())} device(s)")
+        return self
+
+    async def shutdown(self):
+        for node in self.nodes.values():
+            for task in (node.follow_task, node.refresh_task, node.lost_task):
+                if task is not None:
+                    task.cancel()
+        for future, _ in self._run_waiters.values():
+            future.cancel()
+
+    async def _refresh(self, node):
+        try:
+            health, devices, scripts = await asyncio.gather(
+                node.client.request("GET", "/health"),
+                node.client.request("GET", "/devices"),
+                node.client.request("GET", "/scripts"),
+            )
+        except AgentError as e:
+            self._set_reachable(node, False, str(e))
+            return
+        node.running, node.queued = health["running"], health["queued"]
+        node.max_concurrent = health.get("max_concurrent", 1)
+        node.devices = {device["serial"]: device for device in devices}
+        node.scripts = {script["script"] for script in scripts}
+        for device in devices:
+            if device.get("run"):
+                self._check_run(node, device["run"])
+        self._set_reachable(node, True)
+
+    def _refresh_soon(self, node):
+        """Re-reads an agent's state in the background, once at a time."""
+        if node.refresh_task is None or node.refresh_task.done():
+            node.refresh_task = asyncio.create_task(self._refresh(node))
+
+    def _set_reachable(self, node, reachable, error=None):
+        changed = node.reachable != reachable
+        node.reachable = reachable
+        node.error = error
+        if not changed:
+            return
+        print(f"[Coordinator] Agent {node.name} ({node.client.address}) "
+              f"{'is reachable' if reachable else f'is unreachable: {error}'}")
+        if reachable:
+            if node.lost_task is not None:
+                node.lost_task.cancel()
+                node.lost_task = None
+            if node.down_since is not None:
+                self._check_runs_after_outage(node, node.down_since)
+            node.down_since = None
+        else:
+            node.down_since = time.monotonic()
+            node.lost_task = asyncio.create_task(self._lose_runs_later(node))
+        self._emit({"type": "node", **node.to_dict()})
+
+    def _waiters_of(self, node):
+        return [(key, future, queued_at) for key, (future, queued_at) in self._run_waiters.items()
+                if key[0] == node.name and not future.done()]
+
+    def _lose_run(self, key, future, reason):
+        name, serial, run_id = key
+        future.set_result({"node": name, "serial": serial, "id": f"{name}{NODE_SEP}{serial}",
+                           "run_id": run_id, "state": RUN_LOST, "status": reason})
+
+    async def _lose_runs_later(self, node):
+        await asyncio.sleep(self.lost_after)
+        if not node.reachable:
+            for key, future, _ in self._waiters_of(node):
+                self._lose_run(key, future, f"agent unreachable for {self.lost_after:g}s: {node.error}")
+
+    def _check_runs_after_outage(self, node, down_since):
+        """
+        The agent is back: a run queued before the outage that its device no
+        longer reports is lost (a restarted agent numbers its runs anew).
+        Runs still active keep being waited for; finished ones were settled
+        by _check_run from the same device list.
+        """
+        for key, future, queued_at in self._waiters_of(node):
+            _, serial, run_id = key
+            run = node.devices.get(serial, {}).get("run")
+            if queued_at < down_since and (run is None or run["run_id"] != run_id):
+                self._lose_run(key, future, "run unknown to the agent after it reconnected")
+
+    async def _follow(self, node):
+        attempt = 0
+        while True:
+            try:
+                async for event in node.client.events():
+                    attempt = 0
+                    self._apply(node, event)
+                error = "event stream closed"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            self._set_reachable(node, False, error)
+            await asyncio.sleep(RECONNECT_DELAYS_S[min(attempt, len(RECONNECT_DELAYS_S) - 1)])
+            attempt += 1
+            await self._refresh(node)
+
+    def _apply(self, node, event):
+        kind = event.get("type")
+        serial = event.get("serial")
+        device = node.devices.get(serial)
+        if kind == "hello":
+            node.devices = {d["serial"]: d for d in event["devices"]}
+            node.running, node.queued = event["queue"]["running"], event["queue"]["queued"]
+            for d in event["devices"]:
+                if d.get("run"):
+                    self._check_run(node, d["run"])
+            self._set_reachable(node, True)
+        elif kind in ("devices", "scripts", "lagged"):
+            self._refresh_soon(node)
+        elif kind == "queue":
+            node.running, node.queued = event["running"], event["queued"]
+        elif kind == "probe" and device is not None:
+            # The event carries the DeviceInfo fields themselves, not an "info" dict.
+            device["info"] = {name: event.get(name) for name in DeviceInfo.__slots__}
+            device["attention"] = event.get("attention")
+        elif kind == "run" and device is not None:
+            device["run"] = {key: value for key, value in event.items() if key != "type"}
+            self._check_run(node, device["run"])
+        if serial is not None:
+            event = dict(event, id=f"{node.name}{NODE_SEP}{serial}")
+        self._emit(dict(event, node=node.name))
+
+    def _check_run(self, node, run):
+        if run["state"] not in ACTIVE_RUN_STATES:
+            future, _ = self._run_waiters.get((node.name, run["serial"], run["run_id"]), (None, None))
+            if future is not None and not future.done():
+                future.set_result(dict(run, node=node.name, id=f"{node.name}{NODE_SEP}{run['serial']}"))
+
+    # --- Inventory -------------------------------------------------------
+    def inventory(self):
+        """Every device of every agent, with "id" and "node"; devices of unreachable agents are marked so."""
+        devices = []
+        for node in self.nodes.values():
+            for serial, device in node.devices.items():
+                entry = dict(device, id=f"{node.name}{NODE_SEP}{serial}", node=node.name)
+                if not node.reachable:
+                    entry["state"] = STATE_UNREACHABLE
+                devices.append(entry)
+        return devices
+
+    def resolve(self, ids):
+        """Maps device ids to {node: [serials]}; returns that and {id: reason} for unknown ones."""
+        by_node, unknown = {}, {}
+        for device_id in ids:
+            name, sep, serial = device_id.rpartition(NODE_SEP)
+            if sep:
+                owners = [name] if name in self.nodes and serial in self.nodes[name].devices else []
+            else:
+                owners = [node.name for node in self.nodes.values() if serial in node.devices]
+            if len(owners) == 1:
+                by_node.setdefault(owners[0], []).append(serial)
+            else:
+                unknown[device_id] = "ambiguous, use node/serial" if owners else "not connected"
+        return by_node, unknown
+
+    def place(self, script, count):
+        """
+        Picks `count` idle devices for `script`, one at a time from the agent
+        with the lowest load counting what was already placed on it. Returns
+        {node: [serials]}, which holds fewer devices if not enough are idle.
+        """
+        candidates = {
+            node.name: node.idle_devices() for node in self.nodes.values()
+            if node.reachable and script in node.scripts
+        }
+        extra = dict.fromkeys(candidates, 0)
+        placement = {}
+        for _ in range(count):
+            open_nodes = [name for name, idle in candidates.items() if idle]
+            if not open_nodes:
+                break
+            def load_after(name):
+                node = self.nodes[name]
+                return (node.running + node.queued + extra[name] + 1) / max(1, node.max_concurrent)
+            name = min(open_nodes, key=lambda name: (load_after(name), name))
+            placement.setdefault(name, []).append(candidates[name].pop(0))
+            extra[name] += 1
+        return placement
+
+    # --- Runs ------------------------------------------------------------
+    async def submit(self, script, ids=None, count=None, priority="batch"):
+        """
+        Queues `script` on the devices in `ids`, on every online device if
+        `ids` is "all", or on `count` devices placed by load. Returns
+        {"queued": [ids], "skipped": {id: reason}, "placement": {node: n},
+        "run_ids": {id: run_id}}.
+        """
+        if count is not None:
+            by_node, skipped = self.place(script, count), {}
+            if sum(len(serials) for serials in by_node.values()) < count:
+                skipped["*"] = f"only {sum(len(s) for s in by_node.values())} of {count} devices idle"
+        elif ids == "all":
+            by_node, skipped = {
+                node.name: [s for s, d in node.devices.items() if d["state"] == STATE_ONLINE]
+                for node in self.nodes.values() if node.reachable
+            }, {}
+        else:
+            by_node, skipped = self.resolve(ids)
+        names = [name for name, serials in by_node.items() if serials]
+        results = await asyncio.gather(*(
+            self.nodes[name].client.request(
+                "POST", "/runs", {"script": script, "devices": by_node[name], "priority": priority})
+            for name in names
+        ), return_exceptions=True)
+
+        queued, run_ids, placement = [], {}, {}
+        loop = asyncio.get_running_loop()
+        for name, result in zip(names, results):
+            node = self.nodes[name]
+            if isinstance(result, Exception):
+                for serial in by_node[name]:
+                    skipped[f"{name}{NODE_SEP}{serial}"] = str(result)
+                continue
+            for serial, reason in result["skipped"].items():
+                skipped[f"{name}{NODE_SEP}{serial}"] = reason
+            for serial in result["queued"]:
+                device_id, run_id = f"{name}{NODE_SEP}{serial}", result["run_ids"][serial]
+                queued.append(device_id)
+                run_ids[device_id] = run_id
+                self._run_waiters[(name, serial, run_id)] = (loop.create_future(), time.monotonic())
+                run = node.devices.get(serial, {}).get("run")
+                if run and run["run_id"] == run_id:
+                    self._check_run(node, run)  # its events came in before the reply
+            placement[name] = len(result["queued"])
+        print(f"[Coordinator] Queued {script} on {len(queued)} device(s): "
+              + ", ".join(f"{name} {n}" for name, n in placement.items()))
+        return {"queued": queued, "skipped": skipped, "placement": placement, "run_ids": run_ids}
+
+    async def wait(self, submitted):
+        """Waits for the runs of a `submit()` result to end; returns their final run dicts by id."""
+        keys = {device_id: (*device_id.rpartition(NODE_SEP)[::2], run_id)
+                for device_id, run_id in submitted["run_ids"].items()}
+        futures = {device_id: self._run_waiters[key][0] for device_id, key in keys.items()
+                   if key in self._run_waiters}
+        try:
+            if futures:
+                await asyncio.wait(futures.values())
+        finally:
+            for key in keys.values():
+                self._run_waiters.pop(key, None)
+        return {device_id: future.result() for device_id, future in futures.items()
+                if future.done() and not future.cancelled()}
+
+    async def stop(self, ids):
+        """Stops the runs on `ids` ("all" for every agent's runs). Returns one result dict per device."""
+        if ids == "all":
+            by_node = {node.name: "all" for node in self.nodes.values() if node.reachable}
+        else:
+            by_node, _ = self.resolve(ids)
+        names = list(by_node)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            self.nodes[name].client.request("POST", "/stop", {"devices": by_node[name]}) for name in names
+        ), return_exceptions=True)
+        stopped = []
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                print(f"[Coordinator] Stop on {name} failed: {result}")
+                continue
+            for entry in result["stopped"]:
+                stopped.append(dict(entry, node=name, id=f"{name}{NODE_SEP}{entry['serial']}"))
+        print(f"[Coordinator] Stopped {len(stopped)} run(s) on {len(names)} agent(s) "
+              f"in {time.perf_counter() - started:.2f}s")
+        return stopped
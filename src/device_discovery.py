@@ -0,0 +1,72 @@
+# src/device_discovery.py
+import asyncio
+
+from src.adb_client import AdbClient, AdbError, start_adb_server
+from src.device_model import DeviceModel
+
+class DeviceDiscovery:
+    """
+    Background service that follows the ADB server's `host:track-devices`
+    stream and applies every reported device list to the DeviceModel, so
+    attach, detach, unauthorized and offline transitions show up as they happen.
+    """
+    def __init__(self, model: DeviceModel, client: AdbClient = None, on_update=None,
+                 retry_delay=1.0, max_retry_delay=15.0):
+        self.model = model
+        self.client = client or AdbClient()
+        self.on_update = on_update  # optional callable(added, removed, changed)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.connected = False
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    def _apply(self, snapshot, details=None):
+        added, removed, changed = self.model.apply_scan(snapshot, details)
+        for serial in added:
+            print(f"[Discovery] {serial} attached ({snapshot[serial]})")
+        for serial in removed:
+            print(f"[Discovery] {serial} detached")
+        for serial in changed:
+            print(f"[Discovery] {serial} is now {snapshot[serial]}")
+        if self.on_update and (added or removed or changed):
+            self.on_update(added, removed, changed)
+
+    async def _run(self):
+        delay = self.retry_delay
+        server_start_tried = False
+        while True:
+            try:
+                async for snapshot, details in self.client.track_devices(long=True):
+                    self.connected = True
+                    delay = self.retry_delay
+                    self._apply(snapshot, details)
+                print("[Discovery] ADB server closed the track-devices stream.")
+            except ConnectionRefusedError:
+                # The adb CLI starts the server on demand; the socket protocol does not.
+                if not server_start_tried:
+                    server_start_tried = True
+                    print("[Discovery] ADB server is not running, starting it...")
+                    try:
+                        if await start_adb_server():
+                            continue
+                    except OSError as e:
+                        print(f"[Discovery] Could not start the ADB server: {e}")
+            except (OSError, AdbError, asyncio.IncompleteReadError) as e:
+                print(f"[Discovery] Lost connection to the ADB server: {e}")
+            self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
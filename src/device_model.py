@@ -0,0 +1,285 @@
+# src/device_model.py
+import bisect
+
+# ADB state of a device that is connected and authorized.
+STATE_ONLINE = "device"
+# Connected, but the USB debugging prompt has not been accepted on the phone.
+STATE_UNAUTHORIZED = "unauthorized"
+
+def parse_adb_devices(output, has_header=True, details=None):
+    """
+    Parses `adb devices` output into {serial: state}. The device lists sent
+    over the ADB socket have no "List of devices attached" header. For the
+    long (`-l`) format, the extra `key:value` fields of each device (usb,
+    product, model, transport_id, ...) are stored in `details` if given.
+    """
+    devices = {}
+    lines = output.strip().splitlines()
+    for line in lines[1:] if has_header else lines:
+        if '\t' in line:
+            serial, state = line.split('\t', 1)
+            fields = []
+        else:
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            serial, state, fields = parts[0], parts[1], parts[2:]
+        if not serial:
+            continue
+        devices[serial] = state.strip()
+        if details is not None:
+            details[serial] = dict(field.split(':', 1) for field in fields if ':' in field)
+    return devices
+
+class DeviceModel:
+    """
+    Keyed store of the devices known to the app, by serial. Changes are applied
+    as a diff and only the serials that were added, removed or changed are
+    reported to listeners, so views never have to rebuild every row.
+    """
+    def __init__(self):
+        self.devices = {}  # serial -> ADB state ("device", "offline", "unauthorized", ...)
+        self.details = {}  # serial -> extra fields from `adb devices -l` (usb, model, ...)
+        self._listeners = []
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __contains__(self, serial):
+        return serial in self.devices
+
+    def get(self, serial):
+        return self.devices.get(serial)
+
+    def subscribe(self, listener):
+        """Registers `listener(added, removed, changed)`, called with lists of serials."""
+        self._listeners.append(listener)
+
+    def _notify(self, added, removed, changed):
+        if not (added or removed or changed):
+            return
+        for listener in self._listeners:
+            listener(added, removed, changed)
+
+    def apply_scan(self, found, details=None):
+        """
+        Replaces the known devices with `found` ({serial: state}) and notifies
+        only the difference. Returns (added, removed, changed).
+        """
+        added, removed, changed = [], [], []
+        for serial in list(self.devices):
+            if serial not in found:
+                del self.devices[serial]
+                self.details.pop(serial, None)
+                removed.append(serial)
+        if details:
+            self.details.update(details)
+        for serial, state in found.items():
+            old_state = self.devices.get(serial)
+            if old_state == state:
+                continue
+            if old_state is None:
+                added.append(serial)
+            else:
+                changed.append(serial)
+            self.devices[serial] = state
+        self._notify(added, removed, changed)
+        return added, removed, changed
+
+    def set_state(self, serial, state):
+        """Records a single device transition; a `state` of None removes the device."""
+        old_state = self.devices.get(serial)
+        if state is None:
+            if old_state is not None:
+                del self.devices[serial]
+                self.details.pop(serial, None)
+                self._notify([], [serial], [])
+        elif old_state is None:
+            self.devices[serial] = state
+            self._notify([serial], [], [])
+        elif old_state != state:
+            self.devices[serial] = state
+            self._notify([], [], [serial])
+
+class SelectionIndex:
+    """
+    Selected serials plus the number of selectable devices, kept up to date
+    one change at a time so counts never require walking the device list.
+    """
+    def __init__(self):
+        self.selected = set()
+        self._known = set()
+
+    @property
+    def count(self):
+        return len(self.selected)
+
+    @property
+    def total(self):
+        return len(self._known)
+
+    @property
+    def all_selected(self):
+        return bool(self._known) and len(self.selected) == len(self._known)
+
+    def __contains__(self, serial):
+        return serial in self.selected
+
+    def track(self, serial):
+        self._known.add(serial)
+
+    def untrack(self, serial):
+        self._known.discard(serial)
+        self.selected.discard(serial)
+
+    def set_selected(self, serial, value):
+        """Selects or deselects one device. Returns True if the selection changed."""
+        if serial not in self._known:
+            return False
+        if value:
+            if serial in self.selected:
+                return False
+            self.selected.add(serial)
+        else:
+            if serial not in self.selected:
+                return False
+            self.selected.discard(serial)
+        return True
+
+    def set_all(self, value):
+        """Selects or deselects every known device at once."""
+        self.selected = set(self._known) if value else set()
+
+    def all_selected_of(self, serials):
+        """True if every selectable device among `serials` is selected (and there is one)."""
+        known = [serial for serial in serials if serial in self._known]
+        return bool(known) and all(serial in self.selected for serial in known)
+
+    def set_many(self, serials, value):
+        """Selects or deselects the known devices among `serials`."""
+        serials = self._known.intersection(serials)
+        if value:
+            self.selected |= serials
+        else:
+            self.selected -= serials
+
+# Fields a filter term can name, as in `tag:hub3` or `android:13`.
+FILTER_FIELDS = ("serial", "tag", "group", "model", "android", "state")
+
+class FilterIndex:
+    """
+    In-memory index for the device filter box. Every device has a few fields
+    (FILTER_FIELDS, one or more values each); a query is a list of words that
+    must all match:
+
+        hub3          any field contains "hub3"
+        tag:hub       a tag starts with "hub" (same for the other fields)
+
+    Values per field are kept sorted, so a `field:prefix` term is a bisect
+    plus the serials stored under the matching values. Results are cached
+    per term until the index changes, and a term that extends a cached one
+    by a character (the user is typing) only checks the devices that matched
+    the shorter term. So each keystroke costs a pass over the previous
+    result, not over the fleet.
+    """
+    def __init__(self):
+        self._fields = {}  # serial -> {field: tuple of lower-case values}
+        self._text = {}  # serial -> every value, joined for "contains" terms
+        self._values = {field: {} for field in FILTER_FIELDS}  # field -> value -> set of serials
+        self._sorted = {}  # field -> sorted values, rebuilt on demand
+        self._cache = {}  # term -> frozenset of serials, cleared on every change
+
+    def __len__(self):
+        return len(self._fields)
+
+    def update(self, serial, **fields):
+        """Sets some fields of `serial` (a string, a list of strings or None), adding the device if needed."""
+        current = self._fields.setdefault(serial, {"serial": (serial.lower(),)})
+        for field, value in fields.items():
+            if value is None:
+                value = ()
+            elif isinstance(value, str):
+                value = (value,)
+            values = tuple(str(v).lower() for v in value)
+            if current.get(field, ()) == values:
+                continue
+            self._unindex(serial, field, current.get(field, ()))
+            current[field] = values
+            index = self._values[field]
+            for v in values:
+                index.setdefault(v, set()).add(serial)
+            self._sorted.pop(field, None)
+        self._values["serial"].setdefault(serial.lower(), set()).add(serial)
+        self._text[serial] = "\t".join(v for values in current.values() for v in values)
+        self._cache.clear()
+
+    def remove(self, serial):
+        fields = self._fields.pop(serial, None)
+        if fields is None:
+            return
+        for field, values in fields.items():
+            self._unindex(serial, field, values)
+            self._sorted.pop(field, None)
+        del self._text[serial]
+        self._cache.clear()
+
+    def _unindex(self, serial, field, values):
+        index = self._values[field]
+        for v in values:
+            serials = index.get(v)
+            if serials is not None:
+                serials.discard(serial)
+                if not serials:
+                    del index[v]
+
+    @staticmethod
+    def _split(term):
+        field, sep, value = term.partition(":")
+        if sep and field in FILTER_FIELDS:
+            return field, value
+        return None, term  # e.g. 192.168.1.5:5555 is a serial, not a field
+
+    def match(self, query):
+        """The serials matching every term of `query`; None for an empty query (no filter)."""
+        terms = query.lower().split()
+        if not terms:
+            return None
+        result = None
+        for term in sorted(set(terms), key=len, reverse=True):
+            serials = self._match_term(term)
+            result = serials if result is None else result & serials
+            if not result:
+                break
+        return result
+
+    def _match_term(self, term):
+        cached = self._cache.get(term)
+        if cached is not None:
+            return cached
+        field, value = self._split(term)
+        shorter = self._cache.get(term[:-1])
+        if shorter is not None and self._split(term[:-1])[0] != field:
+            shorter = None  # `tag` and `tag:` mean different things
+        if field is None:
+            candidates = self._text if shorter is None else shorter
+            text = self._text
+            serials = frozenset(s for s in candidates if value in text[s])
+        elif shorter is not None:
+            fields = self._fields
+            serials = frozenset(s for s in shorter if any(v.startswith(value) for v in fields[s].get(field, ())))
+        else:
+            serials = frozenset(self._prefix(field, value))
+        self._cache[term] = serials
+        return serials
+
+    def _prefix(self, field, value):
+        values = self._sorted.get(field)
+        if values is None:
+            values = self._sorted[field] = sorted(self._values[field])
+        index = self._values[field]
+        serials = set()
+        for i in range(bisect.bisect_left(values, value), len(values)):
+            if not values[i].startswith(value):
+                break
+            serials |= index[values[i]]
+        return serials
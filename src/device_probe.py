@@ -0,0 +1,174 @@
+# src/device_probe.py
+import asyncio
+import time
+
+DEFAULT_PROBE_CONCURRENCY = 32
+DEFAULT_PROBE_TIMEOUT_S = 5
+DEFAULT_PROBE_TTL_S = 60
+LOW_BATTERY_PERCENT = 20
+
+# uiautomator2's on-device server port (uiautomator2.core.DEFAULT_SERVER_PORT).
+AGENT_PORT = 9008
+
+_SEPARATOR = "@@"
+
+# Everything is collected in one shell round trip. The last part asks the
+# uiautomator2 server for /ping from the phone itself, so no port forward is needed.
+PROBE_COMMAND = f"; echo {_SEPARATOR}; ".join([
+    "getprop ro.product.model",
+    "getprop ro.build.version.release",
+    "dumpsys battery | grep -m 1 level",
+    "dumpsys power | grep -m 1 -E 'mWakefulness=|Display Power: state='",
+    f"printf 'GET /ping HTTP/1.0\\r\\n\\r\\n' | nc -w 1 127.0.0.1 {AGENT_PORT} 2>/dev/null | tail -n 1",
+])
+
+class DeviceInfo:
+    """What a probe found out about one device."""
+    __slots__ = ("model", "android", "battery", "screen_on", "agent", "error", "probed_at")
+
+    def __init__(self, model=None, android=None, battery=None, screen_on=None, agent=None,
+                 error=None, probed_at=0.0):
+        self.model = model
+        self.android = android
+        self.battery = battery
+        self.screen_on = screen_on
+        self.agent = agent
+        self.error = error
+        self.probed_at = probed_at
+
+    def to_dict(self):
+        """The fields as JSON, with `probed_at` in wall-clock seconds (None before the probe)."""
+        data = {name: getattr(self, name) for name in self.__slots__}
+        # probed_at is monotonic for the cache TTL; that means nothing to another process.
+        data["probed_at"] = round(time.time() - (time.monotonic() - self.probed_at), 3) if self.probed_at else None
+        return data
+
+    @property
+    def needs_attention(self):
+        return self.error is not None or (self.battery is not None and self.battery < LOW_BATTERY_PERCENT)
+
+    def summary(self):
+        """One-line description for the device row."""
+        if self.error is not None:
+            return f"Probe failed: {self.error}"
+        parts = []
+        if self.model:
+            parts.append(self.model)
+        if self.android:
+            parts.append(f"Android {self.android}")
+        if self.battery is not None:
+            parts.append(f"{self.battery}%")
+        if self.screen_on is not None:
+            parts.append("screen on" if self.screen_on else "screen off")
+        if self.agent is not None:
+            parts.append("agent up" if self.agent else "agent down")
+        return " · ".join(parts)
+
+def parse_probe_output(output):
+    """Parses the output of PROBE_COMMAND into a DeviceInfo."""
+    parts = [part.strip() for part in output.replace("\r\n", "\n").split(_SEPARATOR)]
+    parts += [""] * (5 - len(parts))
+    model, android, battery, power, ping = parts[:5]
+
+    info = DeviceInfo(model=model or None, android=android or None)
+    if ":" in battery:
+        try:
+            info.battery = int(battery.split(":", 1)[1])
+        except ValueError:
+            pass
+    if "mWakefulness=" in power:
+        info.screen_on = power.split("mWakefulness=", 1)[1].startswith("Awake")
+    elif "state=" in power:
+        info.screen_on = power.split("state=", 1)[1].startswith("ON")
+    info.agent = ping == "pong"
+    return info
+
+class DeviceProber:
+    """
+    Probes devices concurrently and caches the results for `ttl` seconds.
+
+    Probes are plain ADB shell calls on the event loop, limited to
+    `concurrency` at a time so a large fleet does not flood the ADB server
+    while scripts are running. Each probe has its own timeout; a device that
+    does not answer is cached with an error like any other result.
+    """
+    def __init__(self, client, concurrency=DEFAULT_PROBE_CONCURRENCY, timeout=DEFAULT_PROBE_TIMEOUT_S,
+                 ttl=DEFAULT_PROBE_TTL_S, on_result=None):
+        self.client = client
+        self.timeout = timeout
+        self.ttl = ttl
+        self.on_result = on_result  # on_result(serial, DeviceInfo)
+        self.cache = {}  # serial -> DeviceInfo
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight = {}  # serial -> Task
+        self._refresh_task = None
+
+    def get(self, serial):
+        """Returns the cached DeviceInfo while it is fresh, else None."""
+        info = self.cache.get(serial)
+        if info is not None and time.monotonic() - info.probed_at < self.ttl:
+            return info
+        return None
+
+    def invalidate(self, serial):
+        self.cache.pop(serial, None)
+        task = self._inflight.pop(serial, None)
+        if task:
+            task.cancel()
+
+    async def probe(self, serial, force=False):
+        """Returns fresh info for `serial`, probing it unless the cache has it."""
+        if not force:
+            info = self.get(serial)
+            if info is not None:
+                return info
+        return await self._start(serial)
+
+    def probe_all(self, serials, force=False):
+        """Starts probing every device in `serials` that has no fresh result; does not wait."""
+        for serial in serials:
+            if force or self.get(serial) is None:
+                self._start(serial)
+
+    def _start(self, serial):
+        """Returns the running probe of `serial`, starting one if there is none."""
+        task = self._inflight.get(serial)
+        if task is None:
+            task = self._inflight[serial] = asyncio.create_task(self._probe(serial))
+
+            def forget(done):
+                if self._inflight.get(serial) is done:
+                    del self._inflight[serial]
+            task.add_done_callback(forget)
+        return task
+
+    async def _probe(self, serial):
+        async with self._semaphore:
+            try:
+                output = await asyncio.wait_for(self.client.shell(serial, PROBE_COMMAND), self.timeout)
+                info = parse_probe_output(output)
+            except asyncio.TimeoutError:
+                info = DeviceInfo(error="timed out")
+            except Exception as e:
+                info = DeviceInfo(error=str(e) or type(e).__name__)
+        info.probed_at = time.monotonic()
+        self.cache[serial] = info
+        if self.on_result:
+            self.on_result(serial, info)
+        return info
+
+    def start(self, serials):
+        """Re-probes the devices returned by `serials()` whenever their results expire."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop(serials))
+
+    async def _refresh_loop(self, serials):
+        while True:
+            await asyncio.sleep(self.ttl)
+            self.probe_all(serials())
+
+    def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+        for task in list(self._inflight.values()):
+            task.cancel()
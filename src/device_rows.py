@@ -0,0 +1,82 @@
+# src/device_rows.py
+from src.device_model import STATE_ONLINE
+from src.orchestrator import RUN_QUEUED, RUN_RUNNING, RUN_FAILED, RUN_CANCELLED
+
+STATUS_IDLE = "Idle"
+
+class DeviceRow:
+    """
+    What the device list shows for one device, without any widgets. The list
+    keeps one of these per device and binds a DeviceControl (ui_components)
+    only to the rows inside the visible window, so a device costs this
+    object, not a widget tree.
+    """
+    __slots__ = ("serial", "device_state", "status", "fraction", "info", "attention", "tags", "run_state", "failed")
+
+    def __init__(self, serial, device_state=STATE_ONLINE):
+        self.serial = serial
+        self.device_state = device_state
+        self.status = STATUS_IDLE
+        self.fraction = None  # progress of the running script, None hides the bar
+        self.info = None  # probe summary
+        self.attention = False
+        self.tags = ()
+        self.run_state = None  # RUN_QUEUED or RUN_RUNNING while the device has an active run
+        self.failed = False  # the last run failed
+
+    @property
+    def online(self):
+        return self.device_state == STATE_ONLINE
+
+    @property
+    def running(self):
+        return self.run_state == RUN_RUNNING
+
+    @property
+    def active(self):
+        return self.run_state is not None
+
+    @property
+    def notable(self):
+        """Running, just failed or needing attention: worth a closer watch (see ScreenCapturer)."""
+        return self.running or self.failed or self.attention
+
+    def set_device_state(self, state):
+        """Online devices can run; other states (e.g. unauthorized) replace the status. Returns True if changed."""
+        if state == self.device_state:
+            return False
+        previous, self.device_state = self.device_state, state
+        if not self.active:
+            if self.status == previous.capitalize():
+                self.status = STATUS_IDLE
+            self._apply_device_state()
+        return True
+
+    def _apply_device_state(self):
+        if not self.online:
+            self.status = self.device_state.capitalize()
+
+    def apply_run_event(self, event):
+        """Applies a run, status or stopped event of the Orchestrator."""
+        kind = event["type"]
+        if kind == "status":
+            self.status = event["status"]
+            if event["fraction"] is not None:
+                self.fraction = event["fraction"]
+        elif kind == "stopped":
+            # How long stopping took (see RunStopper).
+            self.status = f"Stopped ({event['summary']})"
+        elif event["state"] == RUN_QUEUED:
+            self.run_state = RUN_QUEUED
+            self.status = "Queued"
+        elif event["state"] == RUN_RUNNING:
+            self.run_state = RUN_RUNNING
+            self.failed = False
+            self.fraction = None
+            self.status = event["status"]
+        else:
+            self.run_state = None
+            self.failed = event["state"] == RUN_FAILED
+            self.fraction = None
+            self.status = STATUS_IDLE if event["state"] == RUN_CANCELLED else event["status"]
+            self._apply_device_state()
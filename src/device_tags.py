@@ -0,0 +1,105 @@
+# src/device_tags.py
+import contextlib
+
+from src.config_store import ConfigStore
+
+DEVICES_NAME = "devices.yaml"
+
+def normalize_tag(tag):
+    """Tags are lower case words; `hub 3` or `tag:x` would not survive the filter syntax."""
+    tag = str(tag).strip().lower()
+    if not tag or any(c.isspace() for c in tag) or ":" in tag:
+        raise ValueError(f"Invalid tag: {tag!r} (use one word without ':')")
+    return tag
+
+class DeviceTags:
+    """
+    Tags per device and saved groups of devices, both keyed by serial, kept
+    in a YAML file next to the app:
+
+        tags:
+          R58M123ABC: [hub3, lab]
+        groups:
+          hub3-pixels: [R58M123ABC, R58M456DEF]
+
+    Writes go through a ConfigStore, so they are atomic and merge with what
+    other processes (e.g. the CLI next to the GUI) wrote in the meantime.
+    With `path` None nothing is persisted.
+    """
+    def __init__(self, path):
+        self.store = ConfigStore(path) if path else None
+        self.tags = {}  # serial -> sorted list of tags
+        self.groups = {}  # name -> list of serials
+        self._member_of = {}  # serial -> names of its groups
+        self.load()
+
+    def load(self):
+        data = {}
+        if self.store is not None:
+            with contextlib.suppress(FileNotFoundError):
+                data = self.store.load()
+        self._apply(data)
+
+    def _apply(self, data):
+        self.tags = {str(serial): sorted(tags) for serial, tags in (data.get("tags") or {}).items() if tags}
+        self.groups = {str(name): list(serials) for name, serials in (data.get("groups") or {}).items()}
+        self._member_of = {}
+        for name, serials in sorted(self.groups.items()):
+            for serial in serials:
+                self._member_of.setdefault(serial, []).append(name)
+
+    def _update(self, mutate):
+        """Runs `mutate(data)` on the file's current content and commits it."""
+        if self.store is None:
+            data = {"tags": self.tags, "groups": self.groups}
+            mutate(data)
+            self._apply(data)
+            return
+        with contextlib.suppress(FileExistsError):
+            # ConfigStore needs the file; "x" creates it only if no one else did.
+            with open(self.store.path, "x", encoding="utf-8") as f:
+                f.write("{}\n")
+        def apply(data):
+            data.setdefault("tags", {})
+            data.setdefault("groups", {})
+            mutate(data)
+            data["tags"] = {serial: tags for serial, tags in data["tags"].items() if tags}
+        self.store.update(apply)
+        self._apply(self.store.load())
+
+    def tags_of(self, serial):
+        return self.tags.get(serial, [])
+
+    def groups_of(self, serial):
+        return self._member_of.get(serial, [])
+
+    def change_tags(self, serials, add=(), remove=()):
+        """Adds and removes tags on every device in `serials` in one write. Raises ValueError on a bad tag."""
+        add = {normalize_tag(tag) for tag in add}
+        remove = {normalize_tag(tag) for tag in remove}
+        def mutate(data):
+            tags = data["tags"]
+            for serial in serials:
+                tags[serial] = sorted((set(tags.get(serial) or ()) | add) - remove)
+        self._update(mutate)
+
+    def group(self, name):
+        """The serials of group `name`. Raises ValueError if there is no such group."""
+        if name not in self.groups:
+            raise ValueError(f"Unknown group: {name}")
+        return self.groups[name]
+
+    def save_group(self, name, serials):
+        """Creates or replaces group `name`."""
+        name = str(name).strip()
+        if not name:
+            raise ValueError("A group needs a name")
+        def mutate(data):
+            data["groups"][name] = list(dict.fromkeys(serials))
+        self._update(mutate)
+
+    def delete_group(self, name):
+        self.group(name)
+        def mutate(data):
+            data["groups"].pop(name, None)
+        self._update(mutate)
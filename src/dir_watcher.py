@@ -0,0 +1,174 @@
+# src/dir_watcher.py
+import abc
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+DEFAULT_DEBOUNCE_S = 0.2
+DEFAULT_POLL_INTERVAL_S = 1.0
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+class DirectoryWatcher(abc.ABC):
+    """
+    Reports files of one directory that were created, written, moved or
+    deleted. Bursts of events (editors save in several steps) are collected
+    for `debounce_s` and handed to `on_change(names)` as one set of file
+    names; `names` is None when changes were lost and the caller should rescan.
+    """
+    def __init__(self, path, on_change, debounce_s=DEFAULT_DEBOUNCE_S):
+        self.path = path
+        self.on_change = on_change
+        self.debounce_s = debounce_s
+        self._pending = set()
+        self._overflow = False
+        self._flush_handle = None
+
+    def _queue(self, name):
+        if name is None:
+            self._overflow = True
+        else:
+            self._pending.add(name)
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(self.debounce_s, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        names = None if self._overflow else self._pending
+        self._pending = set()
+        self._overflow = False
+        try:
+            self.on_change(names)
+        except Exception as e:
+            print(f"[DirWatcher] Change handler failed: {e}")
+
+    @abc.abstractmethod
+    def start(self):
+        """Starts watching; subclasses implement it for their platform."""
+
+    def stop(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+class InotifyWatcher(DirectoryWatcher):
+    """Linux watcher on inotify (through ctypes), read from the event loop."""
+    def __init__(self, path, on_change, debounce_s=DEFAULT_DEBOUNCE_S, libc=None):
+        super().__init__(path, on_change, debounce_s)
+        self._libc = libc or _load_libc()
+        self._fd = None
+
+    def start(self):
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if self._libc.inotify_add_watch(fd, os.fsencode(self.path), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f"inotify_add_watch failed for {self.path}")
+        try:
+            asyncio.get_running_loop().add_reader(fd, self._on_readable)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self._queue(None)
+            elif name and not mask & IN_ISDIR:
+                self._queue(name)
+
+    def stop(self):
+        super().stop()
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+class PollingWatcher(DirectoryWatcher):
+    """Portable fallback: compares the directory's file stats every `interval` seconds."""
+    def __init__(self, path, on_change, debounce_s=DEFAULT_DEBOUNCE_S, interval=DEFAULT_POLL_INTERVAL_S):
+        super().__init__(path, on_change, debounce_s)
+        self.interval = interval
+        self._task = None
+        self._snapshot = {}
+
+    def _scan(self):
+        snapshot = {}
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    if entry.is_file():
+                        st = entry.stat()
+                        snapshot[entry.name] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+        return snapshot
+
+    def start(self):
+        self._snapshot = self._scan()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            snapshot = self._scan()
+            for name in snapshot.keys() | self._snapshot.keys():
+                if snapshot.get(name) != self._snapshot.get(name):
+                    self._queue(name)
+            self._snapshot = snapshot
+
+    def stop(self):
+        super().stop()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+def watch_directory(path, on_change, debounce_s=DEFAULT_DEBOUNCE_S):
+    """Starts watching `path` with inotify where available, else by polling. Call from the event loop."""
+    libc = _load_libc()
+    if libc is not None:
+        try:
+            return InotifyWatcher(path, on_change, debounce_s, libc).start()
+        except (OSError, NotImplementedError) as e:
+            # NotImplementedError: the event loop has no add_reader.
+            print(f"[DirWatcher] inotify unavailable ({e}), polling {path}")
+    return PollingWatcher(path, on_change, debounce_s).start()
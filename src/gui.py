@@ -0,0 +1,34 @@
+# src/gui.py
+import os
+import sys
+
+import flet as ft
+
+from src.main_app import AppUI
+
+if hasattr(sys, '_MEIPASS'):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main(page: ft.Page):
+    page.title = "AutoPilot"
+    page.window.width = 600
+    page.window.height = 700
+    page.window.resizable = True
+    page.theme_mode = ft.ThemeMode.DARK
+    page.window.icon = os.path.join(BASE_DIR, "assets/autopilot_logo.ico")
+    app_ui = AppUI(page)
+    page.window.prevent_close = True
+    page.window.on_event = app_ui.on_window_event
+    page.on_disconnect = app_ui.on_disconnect
+    page.add(
+        ft.Row([
+            ft.Image(src=os.path.join(BASE_DIR, "assets/autopilot_logo.svg"), width=48, height=48),
+            ft.Text("AutoPilot", size=32, weight=ft.FontWeight.BOLD, color=ft.Colors.PINK),
+        ], alignment=ft.MainAxisAlignment.CENTER, spacing=20),
+        app_ui
+    )
+
+def run():
+    ft.app(target=main)
@@ -0,0 +1,140 @@
+# src/log_index.py
+import time
+
+from src.batched_sqlite import BatchedSqlite, DEFAULT_FLUSH_INTERVAL_S
+
+LOG_INDEX_NAME = "log_index.db"
+DEFAULT_SEGMENT_ROWS = 2_000_000
+DEFAULT_KEEP_SEGMENTS = 8
+DEFAULT_FLUSH_LINES = 5000
+# Lines waiting for the writer before new ones are dropped instead, so a
+# writer that cannot keep up costs index coverage, not controller memory.
+DEFAULT_MAX_PENDING = 200_000
+# Matches counted per search for the per-device totals.
+DEVICE_COUNT_CAP = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+def fts_query(text):
+    """
+    Turns search box text into an FTS5 query: every word must appear, words
+    are matched literally (punctuation and all), and a trailing `*` makes a
+    word a prefix.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*") and len(word) > 1
+        word = word.rstrip("*") if prefix else word
+        terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+class LogIndex(BatchedSqlite):
+    """
+    Full-text index over the script output of every run, fed line by line as
+    it streams in. `add()` only queues the line on the event loop; batches go
+    into SQLite FTS5 from a worker thread (see BatchedSqlite).
+
+    Lines go into segments, one FTS5 table each, of up to `segment_rows`
+    lines. Only the newest `keep_segments` are kept; the oldest segment is
+    dropped as a whole, the same way SegmentSpill rotates log files, so old
+    lines never have to be deleted one by one.
+    """
+    def __init__(self, path, segment_rows=DEFAULT_SEGMENT_ROWS, keep_segments=DEFAULT_KEEP_SEGMENTS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL_S, flush_batch=DEFAULT_FLUSH_LINES,
+                 max_pending=DEFAULT_MAX_PENDING):
+        super().__init__(path, _SCHEMA, flush_interval, flush_batch)
+        self.segment_rows = segment_rows
+        self.keep_segments = keep_segments
+        self.max_pending = max_pending
+        self.dropped = 0
+
+    # --- Writing ---------------------------------------------------------
+    def add(self, serial, script, run_started, stream, line):
+        """Queues one output line of the run of `script` on `serial` that started at `run_started`."""
+        if self.pending >= self.max_pending:
+            if self.dropped % 10_000 == 0:
+                print(f"[LogIndex] Writer is behind, dropping lines ({self.dropped} so far)")
+            self.dropped += 1
+            return
+        self._queue((line, serial, script, run_started, stream, time.time()))
+
+    def _write_batch(self, conn, rows):
+        segment = conn.execute("SELECT id, rows FROM segments ORDER BY id DESC LIMIT 1").fetchone()
+        start = 0
+        while start < len(rows):
+            if segment is None or segment["rows"] >= self.segment_rows:
+                segment = self._new_segment(conn)
+            room = self.segment_rows - segment["rows"]
+            chunk = rows[start:start + room]
+            conn.executemany(
+                f"INSERT INTO lines_{segment['id']} (text, serial, script, run_started, stream, ts) "
+                "VALUES (?, ?, ?, ?, ?, ?)", chunk)
+            conn.execute("UPDATE segments SET rows = rows + ? WHERE id = ?", (len(chunk), segment["id"]))
+            segment = {"id": segment["id"], "rows": segment["rows"] + len(chunk)}
+            start += len(chunk)
+
+    def _new_segment(self, conn):
+        segment_id = conn.execute("INSERT INTO segments (created_at) VALUES (?)", (time.time(),)).lastrowid
+        # '_' is part of a word, so identifiers like search_user are one token. The serial
+        # is indexed too, so a search on one device intersects two token lists.
+        conn.execute(
+            f"CREATE VIRTUAL TABLE lines_{segment_id} USING fts5("
+            "text, serial, script UNINDEXED, run_started UNINDEXED, stream UNINDEXED, ts UNINDEXED, "
+            "tokenize = \"unicode61 tokenchars '_'\")"
+        )
+        for (old_id,) in conn.execute(
+            "SELECT id FROM segments ORDER BY id DESC LIMIT -1 OFFSET ?", (self.keep_segments,)
+        ).fetchall():
+            conn.execute(f"DROP TABLE IF EXISTS lines_{old_id}")
+            conn.execute("DELETE FROM segments WHERE id = ?", (old_id,))
+        return {"id": segment_id, "rows": 0}
+
+    # --- Queries ---------------------------------------------------------
+    def _segment_ids(self):
+        return [row["id"] for row in self._query("SELECT id FROM segments ORDER BY id DESC")]
+
+    def search(self, text, limit=100, serial=None):
+        """
+        Finds output lines matching `text` (see fts_query), newest first, on
+        one device if `serial` is given. Returns {"lines": [...], "devices":
+        [{"serial", "matches"}], "truncated": bool, "elapsed_ms": float}; the
+        per-device totals count at most DEVICE_COUNT_CAP matches.
+        """
+        started = time.perf_counter()
+        query = fts_query(text)
+        if not query:
+            return {"lines": [], "devices": [], "truncated": False, "elapsed_ms": 0.0}
+        query = f"text : ({query})"
+        if serial:
+            query += f" AND serial : {fts_query(serial)}"
+        lines, counts, counted = [], {}, 0
+        for segment_id in self._segment_ids():
+            table = f"lines_{segment_id}"
+            if len(lines) < limit:
+                lines += self._query(
+                    f"SELECT serial, script, run_started, stream, ts, text FROM {table} "
+                    f"WHERE {table} MATCH ? ORDER BY rowid DESC LIMIT ?",
+                    (query, limit - len(lines)))
+            if counted < DEVICE_COUNT_CAP:
+                for row in self._query(
+                    f"SELECT serial, COUNT(*) AS n FROM (SELECT serial FROM {table} "
+                    f"WHERE {table} MATCH ? LIMIT ?) GROUP BY serial",
+                    (query, DEVICE_COUNT_CAP - counted),
+                ):
+                    counts[row["serial"]] = counts.get(row["serial"], 0) + row["n"]
+                    counted += row["n"]
+            elif len(lines) >= limit:
+                break
+        devices = sorted(({"serial": s, "matches": n} for s, n in counts.items()),
+                         key=lambda device: device["matches"], reverse=True)
+        return {"lines": lines, "devices": devices, "truncated": counted >= DEVICE_COUNT_CAP,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    def count(self):
+        return self._query("SELECT COALESCE(SUM(rows), 0) AS n FROM segments")[0]["n"]
@@ -1,35 +1,24 @@
-import flet as ft
-import uiautomator2 as u2
-import yaml
-import pyotp
-import os
+# src/main.py
+# Entry point of the app and of its script workers. Each mode imports only
+# what it needs: the GUI (src.gui) pulls in flet, the headless commands
+# (src.cli) the Orchestrator without flet, the script modes
+# (src.script_runner) uiautomator2 and the other script dependencies.
+# Keep heavy imports out of this module.
 import sys
-from src.main_app import AppUI
 
-if hasattr(sys, '_MEIPASS'):
-    BASE_DIR = os.path.dirname(sys.executable)
-else:
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-def main(page: ft.Page):
-    page.title = "AutoPilot"
-    page.window.width = 600
-    page.window.height = 700
-    page.window.resizable = True
-    page.theme_mode = ft.ThemeMode.DARK
-    page.window.icon = os.path.join(BASE_DIR, "assets/autopilot_logo.ico")
-    page.add(
-        ft.Row([
-            ft.Image(src=os.path.join(BASE_DIR, "assets/autopilot_logo.svg"), width=48, height=48),
-            ft.Text("AutoPilot", size=32, weight=ft.FontWeight.BOLD, color=ft.Colors.PINK),
-        ], alignment=ft.MainAxisAlignment.CENTER, spacing=20),
-        AppUI(page)
-    )
+# The subcommands of src.cli.build_parser(), listed here so the GUI does not
+# import the CLI to find out it was not asked for.
+CLI_COMMANDS = ("devices", "scripts", "run", "serve", "history", "search", "tag", "group")
 
 if __name__ == "__main__":
+    # Pooled script workers are started with --worker. They stay idle with the
+    # heavy modules imported until the app hands them a job on stdin.
+    if "--worker" in sys.argv:
+        from src.script_runner import serve_worker
+        sys.exit(serve_worker())
     # When the packaged app is called to run a script, it re-launches itself
     # with the --run-script flag. This block handles that execution.
-    if "--run-script" in sys.argv:
+    elif "--run-script" in sys.argv:
         try:
             # Find the script path and device_id from the command line arguments
             # Expected format: InstaPilot.exe -u <script_path> <device_id> --run-script
@@ -40,20 +29,8 @@ if __name__ == "__main__":
             # IMPORTANT: We will now directly call the script's main function
             # with the device_id as an argument. The user will ensure all
             # scripts conform to the `def main(device_id):` signature.
-            
-            # Dynamically import and run the script's main() function
-            # This allows the packaged exe to behave like the python interpreter
-            import importlib.util
-            
-            # Create a module name from the filename
-            module_name = os.path.splitext(os.path.basename(script_path))[0]
-            
-            spec = importlib.util.spec_from_file_location(module_name, script_path)
-            script_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(script_module)
-            
-            # Call the script's main function directly with the device_id
-            script_module.main(device_id)
+            from src.script_runner import run_script
+            run_script(script_path, device_id)
             
         except Exception as e:
             print(f"Failed to execute script: {e}")
@@ -62,6 +39,11 @@ if __name__ == "__main__":
                 f.write(f"Error: {e}\n")
                 f.write(f"Args: {sys.argv}\n")
             sys.exit(1)
+    # Headless mode: `python -m src.main run reels.py --all`, `... serve`, etc.
+    elif len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+        from src.cli import main
+        sys.exit(main(sys.argv[1:]))
     else:
         # If no --run-script flag, launch the main Flet GUI
-        ft.app(target=main)
\ No newline at end of file
+        from src.gui import run
+        run()
\ No newline at end of file
@@ -2,110 +2,326 @@
 import flet as ft
 import asyncio
 import os
-import sys
-import yaml
-from src.ui_components import DeviceControl
+import time
+from src.ui_components import (
+    DeviceControl, DeviceListView, LogSearchPanel, ScreenGrid, ScreenTile, TILE_WIDTH, TILE_SPACING,
+)
+from src.device_rows import DeviceRow
+from src.device_model import SelectionIndex, STATE_ONLINE, STATE_UNAUTHORIZED
+from src.adb_client import AdbError
+from src.run_log import DEFAULT_MAX_LINES
+from src.config_store import ConfigStore
+from src.screen_capture import ScreenCapturer
+from src.ui_updates import UpdatePump, DEFAULT_UPDATE_HZ
+from src.orchestrator import (
+    Orchestrator, SCRIPT_DIR, LOG_DIR, HISTORY_PATH, LOG_INDEX_PATH, DEVICES_PATH, ACTIVE_RUN_STATES,
+)
 
-if hasattr(sys, '_MEIPASS'):
-    BASE_DIR = os.path.dirname(sys.executable)
-else:
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(SCRIPT_DIR, "config.yaml")
 
-CONFIG_PATH = os.path.join(BASE_DIR, "assets/scripts/config.yaml")
+# Set to a port number to also serve the HTTP/WebSocket API (src/api_server.py)
+# while the window is open.
+API_PORT_ENV = "AUTOPILOT_API_PORT"
+
+config_store = ConfigStore(CONFIG_PATH)
+
+# Devices in these states get a row. Unauthorized phones are listed (but
+# cannot run) so the pending USB debugging prompt is noticed.
+ROW_STATES = (STATE_ONLINE, STATE_UNAUTHORIZED)
+
+# Target dropdown entry for "the checked devices" rather than a saved group.
+TARGET_SELECTED = ""
+# Probe results and tag changes re-apply the filter at most this often.
+REFILTER_DELAY_S = 0.2
 
 def load_config():
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    return config_store.load()
 
 def save_config(config):
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        yaml.dump(config, f, allow_unicode=True)
+    config_store.save(config)
 
 class AppLogic:
-    """Handles the main application state and business logic."""
-    def __init__(self, page: ft.Page, progress_ring: ft.ProgressRing):
+    """
+    The Flet front end of the Orchestrator: renders its devices and runs from
+    the events it publishes and passes the user's actions on to it.
+    """
+    def __init__(self, page: ft.Page, progress_ring: ft.ProgressRing, update_hz=DEFAULT_UPDATE_HZ,
+                 log_dir=LOG_DIR, log_lines=DEFAULT_MAX_LINES, script_dir=SCRIPT_DIR, adb=None,
+                 history_path=HISTORY_PATH, log_index_path=LOG_INDEX_PATH, devices_path=DEVICES_PATH):
         self.page = page
+        self.core = Orchestrator(script_dir, log_dir, log_lines, adb=adb, config_store=config_store,
+                                 history_path=history_path, log_index_path=log_index_path,
+                                 devices_path=devices_path)
+        self.core.subscribe(self.on_core_event)
+        self.script_dir = script_dir
+        self.config_store = self.core.config_store
         self.progress_ring = progress_ring
+        self.update_pump = UpdatePump(page, update_hz)
         self.available_scripts = []
         self.script_display_names = {}
+        self.queue_status_text = ft.Text("")
+        self.api_server = None
 
-        self.device_list_view = ft.ListView(expand=True, spacing=5, auto_scroll=True)
+        self.device_list_view = DeviceListView(lambda: DeviceControl(self))
+        self.selection = SelectionIndex()
+        self.screen_grid = ScreenGrid(lambda: ScreenTile(self), self.device_list_view.rows,
+                                      self._screen_image, self.on_grid_window)
+        self.screen_capturer = None  # created when the grid is first shown
         self.script_dropdown = ft.Dropdown(
             hint_text="Select a script",
             options=[],
             expand=True,
         )
+        self.filter_field = ft.TextField(
+            hint_text="Filter devices, e.g. hub3, tag:lab android:13, group:night",
+            prefix_icon=ft.Icons.FILTER_LIST, dense=True, expand=True, on_change=self.on_filter_change,
+        )
+        self._refilter_task = None
+        self.target_dropdown = ft.Dropdown(value=TARGET_SELECTED, width=200, dense=True,
+                                           tooltip="Devices Run on Selected starts on")
+        self.refresh_groups()
         self.selected_count_text = ft.Text("0 devices selected")
         self.snack_bar = ft.SnackBar(content=ft.Text(""), duration=2000)
         self.page.overlay.append(self.snack_bar)
         self.select_all_button = None
         self.settings_dialog = None
+        self._shut_down = False
 
-    def load_scripts(self):
-        """Finds script files in the 'assets/scripts' directory and loads display names."""
-        script_dir = os.path.join("assets", "scripts")
-        print(f"Looking for scripts in '{script_dir}'...")
-        self.available_scripts.clear()
-        self.script_display_names.clear()
-
-        config = load_config()
-        if not os.path.isdir(script_dir):
-            print(f"Warning: Directory not found: '{script_dir}'")
-            return
-
-        for filename in os.listdir(script_dir):
-            if filename.endswith('.py'):
-                self.available_scripts.append(filename)
-                display_name = config.get(filename, {}).get("DISPLAY_NAME", filename)
-                self.script_display_names[filename] = display_name
-                print(f"Found script: {filename} ({display_name})")
+    @property
+    def device_model(self):
+        return self.core.device_model
 
+    def load_scripts(self):
+        """Loads the scripts in `script_dir` and fills the dropdown with their display names."""
+        self.available_scripts = self.core.load_scripts()
+        self.script_display_names = {
+            script: self.core.script_registry.get(script).display_name for script in self.available_scripts
+        }
         # Dropdown: show display name, value is filename
         self.script_dropdown.options = [
             ft.dropdown.Option(key=script, text=self.script_display_names[script])
             for script in self.available_scripts
         ]
 
+    async def start(self):
+        """Starts device discovery, probes and the script watch, and the API if API_PORT_ENV is set."""
+        await self.core.start()
+        port = os.environ.get(API_PORT_ENV)
+        if port:
+            from src.api_server import ApiServer
+            self.api_server = ApiServer(self.core, port=int(port))
+            await self.api_server.start()
+
+    async def shutdown(self):
+        """Stops the UI updates, the screen capture, the API and the Orchestrator with its runs. Only the first call does anything."""
+        if self._shut_down:
+            return
+        self._shut_down = True
+        if self._refilter_task is not None:
+            self._refilter_task.cancel()
+        # Before the core: the runs it cancels must not redraw a closing page.
+        self.update_pump.stop()
+        if self.screen_capturer is not None:
+            await self.screen_capturer.close()
+        if self.api_server is not None:
+            await self.api_server.stop()
+        await self.core.shutdown()
+
+    def on_core_event(self, event):
+        kind = event["type"]
+        if kind in ("run", "status", "stopped"):
+            row = self.device_list_view.get_row(event["serial"])
+            if row is not None:
+                row.apply_run_event(event)
+                self.refresh_row(row)
+            if kind == "run" and event["state"] not in ACTIVE_RUN_STATES:
+                self.on_run_finished(event["serial"])
+        elif kind == "devices":
+            self.on_devices_changed(event["added"], event["removed"], event["changed"])
+        elif kind == "probe":
+            row = self.device_list_view.get_row(event["serial"])
+            if row is not None:
+                row.info, row.attention = event["summary"], event["attention"]
+                self.refresh_row(row)
+            self.schedule_refilter()
+        elif kind == "tags":
+            self.on_tags_changed(event["serials"], event["groups"])
+        elif kind == "queue":
+            self.on_queue_changed(event)
+        elif kind == "scripts":
+            self.on_scripts_changed(event["added"], event["removed"], event["updated"])
+
+    def on_scripts_changed(self, added, removed, updated):
+        """
+        Applies registry changes to the dropdown. Options of unchanged scripts
+        are kept as they are, so only the changed ones are sent to the page.
+        """
+        dropdown = self.script_dropdown
+        registry = self.core.script_registry
+        options = {option.key: option for option in dropdown.options}
+        self.available_scripts = registry.scripts
+        self.script_display_names = {
+            script: registry.get(script).display_name for script in self.available_scripts
+        }
+        for script in updated:
+            if script in options:
+                options[script].text = self.script_display_names[script]
+        dropdown.options = [
+            options.get(script) or ft.dropdown.Option(key=script, text=self.script_display_names[script])
+            for script in self.available_scripts
+        ]
+        if dropdown.value in removed:
+            dropdown.value = None
+        self.update_pump.mark_dirty(dropdown)
+
     async def scan_devices(self, e=None):
+        """Re-reads the full device list from the ADB server (manual resync)."""
         print("Scanning for ADB devices...")
         self.progress_ring.visible = True
-        self.device_list_view.controls.clear()
         self.page.update()
+        message = None
         try:
-            proc = await asyncio.create_subprocess_shell(
-                'adb devices',
-                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await proc.communicate()
-            if proc.returncode == 0:
-                lines = stdout.decode().strip().split('\n')
-                devices = [line.split('\t')[0] for line in lines[1:] if '\tdevice' in line]
-                if not devices:
-                    self.device_list_view.controls.append(ft.Text("No devices found.", italic=True, text_align=ft.TextAlign.CENTER))
-                else:
-                    for device_id in devices:
-                        self.device_list_view.controls.append(DeviceControl(device_id, self))
-            else:
-                self.device_list_view.controls.append(ft.Text(f"ADB Error: {stderr.decode()}", color=ft.Colors.RED))
+            await self.core.scan()
+        except AdbError as ex:
+            message = ft.Text(f"ADB Error: {ex}", color=ft.Colors.RED)
         except Exception as ex:
-            self.device_list_view.controls.append(ft.Text(f"An error occurred: {ex}", color=ft.Colors.RED))
-        
+            message = ft.Text(f"An error occurred: {ex}", color=ft.Colors.RED)
+
         self.progress_ring.visible = False
-        await self.update_selected_count()
+        self.refresh_device_list(message)
+
+    def refresh_device_list(self, message=None):
+        """Re-renders the visible rows and the selection count after the device set changed."""
+        if self.device_list_view.filtered:
+            self.apply_filter()
+        if message is None and not self.device_list_view.rows:
+            message = ft.Text("No devices found.", italic=True, text_align=ft.TextAlign.CENTER)
+        elif message is None and not self.device_list_view.shown:
+            message = ft.Text("No devices match the filter.", italic=True, text_align=ft.TextAlign.CENTER)
+        self.device_list_view.set_message(message)
+        self.device_list_view.render()
+        self.render_screen_grid()
+        self.update_selected_count_text()
+        self.page.update()
+
+    def on_devices_changed(self, added, removed, changed):
+        """Adds or drops only the rows whose device changed."""
+        list_view = self.device_list_view
+        for serial in removed:
+            row = list_view.get_row(serial)
+            # Keep rows with a running script so they can still be stopped.
+            if row and not row.running:
+                self._remove_row(serial)
+        for serial in added + changed:
+            state = self.device_model.get(serial)
+            row = list_view.get_row(serial)
+            if state in ROW_STATES:
+                if row is None:
+                    row = self._add_row(serial)
+                self._set_row_state(row, state)
+            elif row is not None and not row.running:
+                self._remove_row(serial)
+        self.refresh_device_list()
+
+    def _add_row(self, serial):
+        row = DeviceRow(serial)
+        row.tags = tuple(self.core.device_tags.tags_of(serial))
+        self.device_list_view.add_row(row)
+        return row
+
+    def _set_row_state(self, row, state):
+        if row.set_device_state(state):
+            self.refresh_row(row)
+        self._watch_screen(row)
+        # Only devices that can run are selectable.
+        if state == STATE_ONLINE:
+            self.selection.track(row.serial)
+        else:
+            self.selection.untrack(row.serial)
+
+    def refresh_row(self, row):
+        """Sends a changed DeviceRow with the next frame if it is on screen."""
+        widget = self.device_list_view.widget_for(row.serial)
+        if widget is not None:
+            widget.bind(row)
+            # Batches change hundreds of rows at once; send them with the next frame.
+            self.update_pump.mark_dirty(widget)
+        self._watch_screen(row)
+        tile = self.screen_grid.tile_for(row.serial) if self.screen_grid.visible else None
+        if tile is not None:
+            tile.bind(row, self._screen_image(row.serial))
+            self.update_pump.mark_dirty(tile)
+
+    def _remove_row(self, serial):
+        self.device_list_view.remove_row(serial)
+        self.selection.untrack(serial)
+        if self.screen_capturer is not None:
+            self.screen_capturer.untrack(serial)
+
+    def on_run_finished(self, serial):
+        """Drops the row of a device that went away while its script was running."""
+        if self.device_model.get(serial) not in ROW_STATES and self.device_list_view.get_row(serial):
+            self._remove_row(serial)
+            self.refresh_device_list()
 
     async def run_on_selected(self, e):
         selected_script = self.get_selected_script()
         if not selected_script or selected_script not in self.available_scripts:
             await self.show_snackbar("Please select a valid script!")
             return
-        
-        selected_devices = [c for c in self.device_list_view.controls if isinstance(c, DeviceControl) and c.checkbox.value]
-        if not selected_devices:
+
+        group = self.target_dropdown.value
+        if group != TARGET_SELECTED and group in self.core.device_tags.groups:
+            # A saved group runs as it is, whatever is checked or filtered.
+            serials = self.core.group_devices(group)
+            skipped = self.core.submit(selected_script, serials)
+            await self.show_snackbar(f"Queued {len(serials) - len(skipped)} device(s) of {group}"
+                                     + (f", {len(skipped)} offline or busy" if skipped else ""))
+            return
+
+        selected = self.selection.selected
+        serials = [s for s in self.device_list_view.rows if s in selected]
+        if not serials:
             await self.show_snackbar("Please select at least one device!")
             return
-            
-        tasks = [dev.start_script(selected_script) for dev in selected_devices if not dev.is_running]
-        await asyncio.gather(*tasks)
+
+        # Runs are queued and started by the scheduler within its concurrency
+        # limits; devices that are already busy are skipped.
+        self.core.submit(selected_script, serials)
+
+    async def stop_selected(self, e):
+        selected = self.selection.selected
+        await self._stop_and_report([s for s in self.device_list_view.rows if s in selected])
+
+    async def stop_all(self, e):
+        await self._stop_and_report(list(self.device_list_view.rows))
+
+    async def _stop_and_report(self, serials):
+        serials = [serial for serial in serials if self.core.is_active(serial)]
+        if not serials:
+            await self.show_snackbar("Nothing is running.")
+            return
+        started = time.perf_counter()
+        results = await self.core.stop(serials)
+        forced = sum(1 for result in results if result.forced)
+        message = f"Stopped {len(serials)} device(s) in {time.perf_counter() - started:.1f}s"
+        if forced:
+            message += f" ({forced} killed after {self.core.stopper.kill_after}s)"
+        await self.show_snackbar(message)
+
+    def on_queue_changed(self, event):
+        """Shows queue depth and estimated wait in the status bar."""
+        running, depth = event["running"], event["queued"]
+        if depth == 0:
+            text = f"{running} running" if running else ""
+        else:
+            text = f"{running} running, {depth} queued"
+            if event["eta_s"] is not None:
+                minutes, seconds = divmod(int(event["eta_s"]), 60)
+                text += f" (~{minutes}m {seconds:02d}s)"
+        if text != self.queue_status_text.value:
+            self.queue_status_text.value = text
+            self.update_pump.mark_dirty(self.queue_status_text)
 
     def get_selected_script(self):
         return self.script_dropdown.value
@@ -115,38 +331,238 @@ class AppLogic:
         self.snack_bar.open = True
         self.page.update()
 
-    async def update_selected_count(self, e=None):
-        controls = self.device_list_view.controls
-        total = sum(1 for c in controls if isinstance(c, DeviceControl))
-        count = sum(1 for c in controls if isinstance(c, DeviceControl) and c.checkbox.value)
+    def update_selected_count_text(self):
+        count, total = self.selection.count, self.selection.total
         self.selected_count_text.value = f"{count} / {total} devices selected"
+        if self.device_list_view.filtered:
+            self.selected_count_text.value += f", {len(self.device_list_view.shown)} shown"
         
         # Toggle select all button text
         if self.select_all_button:
-            all_selected = total > 0 and count == total
-            self.select_all_button.text = "Deselect All" if all_selected else "Select All"
+            self.select_all_button.text = "Deselect All" if self._all_shown_selected() else "Select All"
 
-        self.page.update()
+    def _all_shown_selected(self):
+        if not self.device_list_view.filtered:
+            return self.selection.all_selected
+        return self.selection.all_selected_of(self.device_list_view.shown)
+
+    def _flush_selection(self, *controls):
+        """Sends the count, the Select All button and any extra controls in one update."""
+        self.update_selected_count_text()
+        status_controls = [self.selected_count_text]
+        if self.select_all_button:
+            status_controls.append(self.select_all_button)
+        self.page.update(*status_controls, *controls)
+
+    async def set_device_selected(self, serial, value):
+        """Records a single checkbox change; only the status bar is sent to the page."""
+        if self.selection.set_selected(serial, value):
+            self._flush_selection()
+
+    async def set_selection(self, value):
+        """
+        Selects or deselects every device in one pass, or every listed one
+        while a filter is set. Only the rendered rows re-read their checkbox,
+        and they are sent in a single update together with the status bar.
+        """
+        list_view = self.device_list_view
+        if list_view.filtered:
+            self.selection.set_many(list_view.shown, value)
+        else:
+            self.selection.set_all(value)
+        list_view.rebind()
+        self._flush_selection(list_view)
 
     async def toggle_select_all(self, e):
-        controls = self.device_list_view.controls
-        total = sum(1 for c in controls if isinstance(c, DeviceControl))
-        count = sum(1 for c in controls if isinstance(c, DeviceControl) and c.checkbox.value)
-        
-        new_value = not (total > 0 and count == total)
-        
-        for control in controls:
-            if isinstance(control, DeviceControl):
-                control.checkbox.value = new_value
-        await self.update_selected_count()
+        await self.set_selection(not self._all_shown_selected())
+
+    # --- Filter, tags and groups -----------------------------------------
+    def apply_filter(self):
+        """Lists the rows matching the filter box (see FilterIndex)."""
+        self.device_list_view.set_filter(self.core.device_filter.match(self.filter_field.value or ""))
+
+    async def on_filter_change(self, e):
+        list_view = self.device_list_view
+        self.apply_filter()
+        list_view.set_message(
+            ft.Text("No devices match the filter.", italic=True, text_align=ft.TextAlign.CENTER)
+            if list_view.rows and not list_view.shown else None)
+        list_view.render()
+        self.render_screen_grid(top=True)
+        self.update_selected_count_text()
+        self.page.update(list_view, self.screen_grid, self.selected_count_text,
+                         *([self.select_all_button] if self.select_all_button else []))
+        for view in (list_view, self.screen_grid):
+            if view.page is not None and view.visible:
+                view.scroll_to(offset=0, duration=0)
+
+    def schedule_refilter(self):
+        """Re-applies the filter shortly, once for a burst of probe results or tag changes."""
+        if not self.device_list_view.filtered or (self._refilter_task and not self._refilter_task.done()):
+            return
+        self._refilter_task = self.page.run_task(self._refilter_later)
+
+    async def _refilter_later(self):
+        await asyncio.sleep(REFILTER_DELAY_S)
+        if self.device_list_view.filtered:
+            self.refresh_device_list()
+
+    # --- screen grid ---
+
+    async def toggle_screen_grid(self, e=None):
+        """Swaps the device list for the screen grid and back; screenshots are taken only while it shows."""
+        grid = self.screen_grid
+        if grid.visible:
+            await self.screen_capturer.stop()
+        else:
+            if self.screen_capturer is None:
+                self.screen_capturer = ScreenCapturer(self.core.adb, self.on_screen_frame)
+            for row in self.device_list_view.rows.values():
+                self._watch_screen(row)
+            self.screen_capturer.start()
+        grid.visible = not grid.visible
+        self.device_list_view.visible = not grid.visible
+        self.render_screen_grid(top=True)
+        self.page.update()
+
+    def _grid_columns(self):
+        width = getattr(self.page, "width", None)
+        return max(1, int(width - 40) // (TILE_WIDTH + TILE_SPACING)) if width else None
+
+    def render_screen_grid(self, top=False):
+        """Re-renders the grid over the listed devices, if it is shown."""
+        if self.screen_grid.visible:
+            self.screen_grid.set_serials(self.device_list_view.shown, self._grid_columns(), top=top)
+            self.screen_grid.render()
+
+    def _screen_image(self, serial):
+        return self.screen_capturer.image(serial) if self.screen_capturer is not None else None
+
+    def _watch_screen(self, row):
+        """Tells the capturer whether `row`'s device can be watched and how closely."""
+        capturer = self.screen_capturer
+        if capturer is None:
+            return
+        if row.online:
+            capturer.track(row.serial, self.core.transport_of(row.serial))
+            capturer.set_active(row.serial, row.notable)
+        else:
+            capturer.untrack(row.serial)
+
+    def on_grid_window(self, serials):
+        if self.screen_capturer is not None:
+            self.screen_capturer.set_visible(serials)
+
+    def on_screen_frame(self, serial, image):
+        tile = self.screen_grid.tile_for(serial)
+        if tile is not None and self.screen_grid.visible:
+            tile.set_image(image)
+            self.update_pump.mark_dirty(tile)
+
+    def refresh_groups(self):
+        """Fills the run target dropdown with the saved groups."""
+        groups = self.core.device_tags.groups
+        self.target_dropdown.options = [ft.dropdown.Option(key=TARGET_SELECTED, text="Selected devices")] + [
+            ft.dropdown.Option(key=name, text=f"Group: {name} ({len(serials)})")
+            for name, serials in sorted(groups.items())
+        ]
+        if self.target_dropdown.value not in groups:
+            self.target_dropdown.value = TARGET_SELECTED
+
+    def on_tags_changed(self, serials, groups):
+        for serial in serials:
+            row = self.device_list_view.get_row(serial)
+            if row is not None:
+                row.tags = tuple(self.core.device_tags.tags_of(serial))
+                self.refresh_row(row)
+        if groups:
+            self.refresh_groups()
+            self.update_pump.mark_dirty(self.target_dropdown)
+        self.schedule_refilter()
+
+    def _selected_serials(self):
+        selected = self.selection.selected
+        return [s for s in self.device_list_view.rows if s in selected]
+
+    def _prompt(self, title, label, on_submit, value=""):
+        """
+        A small dialog with one text field; `on_submit(text)` returns an error
+        message or None. The handlers are async so Flet runs them on the event
+        loop, like every other call into the Orchestrator (plain ones run on a
+        worker thread).
+        """
+        field = ft.TextField(label=label, value=value, autofocus=True, width=400)
+        error = ft.Text("", color=ft.Colors.RED, visible=False)
+
+        async def submit(e):
+            try:
+                problem = on_submit((field.value or "").strip())
+            except ValueError as ex:
+                problem = str(ex)
+            if problem:
+                error.value, error.visible = problem, True
+                self.page.update()
+                return
+            dialog.open = False
+            self.page.update()
+
+        async def close(e):
+            dialog.open = False
+            self.page.update()
+
+        field.on_submit = submit
+        dialog = ft.AlertDialog(
+            modal=True, title=ft.Text(title),
+            content=ft.Column([field, error], tight=True),
+            actions=[ft.TextButton("Cancel", on_click=close), ft.ElevatedButton("OK", on_click=submit)],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        self.page.overlay.append(dialog)
+        dialog.open = True
+        self.page.update()
+
+    async def tag_selected(self, e):
+        serials = self._selected_serials()
+        if not serials:
+            await self.show_snackbar("Please select at least one device!")
+            return
+
+        def apply(text):
+            add = [word for word in text.replace(",", " ").split() if not word.startswith("-")]
+            remove = [word[1:] for word in text.replace(",", " ").split() if word.startswith("-") and word[1:]]
+            if not add and not remove:
+                return "Enter tags to add, or -tag to remove one."
+            self.core.change_tags(serials, add, remove)
+        self._prompt(f"Tag {len(serials)} device(s)", "Tags, e.g. hub3 lab -spare (- removes)", apply)
+
+    async def save_selection_as_group(self, e):
+        serials = self._selected_serials()
+        if not serials:
+            await self.show_snackbar("Please select at least one device!")
+            return
+
+        def apply(name):
+            if not name:
+                return "Enter a name."
+            self.core.save_group(name, serials)
+            self.target_dropdown.value = name
+            self.page.update(self.target_dropdown)
+        self._prompt(f"Save {len(serials)} device(s) as a group", "Group name", apply)
+
+    async def delete_target_group(self, e):
+        group = self.target_dropdown.value
+        if group == TARGET_SELECTED or group not in self.core.device_tags.groups:
+            await self.show_snackbar("Pick a group in the target list first.")
+            return
+        self.core.delete_group(group)
+        await self.show_snackbar(f"Deleted group {group}")
 
     def open_script_settings(self, script_filename):
         """Open settings dialog for specific script."""
         if not script_filename or script_filename not in self.available_scripts:
             return
         
-        config = load_config()
-        script_config = config.get(script_filename, {})
+        script_config = self.config_store.section(script_filename)
         display_name = script_config.get("DISPLAY_NAME", script_filename)
         
         # Create form fields for this script
@@ -179,6 +595,7 @@ class AppLogic:
         
         def save_script_settings(e):
             # Update config for this script
+            updated = dict(script_config)
             for key, field in fields.items():
                 value = field.value
                 original_value = script_config[key]
@@ -196,9 +613,9 @@ class AppLogic:
                 elif isinstance(original_value, list):
                     value = [x.strip() for x in value.split("\n") if x.strip()]
                 
-                config[script_filename][key] = value
+                updated[key] = value
             
-            save_config(config)
+            self.config_store.update_section(script_filename, updated)
             self.settings_dialog.open = False
             self.page.update()
             
@@ -242,6 +659,7 @@ class AppUI(ft.Column):
         self.progress_ring = ft.ProgressRing(visible=False, width=16, height=16, stroke_width=2)
         self.app_logic = AppLogic(page, self.progress_ring)
         self.app_logic.select_all_button = ft.TextButton("Select All", on_click=self.app_logic.toggle_select_all)
+        self.log_search_panel = LogSearchPanel(self.app_logic)
 
         # Settings button for the selected script
         self.settings_button = ft.IconButton(
@@ -257,36 +675,81 @@ class AppUI(ft.Column):
                     self.app_logic.script_dropdown,
                     self.settings_button,
                     ft.VerticalDivider(width=10),
+                    self.app_logic.target_dropdown,
                     ft.FilledButton(
                         text="Run on Selected", icon=ft.Icons.PLAY_ARROW,
                         on_click=self.app_logic.run_on_selected,
                     ),
+                    ft.OutlinedButton(
+                        text="Stop Selected", icon=ft.Icons.STOP,
+                        on_click=self.app_logic.stop_selected,
+                    ),
+                    ft.OutlinedButton(
+                        text="Stop All", icon=ft.Icons.STOP_CIRCLE,
+                        on_click=self.app_logic.stop_all,
+                    ),
                     ft.VerticalDivider(width=20),
                     self.progress_ring,
                     ft.IconButton(
                         icon=ft.Icons.REFRESH, on_click=self.app_logic.scan_devices,
                         tooltip="Refresh device list"
                     ),
+                    ft.IconButton(
+                        icon=ft.Icons.GRID_VIEW, on_click=self.app_logic.toggle_screen_grid,
+                        tooltip="Screen grid"
+                    ),
+                    ft.IconButton(
+                        icon=ft.Icons.MANAGE_SEARCH, on_click=self.log_search_panel.toggle,
+                        tooltip="Search script output",
+                        visible=self.app_logic.core.log_index is not None,
+                    ),
                 ],
                 spacing=10, vertical_alignment=ft.CrossAxisAlignment.CENTER
             ),
             padding=ft.padding.symmetric(vertical=5, horizontal=15),
             border=ft.border.only(bottom=ft.border.BorderSide(1, ft.Colors.OUTLINE))
         )
+        filter_bar = ft.Container(
+            content=ft.Row(
+                [
+                    self.app_logic.filter_field,
+                    ft.PopupMenuButton(
+                        icon=ft.Icons.LABEL, tooltip="Tags and groups",
+                        items=[
+                            ft.PopupMenuItem(text="Tag selected devices...", icon=ft.Icons.NEW_LABEL,
+                                             on_click=self.app_logic.tag_selected),
+                            ft.PopupMenuItem(text="Save selection as group...", icon=ft.Icons.GROUP_ADD,
+                                             on_click=self.app_logic.save_selection_as_group),
+                            ft.PopupMenuItem(text="Delete target group", icon=ft.Icons.GROUP_REMOVE,
+                                             on_click=self.app_logic.delete_target_group),
+                        ],
+                    ),
+                ],
+                spacing=10, vertical_alignment=ft.CrossAxisAlignment.CENTER
+            ),
+            padding=ft.padding.only(left=15, right=15, top=8),
+        )
         status_bar = ft.Container(
             content=ft.Row([
                 self.app_logic.selected_count_text,
-                self.app_logic.select_all_button
+                self.app_logic.select_all_button,
+                ft.Container(expand=True),
+                self.app_logic.queue_status_text,
             ]),
             padding=ft.padding.symmetric(vertical=3, horizontal=15),
             border=ft.border.only(top=ft.border.BorderSide(1, ft.Colors.OUTLINE))
         )
         main_content = ft.Column([
             toolbar,
-            ft.Container(
-                content=self.app_logic.device_list_view,
-                expand=True, padding=10
-            ),
+            filter_bar,
+            ft.Row([
+                ft.Container(
+                    content=ft.Column([self.app_logic.device_list_view, self.app_logic.screen_grid],
+                                      expand=True, spacing=0),
+                    expand=True, padding=10
+                ),
+                self.log_search_panel,
+            ], expand=True, spacing=0, vertical_alignment=ft.CrossAxisAlignment.STRETCH),
             status_bar,
         ], expand=True, spacing=0)
 
@@ -297,6 +760,19 @@ class AppUI(ft.Column):
         )
 
         self.app_logic.load_scripts()
+
+    def did_mount(self):
+        self.app_logic.page.run_task(self.app_logic.start)
+
+    async def on_window_event(self, e: ft.WindowEvent):
+        # The window waits (prevent_close) until the runs are stopped and the databases closed.
+        if e.type == ft.WindowEventType.CLOSE:
+            await self.app_logic.shutdown()
+            self.app_logic.page.window.destroy()
+
+    async def on_disconnect(self, e):
+        # A browser session ended; no window close event comes then.
+        await self.app_logic.shutdown()
     
     def open_current_script_settings(self, e):
         """Open settings for the currently selected script."""
@@ -0,0 +1,530 @@
+# src/orchestrator.py
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+
+from src.adb_client import AdbClient
+from src.config_store import ConfigStore
+from src.device_discovery import DeviceDiscovery
+from src.device_model import DeviceModel, FilterIndex, STATE_ONLINE
+from src.device_probe import DeviceProber
+from src.device_tags import DeviceTags, DEVICES_NAME
+from src.progress import parse_event, RunProgress
+from src.log_index import LogIndex, LOG_INDEX_NAME
+from src.run_history import RunHistory, HISTORY_NAME
+from src.run_log import LogBuffer, SegmentSpill, safe_filename, DEFAULT_MAX_LINES, STDOUT, STDERR
+from src.run_stopper import RunStopper
+from src.scheduler import RunScheduler, transport_key, PRIORITY_BATCH
+from src.script_registry import ScriptRegistry, CONFIG_NAME
+from src.session_broker import SessionBroker
+from src.tracing import Tracer, TRACE_ENV, SCRIPT_TID, now_us
+from src.worker_pool import WorkerPool
+
+if hasattr(sys, '_MEIPASS'):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT_DIR = os.path.join(BASE_DIR, "assets/scripts")
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+TRACE_DIR = os.path.join(BASE_DIR, "traces")
+SCRIPT_CACHE_DIR = os.path.join(BASE_DIR, ".cache", "scripts")
+HISTORY_PATH = os.path.join(BASE_DIR, HISTORY_NAME)
+LOG_INDEX_PATH = os.path.join(BASE_DIR, LOG_INDEX_NAME)
+DEVICES_PATH = os.path.join(BASE_DIR, DEVICES_NAME)
+
+# Lifecycle of a DeviceRun
+RUN_QUEUED = "queued"
+RUN_RUNNING = "running"
+RUN_FINISHED = "finished"
+RUN_FAILED = "failed"
+RUN_STOPPED = "stopped"
+RUN_CANCELLED = "cancelled"  # left the queue before it started
+ACTIVE_RUN_STATES = (RUN_QUEUED, RUN_RUNNING)
+
+class DeviceRun:
+    """One script run on one device, from queued to done."""
+    __slots__ = ("run_id", "serial", "script", "priority", "state", "status_text", "progress", "log",
+                 "process", "task", "stop_requested", "stop_result", "returncode",
+                 "queued_at", "started_at", "finished_at", "queued_us", "config_hash", "phases", "log_ref")
+
+    def __init__(self, run_id, serial, script, priority):
+        self.run_id = run_id
+        self.serial = serial
+        self.script = script
+        self.priority = priority
+        self.state = RUN_QUEUED
+        self.status_text = "Queued"
+        self.progress = RunProgress()
+        self.log = None  # LogBuffer, from launch on
+        self.process = None
+        self.task = None
+        self.stop_requested = False
+        self.stop_result = None
+        self.returncode = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.queued_us = now_us()  # for traces
+        self.config_hash = None  # of the script's config section as launched
+        self.phases = {}  # phase name -> seconds, e.g. "session_s"
+        self.log_ref = None  # SegmentSpill.span() of this run's output: (first file, start, last file, end)
+
+    def phase(self, name, since):
+        """Records the time from `since` (a perf_counter value) to now as phase `name`; returns now."""
+        now = time.perf_counter()
+        self.phases[name] = round(now - since, 4)
+        return now
+
+    @property
+    def active(self):
+        return self.state in ACTIVE_RUN_STATES
+
+    def to_dict(self, log_lines=0):
+        """JSON-ready summary; with `log_lines`, the tail of the output is included."""
+        data = {
+            "run_id": self.run_id, "serial": self.serial, "script": self.script, "state": self.state,
+            "status": self.status_text, "fraction": self.progress.fraction,
+            "result_code": self.progress.result_code, "result_message": self.progress.result_message,
+            "returncode": self.returncode, "queued_at": self.queued_at,
+            "started_at": self.started_at, "finished_at": self.finished_at,
+            "config_hash": self.config_hash, "phases": self.phases,
+        }
+        if self.stop_result is not None:
+            data["stop"] = {"latency_s": round(self.stop_result.total_s, 3), "killed": self.stop_result.forced}
+        if log_lines and self.log is not None:
+            data["log"] = self.log.tail(log_lines)
+        return data
+
+class Orchestrator:
+    """
+    The app without its window: device discovery and probes, the run queue,
+    script workers, uiautomator2 sessions, script registry and stopping.
+    Frontends (the Flet GUI, the CLI, the HTTP API) drive it through
+    `submit()`/`stop()` and follow it through `subscribe()`.
+
+    Listeners get JSON-ready event dicts with a "type":
+        devices  {"added", "removed", "changed"}: serials whose ADB state changed
+        probe    {"serial", "summary", "attention", ...}: a device probe result
+        run      DeviceRun.to_dict(): a run was queued, started, or ended
+        status   {"serial", "status", "fraction"}: the run's status line changed
+        output   {"serial", "stream", "line"}: one output line of a script
+        stopped  {"serial", "latency_s", "killed", "summary"}: a stop request completed
+        queue    {"running", "queued", "eta_s"}: the run queue changed
+        scripts  {"added", "removed", "updated"}: script files changed
+        tags     {"serials", "groups"}: tags of these devices or the saved groups changed
+    """
+    def __init__(self, script_dir=SCRIPT_DIR, log_dir=LOG_DIR, log_lines=DEFAULT_MAX_LINES, adb=None,
+                 config_store=None, echo_output=True, history_path=HISTORY_PATH, log_index_path=LOG_INDEX_PATH,
+                 devices_path=DEVICES_PATH):
+        self.script_dir = script_dir
+        self.log_dir = log_dir  # None keeps run output in memory only
+        self.log_lines = log_lines
+        self.echo_output = echo_output  # print script output to the console
+        self.config_store = config_store or ConfigStore(os.path.join(script_dir, CONFIG_NAME))
+        self.tracer = Tracer.from_env(TRACE_DIR)
+        self.script_registry = ScriptRegistry(
+            script_dir, self.config_store, SCRIPT_CACHE_DIR, on_change=self._on_scripts_changed
+        )
+        self.worker_pool = WorkerPool()
+        self.scheduler = RunScheduler(on_change=self._on_queue_changed)
+        # One connect thread per run slot; the CLI may raise max_concurrent later.
+        self.session_broker = SessionBroker(max_workers=self.scheduler.max_concurrent)
+
+        self.device_model = DeviceModel()
+        self.device_model.subscribe(self._on_devices_changed)
+        self.adb = adb or AdbClient()
+        self.discovery = DeviceDiscovery(self.device_model, self.adb)
+        self.prober = DeviceProber(self.adb, on_result=self._on_probe_result)
+        self.stopper = RunStopper(self.adb)
+        self.history = RunHistory(history_path) if history_path else None  # None keeps no history
+        self.log_index = LogIndex(log_index_path) if log_index_path else None  # None: output is not searchable
+        self.device_tags = DeviceTags(devices_path)  # None keeps tags and groups in memory only
+        self.device_filter = FilterIndex()
+
+        self.runs = {}  # serial -> DeviceRun, the current or last run of each device
+        self._run_ids = itertools.count(1)
+        self._listeners = []
+        self._started = False
+
+    # --- Events ----------------------------------------------------------
+    def subscribe(self, listener):
+        """Registers `listener(event)`; see the class docstring for the events."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, event):
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"[Orchestrator] Event listener failed on {event.get('type')}: {e}")
+
+    # --- Lifecycle -------------------------------------------------------
+    def load_scripts(self):
+        return self.script_registry.load()
+
+    async def start(self, probe=True, watch_scripts=True):
+        """Starts following devices (and probing them) and script changes, and warms up script workers."""
+        self._started = True
+        if self.device_model.devices:
+            self.worker_pool.prewarm(len(self.device_model))
+        self.discovery.start()
+        if probe:
+            self.prober.start(self.online_devices)
+        if watch_scripts:
+            self.script_registry.start_watching()
+
+    async def scan(self):
+        """Re-reads the full device list from the ADB server. Raises AdbError/OSError if it is unreachable."""
+        self.device_model.apply_scan(*await self.adb.devices(long=True))
+
+    async def shutdown(self):
+        """Stops every run and background service."""
+        await self.stop([serial for serial, run in self.runs.items() if run.active])
+        self.script_registry.stop_watching()
+        self.prober.stop()
+        await self.discovery.stop()
+        await self.session_broker.shutdown()
+        await self.worker_pool.shutdown()
+        if self.history is not None:
+            await self.history.close()
+        if self.log_index is not None:
+            await self.log_index.close()
+
+    # --- Devices ---------------------------------------------------------
+    def online_devices(self):
+        return [serial for serial, state in self.device_model.devices.items() if state == STATE_ONLINE]
+
+    def transport_of(self, serial):
+        """The ADB transport (USB hub or host) `serial` shares with other devices."""
+        return transport_key(serial, self.device_model.details.get(serial))
+
+    def device_summary(self, serial):
+        info = self.prober.cache.get(serial)
+        run = self.runs.get(serial)
+        return {
+            "serial": serial,
+            "state": self.device_model.get(serial),
+            "tags": self.device_tags.tags_of(serial),
+            "details": self.device_model.details.get(serial, {}),
+            "info": info.to_dict() if info else None,
+            "attention": info.needs_attention if info else None,
+            "run": run.to_dict() if run else None,
+        }
+
+    def _on_devices_changed(self, added, removed, changed):
+        for serial in removed:
+            self.device_filter.remove(serial)
+            self.session_broker.drop(serial)
+            self.prober.invalidate(serial)
+            self._cancel_queued(serial)
+        probe = []
+        for serial in added:
+            self._index_device(serial)
+        for serial in added + changed:
+            self.device_filter.update(serial, state=self.device_model.get(serial))
+            if self.device_model.get(serial) == STATE_ONLINE:
+                probe.append(serial)
+            else:
+                self.session_broker.drop(serial)
+                self.prober.invalidate(serial)
+                # A queued run could not start on it anyway.
+                self._cancel_queued(serial)
+        if probe:
+            self.prober.probe_all(probe)
+        if added and self._started:
+            # Have workers ready before the first run is started; a scan alone
+            # (e.g. `devices` on the CLI) runs no scripts.
+            self.worker_pool.prewarm(len(self.device_model))
+        self._emit({"type": "devices", "added": added, "removed": removed, "changed": changed})
+
+    def _on_probe_result(self, serial, info):
+        if serial in self.device_model:
+            self.device_filter.update(serial, model=info.model, android=info.android)
+        self._emit({"type": "probe", "serial": serial, "summary": info.summary(),
+                    "attention": info.needs_attention, **info.to_dict()})
+
+    # --- Tags and groups -------------------------------------------------
+    def _index_device(self, serial):
+        self.device_filter.update(
+            serial, tag=self.device_tags.tags_of(serial), group=self.device_tags.groups_of(serial))
+
+    def find_devices(self, query):
+        """Known devices matching a filter query (see FilterIndex), in device list order."""
+        matches = self.device_filter.match(query)
+        return [serial for serial in self.device_model.devices if matches is None or serial in matches]
+
+    def group_devices(self, name):
+        """The serials of saved group `name`. Raises ValueError if there is no such group."""
+        return list(self.device_tags.group(name))
+
+    def change_tags(self, serials, add=(), remove=()):
+        """Adds and removes tags on `serials` and saves them. Raises ValueError on a bad tag."""
+        self.device_tags.change_tags(serials, add, remove)
+        self._on_tags_changed(serials, groups=False)
+
+    def save_group(self, name, serials):
+        old = self.device_tags.groups.get(name, [])
+        self.device_tags.save_group(name, serials)
+        self._on_tags_changed([*old, *serials], groups=True)
+
+    def delete_group(self, name):
+        old = self.device_tags.group(name)
+        self.device_tags.delete_group(name)
+        self._on_tags_changed(old, groups=True)
+
+    def _on_tags_changed(self, serials, groups):
+        serials = list(dict.fromkeys(serials))
+        for serial in serials:
+            if serial in self.device_model:
+                self._index_device(serial)
+        self._emit({"type": "tags", "serials": serials, "groups": groups})
+
+    # --- Scripts ---------------------------------------------------------
+    @property
+    def scripts(self):
+        return self.script_registry.scripts
+
+    def _on_scripts_changed(self, added, removed, updated):
+        self._emit({"type": "scripts", "added": added, "removed": removed, "updated": updated})
+
+    # --- Runs ------------------------------------------------------------
+    def is_active(self, serial):
+        run = self.runs.get(serial)
+        return run is not None and run.active
+
+    def submit(self, script, serials, priority=PRIORITY_BATCH):
+        """
+        Queues `script` on each of `serials`. Devices that are not online or
+        already busy are skipped. Returns {serial: reason} of the skipped ones.
+        """
+        if script not in self.script_registry.scripts:
+            raise ValueError(f"Unknown script: {script}")
+        skipped = {}
+        for serial in serials:
+            state = self.device_model.get(serial)
+            if state is None:
+                skipped[serial] = "not connected"
+            elif state != STATE_ONLINE:
+                skipped[serial] = state
+            elif self.is_active(serial):
+                skipped[serial] = "busy"
+            else:
+                self._queue(serial, script, priority)
+        return skipped
+
+    def _queue(self, serial, script, priority):
+        run = DeviceRun(next(self._run_ids), serial, script, priority)
+        self.runs[serial] = run
+        self.scheduler.submit(
+            serial, lambda: self._launch(run),
+            transport=self.transport_of(serial),
+            priority=priority,
+        )
+        self._emit_run(run)
+
+    def _emit_run(self, run):
+        self._emit({"type": "run", **run.to_dict()})
+
+    def _set_status(self, run, text):
+        run.status_text = text
+        self._emit({"type": "status", "serial": run.serial, "status": text, "fraction": run.progress.fraction})
+
+    def _cancel_queued(self, serial):
+        run = self.runs.get(serial)
+        if run is None or run.state != RUN_QUEUED:
+            return False
+        self.scheduler.cancel(serial)
+        run.state = RUN_CANCELLED
+        run.status_text = "Cancelled"
+        run.finished_at = time.time()
+        self._emit_run(run)
+        return True
+
+    async def _launch(self, run):
+        """Called by the scheduler once a slot is free."""
+        self.tracer.complete(run.serial, "queued", run.queued_us, now_us() - run.queued_us)
+        run.state = RUN_RUNNING
+        run.status_text = "Running..."
+        run.started_at = time.time()
+        self._emit_run(run)
+        run.task = asyncio.create_task(self._execute(run))
+        return run.task
+
+    def new_run_log(self, serial):
+        """Creates the output buffer for one run, spilling to `log_dir/<serial>.log` if enabled."""
+        spill = SegmentSpill(self.log_dir, safe_filename(serial)) if self.log_dir else None
+        return LogBuffer(self.log_lines, spill)
+
+    def _history_row(self, run):
+        log_path, log_start, log_end_path, log_end = run.log_ref or (None, None, None, None)
+        return dict(
+            run.phases, serial=run.serial, script=run.script, config_hash=run.config_hash, state=run.state,
+            returncode=run.returncode, result_code=run.progress.result_code, status=run.status_text,
+            queued_at=run.queued_at, started_at=run.started_at, finished_at=run.finished_at,
+            duration_s=run.finished_at - run.started_at, queue_s=run.started_at - run.queued_at,
+            log_path=log_path, log_start=log_start, log_end_path=log_end_path, log_end=log_end,
+            lines=run.log.total_lines,
+        )
+
+    def _script_params(self, script):
+        try:
+            return self.config_store.section(script)
+        except FileNotFoundError:
+            return {}
+
+    async def _read_stream(self, run, stream, name):
+        """Reads one output stream line by line into the run log until EOF."""
+        while True:
+            try:
+                line = await stream.readline()
+            except ValueError:
+                # Line longer than the stream buffer limit; the chunk is dropped.
+                continue
+            if not line:
+                break
+            if name == STDOUT:
+                event = parse_event(line)
+                if event is not None:
+                    self._apply_progress(run, event)
+                    continue
+            if run.log.total_lines == 0:
+                self.tracer.instant(run.serial, "first output", tid=SCRIPT_TID)
+                run.phases["first_output_s"] = round(time.time() - run.started_at, 4)
+            log_line = line.decode(errors="replace").rstrip()
+            run.log.append(name, log_line)
+            if self.log_index is not None:
+                self.log_index.add(run.serial, run.script, run.started_at, name, log_line)
+            if self.echo_output:
+                print(f"[{run.serial}|SCRIPT] {log_line}")
+            self._emit({"type": "output", "serial": run.serial, "stream": name, "line": log_line})
+            if name == STDOUT:
+                self._set_status(run, log_line.strip())
+
+    def _apply_progress(self, run, event):
+        self.tracer.script_event(run.serial, event)
+        text = run.progress.apply(event)
+        self._set_status(run, text or run.status_text)
+
+    async def _execute(self, run):
+        serial, tracer = run.serial, self.tracer
+        script_path = os.path.join(self.script_dir, run.script)
+        run.log = self.new_run_log(serial)
+        spill = run.log.spill
+        log_start = spill.mark() if spill is not None else None
+        run_started = now_us()
+        mark = time.perf_counter()
+        state = RUN_FAILED
+
+        try:
+            print(f"[{serial}] Executing: {run.script}")
+            # Attach to (or bring up) the uiautomator2 session first so
+            # the script does not have to start the on-device server itself.
+            with tracer.span(serial, "session"):
+                await self.session_broker.ensure(serial)
+            mark = run.phase("session_s", mark)
+            with tracer.span(serial, "config"):
+                params = self._script_params(run.script)
+            run.config_hash = hashlib.sha1(
+                json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+            env = self.session_broker.job_env(serial)
+            if tracer.enabled:
+                env[TRACE_ENV] = "1"
+            with tracer.span(serial, "launch"):
+                entry = self.script_registry.get(run.script)
+                run.process = await self.worker_pool.launch(
+                    script_path, serial, params, env=env,
+                    code_path=entry.code_path if entry else None,
+                )
+            mark = run.phase("launch_s", mark)
+            # Drain both pipes at once so a script that fills the stderr pipe
+            # cannot block while stdout is being read.
+            await asyncio.gather(
+                self._read_stream(run, run.process.stdout, STDOUT),
+                self._read_stream(run, run.process.stderr, STDERR),
+            )
+            run.returncode = await run.process.wait()
+            run.phase("script_s", mark)
+            if run.stop_requested:
+                state, run.status_text = RUN_STOPPED, "Stopped"
+            elif run.progress.result_code not in (None, "ok"):
+                # The script finished normally but reported a failed result.
+                run.status_text = f"Error: {run.progress.result_message or run.progress.result_code}"
+            elif run.returncode != 0:
+                error_line = run.log.last_error() or f"exit code {run.returncode}"
+                print(f"[{serial}] Script finished with error: {error_line}")
+                run.status_text = f"Error: {error_line}"
+            else:
+                state, run.status_text = RUN_FINISHED, "Finished"
+        except asyncio.CancelledError:
+            print(f"[{serial}] Task was cancelled.")
+            state = RUN_STOPPED
+            run.status_text = "Stopped" if run.stop_requested else "Cancelled"
+        except Exception as e:
+            print(f"Error running script on {serial}: {e}")
+            run.status_text = "Error"
+        finally:
+            if tracer.enabled:
+                tracer.end_run(serial)
+                tracer.complete(serial, "run", run_started, now_us() - run_started, "run",
+                                args={"script": run.script, "status": run.status_text})
+            run.log.close()
+            if spill is not None:
+                # A run whose output rotated the spill starts in an older segment than it ends in.
+                run.log_ref = spill.span(log_start)
+            run.process = None
+            run.state = state
+            run.finished_at = time.time()
+            if self.history is not None:
+                self.history.record(self._history_row(run))
+            self._emit_run(run)
+
+    async def stop(self, serials):
+        """
+        Stops the runs on `serials` together: queued runs leave the queue and
+        all running ones are stopped at once by the RunStopper. Returns the
+        StopResults of the runs that were running.
+        """
+        running = []
+        for serial in serials:
+            run = self.runs.get(serial)
+            if run is None or self._cancel_queued(serial):
+                continue
+            if run.state == RUN_RUNNING:
+                run.stop_requested = True
+                if run.process is None:
+                    # Still preparing (session, launch); nothing to signal yet.
+                    run.task.cancel()
+                running.append(run)
+        if not running:
+            return []
+
+        print(f"Stopping {len(running)} run(s)...")
+        tasks = [run.task for run in running]
+        results = await self.stopper.stop({run.serial: run.process for run in running})
+        # The run tasks finish on their own once their process is gone.
+        _, pending = await asyncio.wait(tasks, timeout=self.stopper.kill_after)
+        for task in pending:
+            task.cancel()
+        for run, result in zip(running, results):
+            run.stop_result = result
+            self._emit({"type": "stopped", "serial": run.serial, "latency_s": round(result.total_s, 3),
+                        "killed": result.forced, "summary": result.summary()})
+        return results
+
+    def _on_queue_changed(self):
+        depth, running = self.scheduler.queue_depth, self.scheduler.running
+        wait = self.scheduler.estimated_wait() if depth else None
+        self._emit({"type": "queue", "running": running, "queued": depth,
+                    "eta_s": round(wait, 1) if wait is not None else None})
+        if self.tracer.enabled and depth == 0 and running == 0:
+            # The batch is done; one trace file per batch.
+            self.tracer.export_batch()
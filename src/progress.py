@@ -0,0 +1,76 @@
+# src/progress.py
+import json
+
+# Must match EVENT_PREFIX in assets/scripts/utils/progress.py
+EVENT_PREFIX = b"\x1e"
+
+_loads = json.JSONDecoder().decode
+
+def parse_event(line: bytes):
+    """Returns the event dict of a progress line, or None for plain output."""
+    if not line.startswith(EVENT_PREFIX):
+        return None
+    try:
+        event = _loads(line[1:].decode())
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) else None
+
+class RunProgress:
+    """Progress of one run, built from the events the script emits."""
+    __slots__ = ("phase", "step", "total", "label", "phase_times", "result_code",
+                 "result_message", "events", "_phase_started")
+
+    def __init__(self):
+        self.phase = None
+        self.step = None
+        self.total = None
+        self.label = None
+        self.phase_times = {}  # phase name -> seconds spent in it
+        self.result_code = None
+        self.result_message = None
+        self.events = 0
+        self._phase_started = None
+
+    @property
+    def fraction(self):
+        """Completed share of the current loop (0..1), or None if the script did not report a total."""
+        if self.step is None or not self.total:
+            return None
+        return min(1.0, self.step / self.total)
+
+    def _close_phase(self, timestamp):
+        if self.phase is not None and self._phase_started is not None and timestamp is not None:
+            self.phase_times[self.phase] = (
+                self.phase_times.get(self.phase, 0.0) + timestamp - self._phase_started
+            )
+
+    def apply(self, event):
+        """Updates the progress with one event. Returns the text to show on the row, if any."""
+        self.events += 1
+        kind = event.get("e")
+        timestamp = event.get("t")
+        if kind == "step":
+            self.step = event.get("n")
+            self.total = event.get("of", self.total)
+            self.label = event.get("label", self.label)
+            if self.total:
+                return f"{self.label or 'Step'} {self.step}/{self.total}"
+            return f"{self.label or 'Step'} {self.step}"
+        if kind == "phase":
+            self._close_phase(timestamp)
+            self.phase = event.get("name")
+            self._phase_started = timestamp
+            self.step = self.total = self.label = None
+            return self.phase
+        if kind == "result":
+            self._close_phase(timestamp)
+            self._phase_started = None
+            self.result_code = event.get("code")
+            self.result_message = event.get("message")
+            return self.result_message or self.result_code
+        return None
+
+    @property
+    def succeeded(self):
+        return self.result_code == "ok"
@@ -0,0 +1,141 @@
+# src/run_history.py
+from src.batched_sqlite import BatchedSqlite, DEFAULT_FLUSH_INTERVAL_S, DEFAULT_FLUSH_BATCH
+
+HISTORY_NAME = "history.db"
+
+# Column order of `record()` rows and of the runs table.
+RUN_COLUMNS = (
+    "serial", "script", "config_hash", "state", "returncode", "result_code", "status",
+    "queued_at", "started_at", "finished_at", "duration_s",
+    "queue_s", "session_s", "launch_s", "first_output_s", "script_s",
+    "log_path", "log_start", "log_end_path", "log_end", "lines",
+)
+_FAILED_STATES = ("failed",)  # RUN_FAILED of src.orchestrator
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    serial TEXT NOT NULL,
+    script TEXT NOT NULL,
+    config_hash TEXT,
+    state TEXT NOT NULL,
+    returncode INTEGER,
+    result_code TEXT,
+    status TEXT,
+    queued_at REAL,
+    started_at REAL,
+    finished_at REAL NOT NULL,
+    duration_s REAL,
+    queue_s REAL,
+    session_s REAL,
+    launch_s REAL,
+    first_output_s REAL,
+    script_s REAL,
+    log_path TEXT,
+    log_start INTEGER,
+    log_end_path TEXT,
+    log_end INTEGER,
+    lines INTEGER
+);
+-- Last N runs per device.
+CREATE INDEX IF NOT EXISTS runs_serial_finished ON runs (serial, finished_at);
+-- Failure rate per script over a time window, answered from the index alone.
+CREATE INDEX IF NOT EXISTS runs_script_finished ON runs (script, finished_at, state);
+-- Slowest devices over a time window, answered from the index alone.
+CREATE INDEX IF NOT EXISTS runs_finished_serial ON runs (finished_at, serial, duration_s);
+
+-- Running totals kept in the same transaction as the runs, so the all-time
+-- questions cost one row per script or device instead of a scan.
+CREATE TABLE IF NOT EXISTS script_stats (
+    script TEXT PRIMARY KEY,
+    runs INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    total_s REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS device_stats (
+    serial TEXT PRIMARY KEY,
+    runs INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    total_s REAL NOT NULL,
+    max_s REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+_INSERT_RUN = f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})"
+_UPSERT_SCRIPT = """
+INSERT INTO script_stats (script, runs, failures, total_s) VALUES (?, ?, ?, ?)
+ON CONFLICT (script) DO UPDATE SET
+    runs = runs + excluded.runs, failures = failures + excluded.failures, total_s = total_s + excluded.total_s
+"""
+_UPSERT_DEVICE = """
+INSERT INTO device_stats (serial, runs, failures, total_s, max_s) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (serial) DO UPDATE SET
+    runs = runs + excluded.runs, failures = failures + excluded.failures,
+    total_s = total_s + excluded.total_s, max_s = max(max_s, excluded.max_s)
+"""
+
+class RunHistory(BatchedSqlite):
+    """
+    Every ended run, kept in a SQLite database in WAL mode. `record()` only
+    queues the row on the event loop; batches are written in a worker thread
+    (see BatchedSqlite). The queries are answered from indexes or the running
+    totals, so they stay fast at millions of rows. They are synchronous; call
+    them through `asyncio.to_thread` from the event loop.
+    """
+    def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL_S, flush_batch=DEFAULT_FLUSH_BATCH):
+        super().__init__(path, _SCHEMA, flush_interval, flush_batch)
+
+    def record(self, row):
+        """Queues one run, a dict with the RUN_COLUMNS keys (missing ones are NULL)."""
+        self._queue(tuple(row.get(column) for column in RUN_COLUMNS))
+
+    def _write_batch(self, conn, rows):
+        scripts, devices = {}, {}
+        serial_at, script_at, state_at, duration_at = (
+            RUN_COLUMNS.index(name) for name in ("serial", "script", "state", "duration_s"))
+        for row in rows:
+            failed = row[state_at] in _FAILED_STATES
+            duration = row[duration_at] or 0.0
+            runs, failures, total = scripts.get(row[script_at], (0, 0, 0.0))
+            scripts[row[script_at]] = (runs + 1, failures + failed, total + duration)
+            runs, failures, total, longest = devices.get(row[serial_at], (0, 0, 0.0, 0.0))
+            devices[row[serial_at]] = (runs + 1, failures + failed, total + duration, max(longest, duration))
+        conn.executemany(_INSERT_RUN, rows)
+        conn.executemany(_UPSERT_SCRIPT, [(script, *stats) for script, stats in scripts.items()])
+        conn.executemany(_UPSERT_DEVICE, [(serial, *stats) for serial, stats in devices.items()])
+
+    # --- Queries ---------------------------------------------------------
+    def last_runs(self, serial, limit=20):
+        """The newest `limit` runs of one device, newest first."""
+        return self._query(
+            "SELECT * FROM runs WHERE serial = ? ORDER BY finished_at DESC LIMIT ?", (serial, limit))
+
+    def failure_rates(self, since=None):
+        """Runs, failures and failure rate per script, all time or for runs ended after `since` (epoch s)."""
+        if since is None:
+            rows = self._query("SELECT script, runs, failures FROM script_stats")
+        else:
+            placeholders = ", ".join("?" * len(_FAILED_STATES))
+            rows = self._query(
+                f"SELECT script, COUNT(*) AS runs, SUM(state IN ({placeholders})) AS failures "
+                "FROM runs INDEXED BY runs_script_finished "
+                "WHERE script IN (SELECT script FROM script_stats) AND finished_at >= ? GROUP BY script",
+                (*_FAILED_STATES, since),
+            )
+        for row in rows:
+            row["failure_rate"] = row["failures"] / row["runs"] if row["runs"] else 0.0
+        return sorted(rows, key=lambda row: row["failure_rate"], reverse=True)
+
+    def slowest_devices(self, limit=10, since=None):
+        """Devices by average run duration, slowest first; all time or for runs ended after `since`."""
+        if since is None:
+            return self._query(
+                "SELECT serial, runs, failures, total_s / runs AS avg_s, max_s FROM device_stats "
+                "ORDER BY avg_s DESC LIMIT ?", (limit,))
+        return self._query(
+            "SELECT serial, COUNT(*) AS runs, AVG(duration_s) AS avg_s, MAX(duration_s) AS max_s "
+            "FROM runs INDEXED BY runs_finished_serial WHERE finished_at >= ? "
+            "GROUP BY serial ORDER BY avg_s DESC LIMIT ?", (since, limit))
+
+    def count(self):
+        return self._query("SELECT COALESCE(SUM(runs), 0) AS n FROM script_stats")[0]["n"]
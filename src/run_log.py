@@ -0,0 +1,121 @@
+# src/run_log.py
+import collections
+import os
+import re
+import time
+
+DEFAULT_MAX_LINES = 500
+DEFAULT_SEGMENT_BYTES = 1024 * 1024
+DEFAULT_KEEP_SEGMENTS = 5
+
+STDOUT = "out"
+STDERR = "err"
+
+def safe_filename(serial):
+    """Device serials like "192.168.1.5:5555" are not valid file names everywhere."""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', serial)
+
+class SegmentSpill:
+    """
+    Appends log lines to size-limited segment files `<name>.log`,
+    `<name>.1.log`, ... and keeps only the newest `keep` segments, the same
+    way a rotating log handler does.
+    """
+    def __init__(self, directory, name, segment_bytes=DEFAULT_SEGMENT_BYTES, keep=DEFAULT_KEEP_SEGMENTS):
+        self.directory = directory
+        self.name = name
+        self.segment_bytes = segment_bytes
+        self.keep = keep
+        self._file = None
+        self._size = 0
+        self.rotations = 0  # by this instance
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.name}.log")
+
+    @property
+    def offset(self):
+        """Size of the current segment, i.e. where the next line goes."""
+        if self._file is not None:
+            return self._file.tell()
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def mark(self):
+        """Where the next line goes, as (rotations so far, offset); see span()."""
+        return self.rotations, self.offset
+
+    def span(self, mark):
+        """
+        (first_path, start, last_path, end): the segments and offsets that
+        hold what was written since `mark`, under the names they have now.
+        If the first of them was already deleted, it starts at the oldest kept.
+        """
+        rotations, start = mark
+        first = self.rotations - rotations
+        if first >= self.keep:
+            first, start = self.keep - 1, 0
+        return self._segment_path(first), start, self.path, self.offset
+
+    def _segment_path(self, index):
+        return self.path if index == 0 else os.path.join(self.directory, f"{self.name}.{index}.log")
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.keep - 1, 0, -1):
+            src = self._segment_path(index - 1)
+            if os.path.exists(src):
+                os.replace(src, self._segment_path(index))
+        self.rotations += 1
+        self._open()
+
+    def write(self, text):
+        if self._file is None:
+            self._open()
+        elif self._size >= self.segment_bytes:
+            self._rotate()
+        self._file.write(text)
+        # Bytes, not characters: script output is often not ASCII.
+        self._size += len(text.encode("utf-8"))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class LogBuffer:
+    """
+    Keeps the last `max_lines` output lines of a device run in memory, tagged
+    with the stream they came from, and optionally writes every line to a
+    SegmentSpill. Memory stays bounded no matter how long the run is.
+    """
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, spill: SegmentSpill = None):
+        self.lines = collections.deque(maxlen=max_lines)
+        self.spill = spill
+        self.total_lines = 0
+        self._last_error = None
+
+    def append(self, stream, line):
+        self.lines.append((stream, line))
+        self.total_lines += 1
+        if stream == STDERR and line.strip():
+            self._last_error = line
+        if self.spill is not None:
+            self.spill.write(f"{time.strftime('%H:%M:%S')} [{stream}] {line}\n")
+
+    def last_error(self):
+        """Last non-empty stderr line, e.g. the exception line of a traceback."""
+        return self._last_error
+
+    def tail(self, count=50, stream=None):
+        lines = [line for s, line in self.lines if stream is None or s == stream]
+        return lines[-count:]
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
@@ -0,0 +1,122 @@
+# src/run_stopper.py
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+DEFAULT_KILL_AFTER_S = 5
+DEFAULT_CLEANUP_CONCURRENCY = 16
+DEFAULT_CLEANUP_TIMEOUT_S = 10
+
+# Run on the device after its script stopped, as the app always did.
+CLEANUP_COMMAND = "pkill atx-agent"
+
+IS_WINDOWS = sys.platform == "win32"
+
+def process_group_kwargs():
+    """`create_subprocess_exec` arguments that start the child as the leader of its own process group."""
+    if IS_WINDOWS:
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+async def signal_group(proc, force=False):
+    """
+    Sends the stop signal (SIGTERM, or CTRL_BREAK on Windows) to `proc`'s whole
+    process group, or kills the group if `force`. A group that is already gone is ignored.
+    """
+    try:
+        if IS_WINDOWS:
+            if force:
+                # taskkill /T also takes down every process the worker started.
+                killer = await asyncio.create_subprocess_exec(
+                    "taskkill", "/F", "/T", "/PID", str(proc.pid),
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+                )
+                await killer.wait()
+            else:
+                proc.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL if force else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except OSError as e:
+        print(f"[RunStopper] Could not signal process {proc.pid}: {e}")
+
+class StopResult:
+    """How stopping one device's run went. Times are seconds since the stop was requested."""
+    __slots__ = ("serial", "exited_s", "cleaned_s", "forced", "cleanup_error")
+
+    def __init__(self, serial):
+        self.serial = serial
+        self.exited_s = None  # the script's process group was gone
+        self.cleaned_s = None  # the device-side cleanup was done
+        self.forced = False  # the group had to be killed after the deadline
+        self.cleanup_error = None
+
+    @property
+    def total_s(self):
+        return max(self.exited_s or 0.0, self.cleaned_s or 0.0)
+
+    def summary(self):
+        text = f"{self.total_s:.1f}s"
+        if self.forced:
+            text += ", killed"
+        if self.cleanup_error:
+            text += ", cleanup failed"
+        return text
+
+class RunStopper:
+    """
+    Stops many script runs at once. Every run's process group gets the stop
+    signal in the same pass; groups still alive after `kill_after` seconds are
+    killed. Meanwhile the device-side cleanup of each device runs as soon as
+    its script is gone, at most `cleanup_concurrency` devices at a time.
+    """
+    def __init__(self, adb, kill_after=DEFAULT_KILL_AFTER_S,
+                 cleanup_concurrency=DEFAULT_CLEANUP_CONCURRENCY, cleanup_timeout=DEFAULT_CLEANUP_TIMEOUT_S):
+        self.adb = adb
+        self.kill_after = kill_after
+        self.cleanup_timeout = cleanup_timeout
+        self._cleanup_slots = asyncio.Semaphore(cleanup_concurrency)
+
+    async def stop(self, processes):
+        """
+        Stops the runs in `processes` (serial -> process, or None if the run
+        has no process yet) and returns a StopResult per serial.
+        """
+        started = time.perf_counter()
+        results = {serial: StopResult(serial) for serial in processes}
+        live = {serial: proc for serial, proc in processes.items() if proc is not None}
+        await asyncio.gather(*(signal_group(proc) for proc in live.values()))
+        await asyncio.gather(*(
+            self._stop_one(results[serial], proc, started) for serial, proc in processes.items()
+        ))
+        stopped = list(results.values())
+        if stopped:
+            slowest = max(result.total_s for result in stopped)
+            forced = sum(1 for result in stopped if result.forced)
+            print(f"[RunStopper] Stopped {len(stopped)} run(s) in {time.perf_counter() - started:.2f}s "
+                  f"(slowest device {slowest:.2f}s, {forced} killed)")
+        return stopped
+
+    async def _stop_one(self, result, proc, started):
+        if proc is not None:
+            try:
+                await asyncio.wait_for(proc.wait(), self.kill_after)
+            except asyncio.TimeoutError:
+                result.forced = True
+                await signal_group(proc, force=True)
+                await proc.wait()
+            if not IS_WINDOWS:
+                # Whatever the script started and left behind in its group.
+                await signal_group(proc, force=True)
+            result.exited_s = time.perf_counter() - started
+        async with self._cleanup_slots:
+            try:
+                await asyncio.wait_for(self.adb.shell(result.serial, CLEANUP_COMMAND), self.cleanup_timeout)
+            except Exception as e:
+                result.cleanup_error = str(e) or type(e).__name__
+        result.cleaned_s = time.perf_counter() - started
+        print(f"[{result.serial}] Stopped in {result.summary()}")
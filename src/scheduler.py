@@ -0,0 +1,188 @@
+# src/scheduler.py
+import asyncio
+import collections
+import heapq
+import itertools
+import time
+
+DEFAULT_MAX_CONCURRENT = 20
+DEFAULT_MAX_PER_TRANSPORT = 5
+DEFAULT_LAUNCH_STAGGER_S = 0.2
+
+PRIORITY_BATCH = 0
+PRIORITY_MANUAL = 10
+
+def transport_key(serial, details=None):
+    """
+    Groups devices that share an ADB transport: the USB hub they hang off
+    (from `adb devices -l`) or the host of a network device. When the hub is
+    unknown (adb on Windows prints no `usb:` paths) or the device is an
+    emulator, the device is its own transport, so the per-transport limit
+    does not turn into a limit on the whole fleet.
+    """
+    usb_path = (details or {}).get("usb")
+    if usb_path:
+        # "1-1.4" -> hub "1-1"
+        return "usb:" + usb_path.rsplit(".", 1)[0]
+    if ":" in serial:
+        return "tcp:" + serial.rsplit(":", 1)[0]
+    if serial.startswith("emulator-"):
+        return serial
+    return "usb:" + serial
+
+class RunJob:
+    """A queued request to run something on one device."""
+    __slots__ = ("serial", "transport", "priority", "seq", "start", "queued_at", "cancelled")
+
+    def __init__(self, serial, transport, priority, seq, start):
+        self.serial = serial
+        self.transport = transport
+        self.priority = priority
+        self.seq = seq
+        self.start = start  # async callable returning the task that performs the run
+        self.queued_at = time.monotonic()
+        self.cancelled = False
+
+    def __lt__(self, other):
+        # Higher priority first, then first in, first out.
+        return (-self.priority, self.seq) < (-other.priority, other.seq)
+
+class RunScheduler:
+    """
+    Starts queued runs under a global concurrency limit and a per-transport
+    limit, spacing consecutive launches by a fixed stagger. Jobs that cannot
+    start because their transport is full wait without blocking others.
+    """
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 max_per_transport=DEFAULT_MAX_PER_TRANSPORT,
+                 stagger_s=DEFAULT_LAUNCH_STAGGER_S, on_change=None):
+        self.max_concurrent = max_concurrent
+        self.max_per_transport = max_per_transport
+        self.stagger_s = stagger_s
+        self.on_change = on_change  # optional callable(), called when depth or running count changes
+
+        self._heap = []
+        self._queued = {}  # serial -> RunJob
+        self._running = 0
+        self._per_transport = collections.Counter()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+        self._tasks = set()
+        self._last_launch = 0.0
+        self._avg_duration = None
+
+    @property
+    def queue_depth(self):
+        return len(self._queued)
+
+    @property
+    def running(self):
+        return self._running
+
+    def is_queued(self, serial):
+        return serial in self._queued
+
+    def estimated_wait(self):
+        """Rough seconds until the last queued job starts, from the average run length so far."""
+        if not self._queued:
+            return 0.0
+        if self._avg_duration is None:
+            return None
+        waves = self.queue_depth / max(1, self.max_concurrent)
+        return waves * self._avg_duration + self.queue_depth * self.stagger_s
+
+    def submit(self, serial, start, transport=None, priority=PRIORITY_BATCH):
+        """Queues a run for `serial`. `start()` is awaited when a slot is free and must return a task."""
+        if serial in self._queued:
+            return self._queued[serial]
+        job = RunJob(serial, transport or transport_key(serial), priority, next(self._seq), start)
+        self._queued[serial] = job
+        heapq.heappush(self._heap, job)
+        self._ensure_dispatcher()
+        self._wakeup.set()
+        self._changed()
+        return job
+
+    def cancel(self, serial):
+        """Removes a job that has not started yet. Returns True if one was queued."""
+        job = self._queued.pop(serial, None)
+        if job is None:
+            return False
+        # Lazily dropped from the heap when the dispatcher reaches it.
+        job.cancelled = True
+        self._changed()
+        return True
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def _next_startable(self):
+        """Pops the best job whose transport has room, keeping the others queued in order."""
+        skipped = []
+        job = None
+        while self._heap:
+            candidate = heapq.heappop(self._heap)
+            if candidate.cancelled:
+                continue
+            if self._per_transport[candidate.transport] < self.max_per_transport:
+                job = candidate
+                break
+            skipped.append(candidate)
+        for candidate in skipped:
+            heapq.heappush(self._heap, candidate)
+        return job
+
+    async def _dispatch(self):
+        while self._queued:
+            if self._running >= self.max_concurrent:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            job = self._next_startable()
+            if job is None:
+                # Every queued job waits on a full transport.
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._last_launch + self.stagger_s - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if job.cancelled:
+                continue
+            del self._queued[job.serial]
+            self._last_launch = time.monotonic()
+            self._running += 1
+            self._per_transport[job.transport] += 1
+            task = asyncio.create_task(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            self._changed()
+
+    async def _run(self, job):
+        started = time.monotonic()
+        try:
+            run_task = await job.start()
+            if run_task is not None:
+                # asyncio.wait does not raise if the run itself gets cancelled.
+                await asyncio.wait([run_task])
+        except Exception as e:
+            print(f"[Scheduler] Failed to start run on {job.serial}: {e}")
+        finally:
+            self._record_duration(time.monotonic() - started)
+            self._running -= 1
+            self._per_transport[job.transport] -= 1
+            self._wakeup.set()
+            self._changed()
+
+    def _record_duration(self, duration):
+        if self._avg_duration is None:
+            self._avg_duration = duration
+        else:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
@@ -0,0 +1,333 @@
+# src/screen_capture.py
+import asyncio
+import base64
+import concurrent.futures
+import functools
+import hashlib
+import io
+import time
+
+from src.adb_client import AdbError
+
+SCREENCAP_COMMAND = "screencap -p"
+
+THUMB_WIDTH = 180
+THUMB_QUALITY = 60
+
+# Screenshot bytes per second the whole fleet may pull over ADB, and the
+# share of one core decoding and scaling them may take.
+DEFAULT_BUDGET_BPS = 4_000_000
+DEFAULT_CPU_BUDGET = 0.25
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_DECODE_WORKERS = 1
+CAPTURE_TIMEOUT_S = 10
+TICK_S = 0.1
+
+# Refresh period by priority: shown in the grid and running (or needing
+# attention), shown, running or needing attention off screen, the rest.
+PRIORITY_FOCUS, PRIORITY_VISIBLE, PRIORITY_ACTIVE, PRIORITY_IDLE = range(4)
+PERIODS_S = (2.0, 6.0, 20.0, 60.0)
+# Every unchanged frame in a row doubles the period, up to this factor.
+MAX_BACKOFF = 4
+# Assumed size of a device's screenshot until it sent one.
+FIRST_FRAME_BYTES = 400_000
+
+@functools.lru_cache(maxsize=1)
+def _pillow():
+    # Imported on first use, in the decode thread; Pillow is optional.
+    try:
+        from PIL import Image
+    except ImportError:
+        print("[ScreenCapturer] Pillow is not installed, thumbnails are sent as full size PNGs")
+        return None
+    return Image
+
+def make_thumbnail(png, width=THUMB_WIDTH, quality=THUMB_QUALITY):
+    """
+    Decodes a screenshot and scales it to `width` pixels wide. Returns the
+    thumbnail as base64 (JPEG, or the PNG itself without Pillow) and the CPU
+    seconds it took. Blocking; runs on a worker thread.
+    """
+    started = time.thread_time()
+    Image = _pillow()
+    if Image is None:
+        data = png
+    else:
+        with Image.open(io.BytesIO(png)) as image:
+            image = image.convert("RGB")
+            image.thumbnail((width, width * 4), Image.Resampling.BILINEAR, reducing_gap=2.0)
+            out = io.BytesIO()
+            image.save(out, "JPEG", quality=quality)
+            data = out.getvalue()
+    return base64.b64encode(data).decode("ascii"), time.thread_time() - started
+
+class _Budget:
+    """
+    Token bucket: `rate` units per second, holding at most `burst`. Charges
+    are settled after the fact, so it can go below zero; nothing new starts
+    until it has refilled.
+    """
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def allows(self, amount):
+        # Something bigger than the whole bucket goes once the bucket is full.
+        return self.tokens >= min(amount, self.burst)
+
+class ScreenState:
+    """What the capturer knows about one device's screen."""
+    __slots__ = ("serial", "transport", "visible", "active", "due_at", "captured_at", "in_flight",
+                 "unchanged", "digest", "image", "frame_bytes", "failures")
+
+    def __init__(self, serial, transport):
+        self.serial = serial
+        self.transport = transport
+        self.visible = False
+        self.active = False  # running a script or needing attention
+        self.due_at = 0.0
+        self.captured_at = None
+        self.in_flight = False
+        self.unchanged = 0  # frames in a row identical to the last one
+        self.digest = None
+        self.image = None  # base64 thumbnail
+        self.frame_bytes = FIRST_FRAME_BYTES
+        self.failures = 0
+
+    @property
+    def priority(self):
+        if self.visible:
+            return PRIORITY_FOCUS if self.active else PRIORITY_VISIBLE
+        return PRIORITY_ACTIVE if self.active else PRIORITY_IDLE
+
+    @property
+    def period(self):
+        return PERIODS_S[self.priority] * min(MAX_BACKOFF, 2 ** self.unchanged)
+
+class ScreenCapturer:
+    """
+    Keeps low resolution screenshots of many devices fresh within a global
+    budget: screenshot bytes per second over ADB (`budget_bps`) and decode
+    CPU (`cpu_budget`, a share of one core). Devices shown in the grid and
+    devices that run a script or need attention are refreshed more often
+    (PERIODS_S); over budget all periods stretch alike. Only one
+    screenshot per transport (USB hub or network host, see
+    scheduler.transport_key; a device whose hub is unknown is its own
+    transport) is pulled at a time, so script jobs on a hub keep most of
+    its bandwidth. A frame whose bytes hash like the last one
+    is dropped before decoding and stretches that device's period;
+    decoding and scaling run on a worker thread. `on_frame(serial, image)`
+    gets each new thumbnail as base64.
+    """
+    def __init__(self, adb, on_frame, budget_bps=DEFAULT_BUDGET_BPS, cpu_budget=DEFAULT_CPU_BUDGET,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, decode_workers=DEFAULT_DECODE_WORKERS,
+                 width=THUMB_WIDTH):
+        self.adb = adb
+        self.on_frame = on_frame
+        self.width = width
+        self.max_in_flight = max_in_flight
+        self.screens = {}  # serial -> ScreenState
+        self._bytes = _Budget(budget_bps, budget_bps) if budget_bps else None
+        self._cpu = _Budget(cpu_budget, max(cpu_budget, 0.5)) if cpu_budget else None
+        self._busy_transports = set()
+        self._in_flight = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=decode_workers, thread_name_prefix="screen-decode"
+        )
+        self._task = None
+        self._captures = set()
+
+        # Counters for tuning the budget.
+        self.captures = 0
+        self.bytes_read = 0
+        self.unchanged = 0
+        self.decoded = 0
+        self.decode_cpu_s = 0.0
+        self.failed = 0
+        self.throttled = 0  # ticks on which the budget held back a due capture
+
+    # --- what to watch ---
+
+    def track(self, serial, transport):
+        if serial not in self.screens:
+            state = self.screens[serial] = ScreenState(serial, transport)
+            state.due_at = time.monotonic()
+
+    def untrack(self, serial):
+        self.screens.pop(serial, None)
+
+    def image(self, serial):
+        """The latest thumbnail of `serial` as base64, or None."""
+        state = self.screens.get(serial)
+        return state.image if state else None
+
+    def set_visible(self, serials):
+        """Marks the devices whose tiles are on screen; the rest are not."""
+        serials = set(serials)
+        for state in self.screens.values():
+            visible = state.serial in serials
+            if visible != state.visible:
+                state.visible = visible
+                self._reschedule(state)
+
+    def set_active(self, serial, active):
+        state = self.screens.get(serial)
+        if state is not None and state.active != active:
+            state.active = active
+            state.unchanged = 0  # a script starting or failing is worth a fresh look
+            self._reschedule(state)
+
+    def _reschedule(self, state):
+        if state.captured_at is not None:
+            state.due_at = min(state.due_at, state.captured_at + state.period)
+
+    # --- capture loop ---
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._captures):
+            task.cancel()
+        await asyncio.gather(*self._captures, return_exceptions=True)
+        # Cancelled captures did not finish; they are due again on start().
+        for state in self.screens.values():
+            state.in_flight = False
+        self._in_flight = 0
+        self._busy_transports.clear()
+
+    async def close(self):
+        await self.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self):
+        while True:
+            self._launch_due(time.monotonic())
+            await asyncio.sleep(TICK_S)
+
+    def _launch_due(self, now):
+        for budget in (self._bytes, self._cpu):
+            if budget is not None:
+                budget.refill(now)
+        due = [s for s in self.screens.values() if not s.in_flight and s.due_at <= now]
+        # Latest relative to its own period first: over budget every period
+        # stretches alike, rather than the idle devices never getting a frame.
+        due.sort(key=lambda s: ((s.due_at - now) / s.period, s.priority))
+        for state in due:
+            if self._in_flight >= self.max_in_flight:
+                return
+            if state.transport in self._busy_transports:
+                continue
+            if (self._bytes is not None and not self._bytes.allows(state.frame_bytes)) or \
+                    (self._cpu is not None and self._cpu.tokens < 0):
+                self.throttled += 1
+                return
+            if self._bytes is not None:
+                self._bytes.tokens -= state.frame_bytes
+            state.in_flight = True
+            self._in_flight += 1
+            self._busy_transports.add(state.transport)
+            task = asyncio.create_task(self._capture(state))
+            self._captures.add(task)
+            task.add_done_callback(self._captures.discard)
+
+    async def _capture(self, state):
+        """Takes one screenshot of `state`; however it ends, the slot and transport are given back."""
+        delay, cancelled = None, False
+        try:
+            delay = await self._take(state)
+        except asyncio.CancelledError:
+            # stop() cancelled it and resets what was in flight itself.
+            cancelled = True
+            raise
+        except Exception as e:
+            self.failed += 1
+            print(f"[ScreenCapturer] {state.serial}: capture failed ({e!r})")
+            delay = PERIODS_S[-1]
+        finally:
+            if not cancelled:
+                self._finish(state, delay)
+
+    async def _take(self, state):
+        """Pulls, compares and decodes one screenshot. Returns the delay until the next one, None for the period."""
+        reserved = state.frame_bytes
+        try:
+            png = await asyncio.wait_for(self.adb.exec_out(state.serial, SCREENCAP_COMMAND), CAPTURE_TIMEOUT_S)
+            if not png.startswith(b"\x89PNG"):
+                raise AdbError(png[:80].decode(errors="replace").strip() or "empty screenshot")
+        except (AdbError, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            # IncompleteReadError: the ADB server dropped the connection mid-reply.
+            self.failed += 1
+            state.failures += 1
+            if state.failures == 1:
+                print(f"[ScreenCapturer] {state.serial}: screenshot failed ({e})")
+            if self._bytes is not None:
+                self._bytes.tokens += reserved
+            return min(PERIODS_S[-1], state.period * 2 ** state.failures)
+        state.failures = 0
+        self.captures += 1
+        self.bytes_read += len(png)
+        state.frame_bytes = len(png)
+        if self._bytes is not None:
+            self._bytes.tokens -= len(png) - reserved
+
+        digest = hashlib.blake2b(png, digest_size=16).digest()
+        if digest == state.digest:
+            self.unchanged += 1
+            state.unchanged += 1
+            return None
+        state.digest = digest
+        state.unchanged = 0
+        try:
+            image, cpu_s = await asyncio.get_running_loop().run_in_executor(
+                self._executor, make_thumbnail, png, self.width)
+        except Exception as e:
+            print(f"[ScreenCapturer] {state.serial}: could not decode screenshot ({e})")
+            return None
+        self.decoded += 1
+        self.decode_cpu_s += cpu_s
+        if self._cpu is not None:
+            self._cpu.tokens -= cpu_s
+        if image == state.image:
+            # Pixels changed below what the thumbnail shows (e.g. the clock).
+            state.unchanged += 1
+        elif self.screens.get(state.serial) is state:
+            state.image = image
+            self.on_frame(state.serial, image)
+        return None
+
+    def _finish(self, state, delay=None):
+        now = time.monotonic()
+        state.in_flight = False
+        state.captured_at = now
+        state.due_at = now + (state.period if delay is None else delay)
+        self._in_flight -= 1
+        self._busy_transports.discard(state.transport)
+
+    def stats(self):
+        return {
+            "devices": len(self.screens),
+            "captures": self.captures,
+            "bytes_read": self.bytes_read,
+            "unchanged": self.unchanged,
+            "decoded": self.decoded,
+            "decode_cpu_s": round(self.decode_cpu_s, 3),
+            "failed": self.failed,
+            "throttled": self.throttled,
+        }
@@ -0,0 +1,289 @@
+# src/script_registry.py
+import ast
+import contextlib
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import sys
+import tempfile
+
+MANIFEST_NAME = "manifest.json"
+CONFIG_NAME = "config.yaml"
+
+class ScriptEntry:
+    """One script file and what the registry knows about it."""
+    __slots__ = ("filename", "path", "digest", "mtime_ns", "size", "has_main", "error",
+                 "code_path", "display_name")
+
+    def __init__(self, filename, path):
+        self.filename = filename
+        self.path = path
+        self.digest = None
+        self.mtime_ns = None
+        self.size = None
+        self.has_main = False
+        self.error = None
+        self.code_path = None
+        self.display_name = filename
+
+    @property
+    def runnable(self):
+        return self.error is None and self.has_main
+
+    def to_manifest(self):
+        return {"digest": self.digest, "mtime_ns": self.mtime_ns, "size": self.size,
+                "path": self.path, "has_main": self.has_main, "error": self.error}
+
+def load_code(code_path):
+    """Reads a code object written by the registry. Returns None if it is missing or from another Python."""
+    try:
+        with open(code_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    magic = importlib.util.MAGIC_NUMBER
+    if not data.startswith(magic):
+        return None
+    try:
+        return marshal.loads(data[len(magic):])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+class ScriptRegistry:
+    """
+    The scripts in `script_dir`, with their metadata and compiled code.
+
+    Each script is parsed and compiled once per content hash. The result (has
+    a `main`, syntax error) goes into a manifest and the code object into
+    `cache_dir`, so an unchanged script costs one `stat` at startup. Display
+    names come from the shared ConfigStore, which only re-parses config.yaml
+    when it changed. `start_watching()` keeps the registry current: created,
+    edited, renamed and deleted scripts are applied one by one and reported
+    to `on_change(added, removed, updated)`.
+    """
+    def __init__(self, script_dir, config_store, cache_dir, on_change=None):
+        self.script_dir = script_dir
+        self.config_store = config_store
+        # Code objects only load into the Python version that wrote them.
+        self.cache_dir = os.path.join(cache_dir, sys.implementation.cache_tag)
+        self.on_change = on_change
+        self.entries = {}  # filename -> ScriptEntry
+        self.compile_count = 0
+        self._manifest = {}
+        self._watcher = None
+
+    # --- Queries ---------------------------------------------------------
+    @property
+    def scripts(self):
+        """Filenames of the runnable scripts, sorted."""
+        return sorted(name for name, entry in self.entries.items() if entry.runnable)
+
+    def get(self, filename):
+        return self.entries.get(filename)
+
+    # --- Manifest --------------------------------------------------------
+    def _manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_NAME)
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                self._manifest = json.load(f)
+        except (OSError, ValueError):
+            self._manifest = {}
+
+    def _save_manifest(self):
+        self._manifest = {name: entry.to_manifest() for name, entry in self.entries.items()}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._manifest, f)
+            os.replace(tmp_path, self._manifest_path())
+        except OSError as e:
+            print(f"[ScriptRegistry] Could not write the script cache: {e}")
+
+    def _code_path(self, filename, digest):
+        return os.path.join(self.cache_dir, f"{os.path.splitext(filename)[0]}-{digest}.pyc")
+
+    # --- Loading ---------------------------------------------------------
+    @staticmethod
+    def _is_script(filename):
+        return filename.endswith(".py") and not filename.startswith((".", "_"))
+
+    def _load_config(self):
+        try:
+            return self.config_store.load()
+        except FileNotFoundError:
+            return {}  # a script directory without config.yaml
+
+    def _display_name(self, filename, config):
+        section = config.get(filename)
+        if isinstance(section, dict):
+            return section.get("DISPLAY_NAME", filename)
+        return filename
+
+    def _read_entry(self, filename):
+        """Builds the entry for `filename` from the manifest or, if the file changed, from its source."""
+        path = os.path.join(self.script_dir, filename)
+        st = os.stat(path)
+        entry = ScriptEntry(filename, path)
+        entry.mtime_ns, entry.size = st.st_mtime_ns, st.st_size
+
+        cached = self._manifest.get(filename)
+        if (cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size
+                and cached["path"] == path):
+            entry.digest, entry.has_main, entry.error = cached["digest"], cached["has_main"], cached["error"]
+            if entry.error is not None:
+                return entry
+            entry.code_path = self._code_path(filename, entry.digest)
+            if os.path.exists(entry.code_path):
+                return entry
+
+        with open(path, "rb") as f:
+            source = f.read()
+        entry.digest = hashlib.blake2b(source, digest_size=8).hexdigest()
+        entry.code_path = self._code_path(filename, entry.digest)
+        if cached and cached["digest"] == entry.digest and cached["path"] == path \
+                and os.path.exists(entry.code_path):
+            # Touched but not changed.
+            entry.has_main, entry.error = cached["has_main"], cached["error"]
+            return entry
+        self._compile(entry, source)
+        return entry
+
+    def _compile(self, entry, source):
+        self.compile_count += 1
+        try:
+            tree = ast.parse(source, entry.path)
+            code = compile(tree, entry.path, "exec")
+        except (SyntaxError, ValueError) as e:
+            entry.error = f"line {getattr(e, 'lineno', '?')}: {getattr(e, 'msg', e)}"
+            entry.code_path = None
+            return
+        entry.has_main = any(
+            isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "main"
+            for node in tree.body
+        )
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+            os.replace(tmp_path, entry.code_path)
+        except OSError as e:
+            print(f"[ScriptRegistry] Could not cache compiled {entry.filename}: {e}")
+            entry.code_path = None
+
+    def _drop_code(self, entry):
+        if entry.code_path:
+            with contextlib.suppress(OSError):
+                os.remove(entry.code_path)
+
+    def load(self):
+        """Reads every script in `script_dir`. Returns the runnable filenames."""
+        print(f"Looking for scripts in '{self.script_dir}'...")
+        self._load_manifest()
+        self.entries.clear()
+        if not os.path.isdir(self.script_dir):
+            print(f"Warning: Directory not found: '{self.script_dir}'")
+            return []
+        config = self._load_config()
+        for filename in sorted(os.listdir(self.script_dir)):
+            if not self._is_script(filename):
+                continue
+            try:
+                entry = self._read_entry(filename)
+            except OSError as e:
+                print(f"[ScriptRegistry] Could not read {filename}: {e}")
+                continue
+            entry.display_name = self._display_name(filename, config)
+            self.entries[filename] = entry
+            self._log_entry(entry)
+        self._save_manifest()
+        return self.scripts
+
+    def _log_entry(self, entry):
+        if entry.error:
+            print(f"Skipping script {entry.filename}: {entry.error}")
+        elif not entry.has_main:
+            print(f"Skipping script {entry.filename}: no main(device_id) function")
+        else:
+            print(f"Found script: {entry.filename} ({entry.display_name})")
+
+    # --- Changes ---------------------------------------------------------
+    def apply_changes(self, names):
+        """
+        Re-reads the given file names (created, edited or deleted) and returns
+        (added, removed, updated) runnable filenames. A change to config.yaml
+        refreshes the display names.
+        """
+        before = set(self.scripts)
+        updated = set()
+        touched = False
+        config = self._load_config()
+        for name in names:
+            if name == CONFIG_NAME:
+                for entry in self.entries.values():
+                    display_name = self._display_name(entry.filename, config)
+                    if display_name != entry.display_name:
+                        entry.display_name = display_name
+                        updated.add(entry.filename)
+                continue
+            if not self._is_script(name):
+                continue
+            old = self.entries.get(name)
+            try:
+                entry = self._read_entry(name)
+            except FileNotFoundError:
+                if old is not None:
+                    del self.entries[name]
+                    self._drop_code(old)
+                    touched = True
+                    print(f"Script removed: {name}")
+                continue
+            except OSError as e:
+                print(f"[ScriptRegistry] Could not read {name}: {e}")
+                continue
+            touched = True
+            if old is not None and old.digest == entry.digest:
+                # Saved without changes; only the file stats moved.
+                entry.display_name = old.display_name
+                self.entries[name] = entry
+                continue
+            if old is not None and old.code_path != entry.code_path:
+                self._drop_code(old)
+            entry.display_name = self._display_name(name, config)
+            self.entries[name] = entry
+            updated.add(name)
+            self._log_entry(entry)
+
+        after = set(self.scripts)
+        added, removed = sorted(after - before), sorted(before - after)
+        updated = sorted((updated & after) - set(added))
+        if touched:
+            self._save_manifest()
+        return added, removed, updated
+
+    def rescan(self):
+        """Re-checks every script, e.g. after the watcher lost events."""
+        return self.apply_changes(set(self.entries) | set(os.listdir(self.script_dir)))
+
+    def _on_files_changed(self, names):
+        added, removed, updated = self.rescan() if names is None else self.apply_changes(names)
+        if (added or removed or updated) and self.on_change:
+            self.on_change(added, removed, updated)
+
+    def start_watching(self):
+        """Follows changes in `script_dir` from the running event loop."""
+        # Workers import this module for load_code(); they never watch.
+        from src.dir_watcher import watch_directory
+        if self._watcher is None and os.path.isdir(self.script_dir):
+            self._watcher = watch_directory(self.script_dir, self._on_files_changed)
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
@@ -0,0 +1,121 @@
+# src/script_runner.py
+import importlib
+import importlib.util
+import json
+import os
+import signal
+import sys
+import traceback
+
+from src.script_registry import load_code
+from src.tracing import now_us, emit_span, instrument_worker, trace_enabled
+
+# Must match PARAMS_ENV in assets/scripts/utils/config.py
+PARAMS_ENV = "AUTOPILOT_SCRIPT_PARAMS"
+
+# Modules every bundled script needs. A worker imports them while it sits idle
+# in the pool so a job only pays for loading the script itself.
+PREWARM_MODULES = ("uiautomator2", "yaml", "pyotp")
+
+def _bundle_hint():
+    # Never called. The scripts are loaded from assets/ at runtime, so
+    # PyInstaller only bundles their dependencies if it sees these imports
+    # somewhere in the app (src/main.py used to import them at the top).
+    import uiautomator2, yaml, pyotp  # noqa: F401
+
+def prewarm():
+    """Imports the heavy script dependencies ahead of the first job."""
+    for name in PREWARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # A missing module only matters to the scripts that use it.
+            pass
+
+def run_script(script_path, device_id, trace=False, code_path=None):
+    """
+    Loads a script from its file path and calls its `main(device_id)`.
+    `code_path` is the script's compiled code cached by the ScriptRegistry;
+    without it (or if it is stale) the source is compiled as usual.
+    """
+    script_dir = os.path.dirname(os.path.abspath(script_path))
+    if script_dir not in sys.path:
+        # Keep `import utils` working the same way as a direct `python script.py` run.
+        sys.path.insert(0, script_dir)
+
+    # Create a module name from the filename
+    module_name = os.path.splitext(os.path.basename(script_path))[0]
+
+    loaded = now_us()
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    script_module = importlib.util.module_from_spec(spec)
+    code = load_code(code_path) if code_path else None
+    # Registered first, as import does: dataclasses and pickle look the module up by name.
+    sys.modules[module_name] = script_module
+    if code is not None:
+        exec(code, script_module.__dict__)
+    else:
+        spec.loader.exec_module(script_module)
+    if trace:
+        emit_span("load script", loaded, now_us() - loaded, "worker", script=module_name)
+
+    # Call the script's main function directly with the device_id
+    started = now_us()
+    try:
+        script_module.main(device_id)
+    finally:
+        if trace:
+            emit_span("main()", started, now_us() - started, "worker")
+
+def _stop_requested(signum, frame):
+    raise KeyboardInterrupt
+
+def serve_worker():
+    """
+    Entry point of a pooled script worker.
+    The worker warms up, then waits for exactly one JSON job line on stdin:
+    {"script": <path>, "device_id": <serial>, "params": <config section>,
+     "env": <extra environment>, "code": <cached code path>, "spawned_us": <spawn time>}.
+    The params reach the script through PARAMS_ENV. Running a single job per
+    process keeps cancellation, exit status and output capture identical to a
+    plain subprocess run. Returns the process exit code.
+
+    The stop signal of the controller (SIGTERM, CTRL_BREAK on Windows) is
+    raised in the script as KeyboardInterrupt, so its `except
+    KeyboardInterrupt` and `finally` blocks run before the worker exits.
+    """
+    for name in ("SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), _stop_requested)
+    started = now_us()
+    sys.stdout.reconfigure(line_buffering=True)
+    prewarm()
+    warm = now_us()
+
+    line = sys.stdin.readline()
+    if not line.strip():
+        # The controller closed the pipe without handing out a job.
+        return 0
+    received = now_us()
+
+    job = json.loads(line)
+    sys.argv = [job["script"], job["device_id"]]
+    os.environ.update(job.get("env") or {})
+    if job.get("params") is not None:
+        os.environ[PARAMS_ENV] = json.dumps(job["params"])
+    trace = trace_enabled()
+    if trace:
+        # Startup covers the interpreter and the src.main imports.
+        spawned = job.get("spawned_us") or started
+        emit_span("startup", spawned, started - spawned, "worker")
+        emit_span("prewarm", started, warm - started, "worker")
+        emit_span("idle in pool", warm, received - warm, "worker")
+        instrument_worker()
+    try:
+        run_script(job["script"], job["device_id"], trace, job.get("code"))
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.stdout.flush()
+    return 0
@@ -0,0 +1,173 @@
+# src/session_broker.py
+import asyncio
+import concurrent.futures
+import time
+
+DEFAULT_HEALTH_INTERVAL_S = 30
+DEFAULT_CONNECT_TIMEOUT_S = 45
+BACKOFF_BASE_S = 2
+BACKOFF_MAX_S = 120
+
+# Must match SESSION_ENV in assets/scripts/utils/session.py
+SESSION_ENV = "AUTOPILOT_U2_SESSION"
+
+class DeviceSession:
+    """uiautomator2 connection state of one device."""
+    __slots__ = ("serial", "device", "healthy", "failures", "retry_at", "checked_at", "lock")
+
+    def __init__(self, serial):
+        self.serial = serial
+        self.device = None
+        self.healthy = False
+        self.failures = 0
+        self.retry_at = 0.0
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+
+class SessionBroker:
+    """
+    Keeps one uiautomator2 session per device open in the app process.
+
+    uiautomator2 starts its on-device server from the process that connects
+    and stops it again when that process exits, so every script run used to
+    pay for the jar check, server launch and readiness probe. The broker
+    holds the session for the life of the app, health-checks it and
+    reconnects with exponential backoff; scripts then find the server already
+    running and attach to it (see assets/scripts/utils/session.py).
+    """
+    def __init__(self, health_interval=DEFAULT_HEALTH_INTERVAL_S,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT_S, max_workers=8, connect=None):
+        self.health_interval = health_interval
+        self.connect_timeout = connect_timeout
+        # Threads for connects and checks; read when the first one starts, so
+        # it can follow the scheduler's max_concurrent set after construction.
+        self.max_workers = max_workers
+        # connect(serial) -> device with `.info`; blocking, runs on the executor
+        self._connect = connect or self._connect_blocking
+        self._sessions = {}
+        self._executor = None
+        self._free_threads = None  # asyncio.Semaphore, one per executor thread
+        self._health_task = None
+
+    def _session(self, serial):
+        session = self._sessions.get(serial)
+        if session is None:
+            session = self._sessions[serial] = DeviceSession(serial)
+        return session
+
+    def is_healthy(self, serial):
+        session = self._sessions.get(serial)
+        return session is not None and session.healthy
+
+    def job_env(self, serial):
+        """Environment for a script run: tells the script whether a warm session exists."""
+        return {SESSION_ENV: "warm" if self.is_healthy(serial) else "cold"}
+
+    @staticmethod
+    def _connect_blocking(serial):
+        # Imported on first use; the GUI should not pay for it at startup.
+        import uiautomator2 as u2
+        device = u2.connect(serial)
+        device.info  # Fails if the on-device server does not answer.
+        return device
+
+    @staticmethod
+    def _check_blocking(device):
+        device.info
+
+    async def _call(self, func, *args):
+        """
+        Runs `func` on a thread of its own. The timeout starts once a thread
+        is free, not while the call waits for one. A call that timed out
+        keeps its thread until `func` returns, so its slot is only given back
+        then and later calls do not queue behind it inside the executor.
+        """
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="u2-session"
+            )
+            self._free_threads = asyncio.Semaphore(self.max_workers)
+        loop = asyncio.get_running_loop()
+        await self._free_threads.acquire()
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._free_threads.release)
+            except RuntimeError:
+                pass  # the loop is closed; nobody waits any more
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(release)
+        return await asyncio.wait_for(asyncio.wrap_future(future), self.connect_timeout)
+
+    def _mark_failed(self, session, error):
+        session.healthy = False
+        session.device = None
+        session.failures += 1
+        delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** (session.failures - 1))
+        session.retry_at = time.monotonic() + delay
+        print(f"[SessionBroker] {session.serial}: session unavailable ({error}), retry in {delay}s")
+
+    async def ensure(self, serial):
+        """
+        Makes sure `serial` has a healthy session, connecting if needed.
+        Returns False while the device is in backoff after failed attempts.
+        """
+        self._ensure_health_loop()
+        session = self._session(serial)
+        async with session.lock:
+            if session.healthy:
+                return True
+            if time.monotonic() < session.retry_at:
+                return False
+            try:
+                session.device = await self._call(self._connect, serial)
+            except Exception as e:
+                self._mark_failed(session, e)
+                return False
+            session.healthy = True
+            session.failures = 0
+            session.checked_at = time.monotonic()
+            print(f"[SessionBroker] {serial}: session ready")
+            return True
+
+    async def check(self, serial):
+        """Health-checks an open session and reconnects it if it stopped answering."""
+        session = self._sessions.get(serial)
+        if session is None or session.device is None:
+            return False
+        async with session.lock:
+            try:
+                await self._call(self._check_blocking, session.device)
+                session.checked_at = time.monotonic()
+                return True
+            except Exception as e:
+                self._mark_failed(session, e)
+        return await self.ensure(serial)
+
+    def drop(self, serial):
+        """Forgets the session of a device that went away."""
+        session = self._sessions.pop(serial, None)
+        if session and session.device is not None and self._executor is not None:
+            device = session.device
+            self._executor.submit(lambda: device.stop_uiautomator(wait=False))
+
+    def _ensure_health_loop(self):
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            due = [
+                serial for serial, session in self._sessions.items()
+                if session.healthy and time.monotonic() - session.checked_at >= self.health_interval
+            ]
+            if due:
+                await asyncio.gather(*(self.check(serial) for serial in due), return_exceptions=True)
+
+    async def shutdown(self):
+        if self._health_task:
+            self._health_task.cancel()
+        for serial in list(self._sessions):
+            self.drop(serial)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,192 @@
+# src/tracing.py
+"""
+Opt-in timeline tracing of script runs, exported as Chrome trace JSON
+(open in chrome://tracing or https://ui.perfetto.dev).
+
+Set AUTOPILOT_TRACE=1 to write traces to `traces/` next to the app, or set it
+to a directory. Every device is a process in the trace. Its "controller"
+thread shows queueing, config, session and launch; its "script" thread shows
+worker startup, script phases, uiautomator2 connects, selector waits, sleeps
+and custom spans from `utils.trace`. One file is written per batch, i.e.
+whenever the run queue drains.
+
+With tracing off, `Tracer.span()` returns a shared no-op context manager and
+workers install no instrumentation.
+"""
+import functools
+import json
+import os
+import sys
+import time
+
+TRACE_ENV = "AUTOPILOT_TRACE"
+
+def trace_enabled():
+    """Whether TRACE_ENV turns tracing on: unset, empty and "0" mean off."""
+    return os.environ.get(TRACE_ENV, "") not in ("", "0")
+
+CONTROLLER_TID = 0
+SCRIPT_TID = 1
+
+# Must match EVENT_PREFIX in src/progress.py
+_EVENT_PREFIX = "\x1e"
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+def now_us():
+    """Wall clock in microseconds; shared by the controller and the workers."""
+    return time.time_ns() // 1000
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("tracer", "serial", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, serial, name, cat, args):
+        self.tracer = tracer
+        self.serial = serial
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = now_us()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.complete(self.serial, self.name, self.start, now_us() - self.start, self.cat, args=self.args)
+        return False
+
+class Tracer:
+    """Collects trace events of the controller and its workers for one batch at a time."""
+    def __init__(self, directory=None):
+        self.enabled = directory is not None
+        self.directory = directory
+        self.events = []
+        self._pids = {}  # serial -> trace pid
+        self._phases = {}  # serial -> (phase name, start µs) of the running script
+
+    @classmethod
+    def from_env(cls, default_dir):
+        if not trace_enabled():
+            return cls(None)
+        value = os.environ[TRACE_ENV]
+        return cls(default_dir if value == "1" else value)
+
+    def _pid(self, serial):
+        pid = self._pids.get(serial)
+        if pid is None:
+            pid = self._pids[serial] = len(self._pids) + 1
+            self.events.append({"ph": "M", "name": "process_name", "pid": pid, "args": {"name": serial}})
+            for tid, name in ((CONTROLLER_TID, "controller"), (SCRIPT_TID, "script")):
+                self.events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}})
+        return pid
+
+    def span(self, serial, name, cat="controller", **args):
+        """Context manager timing a controller-side step of `serial`'s run."""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, serial, name, cat, args)
+
+    def complete(self, serial, name, ts, dur, cat="controller", tid=CONTROLLER_TID, args=None):
+        if not self.enabled:
+            return
+        event = {"ph": "X", "name": name, "cat": cat, "ts": ts, "dur": max(0, dur),
+                 "pid": self._pid(serial), "tid": tid}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def instant(self, serial, name, cat="controller", tid=CONTROLLER_TID):
+        if self.enabled:
+            self.events.append({"ph": "i", "s": "t", "name": name, "cat": cat, "ts": now_us(),
+                                "pid": self._pid(serial), "tid": tid})
+
+    def script_event(self, serial, event):
+        """Turns a progress event of the running script into trace events."""
+        if not self.enabled:
+            return
+        kind = event.get("e")
+        if kind == "span":
+            self.complete(serial, event.get("name", "span"), event.get("ts", 0), event.get("dur", 0),
+                          event.get("cat", "script"), SCRIPT_TID, event.get("args"))
+        elif kind in ("phase", "result"):
+            ts = int(event.get("t", 0) * 1_000_000)
+            open_phase = self._phases.pop(serial, None)
+            if open_phase is not None:
+                name, start = open_phase
+                self.complete(serial, name, start, ts - start, "phase", SCRIPT_TID)
+            if kind == "phase":
+                self._phases[serial] = (event.get("name"), ts)
+
+    def end_run(self, serial):
+        """Closes a phase the script left open (e.g. it crashed before reporting a result)."""
+        open_phase = self._phases.pop(serial, None)
+        if open_phase is not None:
+            name, start = open_phase
+            self.complete(serial, name, start, now_us() - start, "phase", SCRIPT_TID)
+
+    def export(self, path):
+        """Writes the collected events to `path` and starts a new batch."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        self.events = []
+        self._pids.clear()
+        return path
+
+    def export_batch(self):
+        """Exports the current batch into `directory` if anything was recorded. Returns the path or None."""
+        if not self.enabled or not self.events:
+            return None
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self.export(os.path.join(self.directory, f"trace-{stamp}-{now_us() % 1_000_000:06d}.json"))
+        print(f"[Tracer] Wrote {path}")
+        return path
+
+# --- Worker side -----------------------------------------------------------
+
+def emit_span(name, ts, dur, cat="script", **args):
+    """Sends a span from a worker to the controller as a progress event line."""
+    event = {"e": "span", "name": name, "cat": cat, "ts": ts, "dur": dur}
+    if args:
+        event["args"] = args
+    sys.stdout.write(_EVENT_PREFIX + _dumps(event) + "\n")
+    sys.stdout.flush()
+
+def _traced(func, name, cat, describe=None):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = now_us()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            extra = describe(*args, **kwargs) if describe else {}
+            emit_span(name, start, now_us() - start, cat, **extra)
+    return wrapper
+
+def instrument_worker():
+    """
+    Wraps the calls a script spends most of its time in (`time.sleep`,
+    `uiautomator2.connect` and selector waits) so they show up as spans.
+    Only called in a worker whose job has tracing enabled.
+    """
+    time.sleep = _traced(time.sleep, "sleep", "sleep", lambda seconds: {"seconds": seconds})
+    try:
+        import uiautomator2
+        from uiautomator2._selector import UiObject
+    except ImportError:
+        return
+    uiautomator2.connect = _traced(uiautomator2.connect, "u2.connect", "u2")
+    UiObject.wait = _traced(
+        UiObject.wait, "selector.wait", "u2",
+        lambda obj, *args, **kwargs: {"selector": str(obj.selector)},
+    )
@@ -1,10 +1,17 @@
 # src/ui_components.py
 import flet as ft
 import asyncio
+import math
 import sys
 import os
+import time
 from typing import TYPE_CHECKING
 
+from src.scheduler import PRIORITY_MANUAL
+from src.device_rows import DeviceRow, STATUS_IDLE
+from src.orchestrator import RUN_QUEUED, RUN_RUNNING
+from src.run_log import STDERR
+
 # Use TYPE_CHECKING to prevent circular import errors with AppLogic
 if TYPE_CHECKING:
     from .main_app import AppLogic
@@ -14,21 +21,41 @@ if hasattr(sys, '_MEIPASS'):
 else:
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Fixed height of a device row. The list view relies on it to work out which
+# rows are visible without measuring them.
+ROW_HEIGHT = 48
+
+# Fixed size of a screen grid tile, likewise for the grid.
+TILE_WIDTH = 120
+TILE_IMAGE_HEIGHT = 220
+TILE_HEIGHT = 270
+TILE_SPACING = 8
+
+# Pause in typing before the log search runs, and lines it shows.
+SEARCH_DEBOUNCE_S = 0.25
+SEARCH_LIMIT = 200
+
 class DeviceControl(ft.Row):
-    """A UI control representing a single device row."""
-    def __init__(self, device_id: str, app_logic: 'AppLogic'):
-        self.device_id = device_id
+    """
+    The widgets of one device row. DeviceListView keeps only as many as fit
+    in its window and `bind()`s them to whichever DeviceRow (src/device_rows)
+    is shown in that slot. The run itself belongs to the Orchestrator; the
+    row forwards Run/Stop clicks and checkbox changes for the bound serial.
+    """
+    def __init__(self, app_logic: 'AppLogic'):
+        self.device_id = None  # serial of the bound DeviceRow
         self.app_logic = app_logic
-        self.running_task = None
-        self.running_process = None
 
         self.checkbox = ft.Checkbox(
             value=False,
-            on_change=self.app_logic.update_selected_count
+            on_change=self.on_checkbox_change
         )
-        self.device_id_text = ft.Text(self.device_id, expand=True)
-        self.status_text = ft.Text("Idle", expand=True, text_align=ft.TextAlign.CENTER)
+        self.device_id_text = ft.Text("")
+        self.tags_text = ft.Text("", size=11, color=ft.Colors.PRIMARY, no_wrap=True, visible=False)
+        self.info_text = ft.Text("", size=11, color=ft.Colors.GREY, no_wrap=True, visible=False)
+        self.status_text = ft.Text(STATUS_IDLE, expand=True, text_align=ft.TextAlign.CENTER)
         self.status_indicator = ft.ProgressRing(width=16, height=16, stroke_width=2, visible=False)
+        self.progress_bar = ft.ProgressBar(width=60, value=0, visible=False)
         self.play_button = ft.IconButton(
             icon=ft.Icons.PLAY_ARROW_ROUNDED,
             on_click=self.toggle_script,
@@ -38,102 +65,417 @@ class DeviceControl(ft.Row):
         super().__init__(
             controls=[
                 self.checkbox,
-                self.device_id_text,
+                ft.Column([ft.Row([self.device_id_text, self.tags_text], spacing=6), self.info_text],
+                          spacing=0, expand=True, tight=True, alignment=ft.MainAxisAlignment.CENTER),
                 self.status_text,
-                ft.Row(controls=[self.status_indicator, self.play_button], spacing=5)
+                ft.Row(controls=[self.progress_bar, self.status_indicator, self.play_button], spacing=5)
             ],
+            height=ROW_HEIGHT,
             vertical_alignment=ft.CrossAxisAlignment.CENTER
         )
 
+    def update(self):
+        # Rows scrolled out of view are not on the page. They are sent with
+        # their current values when they are rendered again.
+        if self.page is not None:
+            super().update()
+
+    def bind(self, row: DeviceRow):
+        """Shows `row` in these widgets."""
+        self.device_id = row.serial
+        self.device_id_text.value = row.serial
+        self.tags_text.value = " ".join(f"#{tag}" for tag in row.tags)
+        self.tags_text.visible = bool(row.tags)
+        self.info_text.value = row.info or ""
+        self.info_text.color = ft.Colors.ORANGE if row.attention else ft.Colors.GREY
+        self.info_text.visible = row.info is not None
+        self.status_text.value = row.status
+        self.status_indicator.visible = row.running
+        self.progress_bar.visible = row.running and row.fraction is not None
+        self.progress_bar.value = row.fraction or 0
+        if row.active:
+            self.play_button.icon = ft.Icons.STOP_ROUNDED
+            self.play_button.tooltip = "Stop script" if row.running else "Remove from queue"
+        else:
+            self.play_button.icon = ft.Icons.PLAY_ARROW_ROUNDED
+            self.play_button.tooltip = "Run script"
+        self.play_button.disabled = not row.online
+        self.checkbox.disabled = row.active or not row.online
+        self.checkbox.value = row.serial in self.app_logic.selection
+
+    @property
+    def run(self):
+        """The Orchestrator's current or last run on the bound device."""
+        return self.app_logic.core.runs.get(self.device_id)
+
     @property
     def is_running(self):
-        return self.running_task is not None and not self.running_task.done()
+        run = self.run
+        return run is not None and run.state == RUN_RUNNING
+
+    @property
+    def is_queued(self):
+        run = self.run
+        return run is not None and run.state == RUN_QUEUED
+
+    async def on_checkbox_change(self, e):
+        await self.app_logic.set_device_selected(self.device_id, self.checkbox.value)
 
     async def toggle_script(self, e):
-        if self.is_running:
+        if self.is_running or self.is_queued:
             await self.stop_script()
         else:
             selected_script = self.app_logic.get_selected_script()
             if selected_script and selected_script in self.app_logic.available_scripts:
-                await self.start_script(selected_script)
+                self.app_logic.core.submit(selected_script, [self.device_id], priority=PRIORITY_MANUAL)
             else:
                 await self.app_logic.show_snackbar("Please select a valid script!")
 
-    async def start_script(self, script_filename):
-        await self.update_ui_for_running_state()
-        self.running_task = asyncio.create_task(self.run_script_async(script_filename, self.device_id))
-
     async def stop_script(self):
-        print(f"[{self.device_id}] Requesting stop...")
-        if self.running_process:
-            try:
-                self.running_process.terminate()
-                await self.running_process.wait()
-            except ProcessLookupError:
-                pass 
-        if self.running_task:
-            self.running_task.cancel()
-        await self._kill_atx_agent()
-        await self.update_ui_for_stopped_state()
-
-    async def _kill_atx_agent(self):
-        print(f"[{self.device_id}] Stopping atx-agent...")
-        try:
-            await asyncio.create_subprocess_exec(
-                'adb', '-s', self.device_id, 'shell', 'pkill', 'atx-agent',
-                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-            )
-        except Exception as e:
-            print(f"Error while stopping atx-agent on {self.device_id}: {e}")
+        await self.app_logic.core.stop([self.device_id])
+
+class DeviceListView(ft.ListView):
+    """
+    Device list that keeps a DeviceRow (plain state) per serial and widgets
+    only for the rows inside the visible window (plus some overscan). When
+    the window moves, the widgets of rows that left it are bound to the rows
+    that entered it, so the number of widgets follows the window, not the
+    fleet. Spacers above and below the window stand in for the rows that are
+    not rendered. With a filter set, only the rows of the matching serials
+    are listed.
+    """
+    def __init__(self, make_widget, overscan=10, visible_rows=20):
+        self.rows = {}  # serial -> DeviceRow, in display order
+        self.make_widget = make_widget  # () -> a new, unbound DeviceControl
+        self.overscan = overscan
+        self._visible_rows = visible_rows
+        self._order = []
+        self._matches = None  # set of serials to list, or None for all
+        self.shown = self._order  # serials listed, in display order
+        self._bound = {}  # serial -> DeviceControl showing it
+        self._spare = []  # DeviceControls not bound to a row
+        self._first = 0
+        self._message = None
+        self._top_spacer = ft.Container(height=0)
+        self._bottom_spacer = ft.Container(height=0)
+        super().__init__(
+            expand=True, spacing=0,
+            on_scroll=self._on_scroll, on_scroll_interval=50,
+        )
+
+    def get_row(self, serial):
+        return self.rows.get(serial)
+
+    def widget_for(self, serial):
+        """The DeviceControl currently showing `serial`, or None if it is outside the window."""
+        return self._bound.get(serial)
+
+    @property
+    def widgets(self):
+        """Every DeviceControl created so far, bound or spare."""
+        return [*self._bound.values(), *self._spare]
+
+    def add_row(self, row: DeviceRow):
+        self.rows[row.serial] = row
+        self._order.append(row.serial)
+        if self.shown is not self._order and row.serial in self._matches:
+            self.shown.append(row.serial)
+
+    def remove_row(self, serial):
+        if self.rows.pop(serial, None) is not None:
+            self._order.remove(serial)
+            if self.shown is not self._order and serial in self._matches:
+                self.shown.remove(serial)
+            widget = self._bound.pop(serial, None)
+            if widget is not None:
+                self._spare.append(widget)
+
+    @property
+    def filtered(self):
+        return self._matches is not None
+
+    def set_filter(self, matches):
+        """Lists only the rows whose serial is in `matches` (None lists all). Call `render()` afterwards."""
+        if matches is None:
+            self.shown = self._order
+        else:
+            self.shown = [serial for serial in self._order if serial in matches]
+        if matches != self._matches:
+            self._first = 0  # a new result starts at the top
+        self._matches = matches
+
+    def set_message(self, message: ft.Control = None):
+        """Shows a message (e.g. "No devices found.") above the rows, or clears it."""
+        self._message = message
+
+    def _window(self):
+        count = self._visible_rows + 2 * self.overscan
+        first = min(self._first, len(self.shown))
+        return first, min(len(self.shown), first + count)
+
+    def render(self):
+        """Rebuilds `controls` from the current window. Call `update()` afterwards."""
+        first, last = self._window()
+        window = self.shown[first:last]
+        # Rows still in the window keep their widgets; the others are freed first.
+        bound = {serial: self._bound.pop(serial) for serial in window if serial in self._bound}
+        self._spare.extend(self._bound.values())
+        for serial in window:
+            if serial not in bound:
+                widget = bound[serial] = self._spare.pop() if self._spare else self.make_widget()
+                widget.bind(self.rows[serial])
+        self._bound = bound
+        self._top_spacer.height = first * ROW_HEIGHT
+        self._bottom_spacer.height = (len(self.shown) - last) * ROW_HEIGHT
+        controls = [self._message] if self._message else []
+        controls.append(self._top_spacer)
+        controls.extend(bound[serial] for serial in window)
+        controls.append(self._bottom_spacer)
+        self.controls = controls
+
+    def rebind(self):
+        """Re-reads every rendered row, e.g. after the selection changed as a whole."""
+        for serial, widget in self._bound.items():
+            widget.bind(self.rows[serial])
+
+    async def _on_scroll(self, e: ft.OnScrollEvent):
+        visible_rows = math.ceil((e.viewport_dimension or 0) / ROW_HEIGHT) or self._visible_rows
+        first = max(0, int((e.pixels or 0) // ROW_HEIGHT) - self.overscan)
+        if first == self._first and visible_rows == self._visible_rows:
+            return
+        self._first, self._visible_rows = first, visible_rows
+        self.render()
+        self.update()
+
+class ScreenTile(ft.Container):
+    """
+    One device in the screen grid: its latest thumbnail (see ScreenCapturer),
+    serial and status. Pooled and `bind()`-ed like DeviceControl.
+    """
+    def __init__(self, app_logic: 'AppLogic'):
+        self.device_id = None
+        self.app_logic = app_logic
+        self.thumbnail = ft.Image(src_base64=None, width=TILE_WIDTH, height=TILE_IMAGE_HEIGHT,
+                              fit=ft.ImageFit.CONTAIN, gapless_playback=True, visible=False)
+        self.placeholder = ft.Container(
+            content=ft.Icon(ft.Icons.PHONE_ANDROID, color=ft.Colors.OUTLINE),
+            width=TILE_WIDTH, height=TILE_IMAGE_HEIGHT, alignment=ft.alignment.center,
+        )
+        self.serial_text = ft.Text("", size=11, no_wrap=True)
+        self.status_text = ft.Text("", size=10, color=ft.Colors.GREY, no_wrap=True)
+        super().__init__(
+            content=ft.Column([self.placeholder, self.thumbnail, self.serial_text, self.status_text],
+                              spacing=2, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+            width=TILE_WIDTH, height=TILE_HEIGHT, padding=2, border_radius=4,
+            on_click=self.on_click,
+        )
+
+    def update(self):
+        if self.page is not None:
+            super().update()
+
+    def bind(self, row: DeviceRow, image):
+        """Shows `row` with thumbnail `image` (base64, or None before the first one)."""
+        self.device_id = row.serial
+        self.set_image(image)
+        self.serial_text.value = row.serial
+        self.status_text.value = row.status
+        self.status_text.color = ft.Colors.ERROR if row.failed else ft.Colors.GREY
+        self.tooltip = f"{row.serial}: {row.status}"
+        if row.failed or row.attention:
+            self.border = ft.border.all(2, ft.Colors.ERROR if row.failed else ft.Colors.ORANGE)
+        elif row.running:
+            self.border = ft.border.all(2, ft.Colors.PRIMARY)
+        else:
+            self.border = ft.border.all(1, ft.Colors.OUTLINE_VARIANT)
+
+    def set_image(self, image):
+        self.thumbnail.src_base64 = image
+        self.thumbnail.visible = image is not None
+        self.placeholder.visible = image is None
+
+    async def on_click(self, e):
+        # Clicking a tile checks or unchecks its device, as the row's checkbox does.
+        row = self.app_logic.device_list_view.get_row(self.device_id)
+        if row is not None and row.online and not row.active:
+            await self.app_logic.set_device_selected(
+                self.device_id, self.device_id not in self.app_logic.selection)
+
+class ScreenGrid(ft.ListView):
+    """
+    Grid of ScreenTiles over the same devices (and filter) as the device
+    list, windowed the same way: tiles exist only for the grid rows in view
+    plus `overscan` rows, and are rebound as the window moves. After each
+    render `on_window(serials)` gets the devices actually in view, so the
+    capturer can refresh those first.
+    """
+    def __init__(self, make_tile, rows, image_of, on_window, overscan=1, visible_rows=3, columns=6):
+        self.make_tile = make_tile  # () -> a new, unbound ScreenTile
+        self.rows = rows  # serial -> DeviceRow, the device list's
+        self.image_of = image_of  # serial -> base64 thumbnail or None
+        self.on_window = on_window
+        self.overscan = overscan
+        self.columns = columns
+        self._visible_rows = visible_rows
+        self._view_row = 0  # first grid row in view
+        self._bound = {}  # serial -> ScreenTile showing it
+        self._spare = []
+        self.serials = []
+        self._top_spacer = ft.Container(height=0)
+        self._bottom_spacer = ft.Container(height=0)
+        super().__init__(
+            expand=True, spacing=TILE_SPACING, visible=False,
+            on_scroll=self._on_scroll, on_scroll_interval=100,
+        )
+
+    def tile_for(self, serial):
+        return self._bound.get(serial)
+
+    @property
+    def tiles(self):
+        return [*self._bound.values(), *self._spare]
+
+    def set_serials(self, serials, columns=None, top=False):
+        """
+        Lists `serials` in this order, `columns` per grid row; `top` starts
+        at the first row, as for a new filter. Call `render()` afterwards.
+        """
+        self.serials = list(serials)
+        if columns:
+            self.columns = columns
+        if top:
+            self._view_row = 0
+
+    def visible_serials(self):
+        start = self._view_row * self.columns
+        return self.serials[start:start + self._visible_rows * self.columns]
 
-    async def run_script_async(self, script_filename, device_id):
-        script_path = os.path.join(BASE_DIR, "assets/scripts", script_filename)
-        args = [sys.executable, "-u", script_path, device_id, "--run-script"]
+    def render(self):
+        """Rebuilds `controls` from the current window. Call `update()` afterwards."""
+        grid_rows = math.ceil(len(self.serials) / self.columns)
+        first = min(max(0, self._view_row - self.overscan), grid_rows)
+        last = min(grid_rows, first + self._visible_rows + 2 * self.overscan)
+        window = self.serials[first * self.columns:last * self.columns]
+        bound = {serial: self._bound.pop(serial) for serial in window if serial in self._bound}
+        self._spare.extend(self._bound.values())
+        for serial in window:
+            tile = bound.get(serial)
+            if tile is None:
+                tile = bound[serial] = self._spare.pop() if self._spare else self.make_tile()
+            tile.bind(self.rows[serial], self.image_of(serial))
+        self._bound = bound
+        step = TILE_HEIGHT + TILE_SPACING
+        self._top_spacer.height = max(0, first * step - TILE_SPACING)
+        self._bottom_spacer.height = max(0, (grid_rows - last) * step - TILE_SPACING)
+        self.controls = [
+            self._top_spacer,
+            *(ft.Row([bound[serial] for serial in window[i:i + self.columns]], spacing=TILE_SPACING)
+              for i in range(0, len(window), self.columns)),
+            self._bottom_spacer,
+        ]
+        self.on_window(self.visible_serials())
 
-        try:
-            self.status_text.value = "Running..."
+    async def _on_scroll(self, e: ft.OnScrollEvent):
+        step = TILE_HEIGHT + TILE_SPACING
+        # A partly scrolled grid shows one row more than fits.
+        visible_rows = math.ceil((e.viewport_dimension or 0) / step) + 1 if e.viewport_dimension else self._visible_rows
+        view_row = int((e.pixels or 0) // step)
+        if view_row == self._view_row and visible_rows == self._visible_rows:
+            return
+        self._view_row, self._visible_rows = view_row, visible_rows
+        self.render()
+        self.update()
+
+class LogSearchPanel(ft.Container):
+    """
+    Search over the script output of past and running runs (the
+    Orchestrator's LogIndex): the devices with matches, then the newest
+    matching lines. Clicking a device narrows the lines to it. The search
+    runs in a worker thread once typing pauses; answers to older queries are
+    dropped.
+    """
+    def __init__(self, app_logic: 'AppLogic', debounce_s=SEARCH_DEBOUNCE_S, limit=SEARCH_LIMIT):
+        self.app_logic = app_logic
+        self.debounce_s = debounce_s
+        self.limit = limit
+        self.device_filter = None
+        self._generation = 0  # bumped by every edit; a search only shows if it is still current
+        self.query_field = ft.TextField(
+            hint_text="Search script output, e.g. ZeroDivisionError",
+            prefix_icon=ft.Icons.SEARCH, dense=True,
+            on_change=self.on_query_change, on_submit=self.on_query_change,
+        )
+        self.summary_text = ft.Text("", size=12, color=ft.Colors.GREY)
+        self.device_buttons = ft.Row(wrap=True, spacing=4, run_spacing=4)
+        self.lines_view = ft.ListView(expand=True, spacing=2)
+        super().__init__(
+            content=ft.Column(
+                [self.query_field, self.summary_text, self.device_buttons, ft.Divider(height=1), self.lines_view],
+                expand=True, spacing=6,
+            ),
+            width=480, padding=10, visible=False,
+            border=ft.border.only(left=ft.border.BorderSide(1, ft.Colors.OUTLINE)),
+        )
+
+    def toggle(self, e=None):
+        self.visible = not self.visible
+        self.update()
+
+    def on_query_change(self, e):
+        self._generation += 1
+        self.app_logic.page.run_task(self._search_after_pause, self._generation)
+
+    async def _search_after_pause(self, generation):
+        await asyncio.sleep(self.debounce_s)
+        if generation == self._generation:
+            await self.search(generation)
+
+    async def search(self, generation=None):
+        generation = self._generation if generation is None else generation
+        index = self.app_logic.core.log_index
+        text = (self.query_field.value or "").strip()
+        if index is None or not text:
+            self._show(None)
+            return
+        # Make sure the lines shown so far are in, then search off the event loop.
+        await index.flush_queued()
+        result = await asyncio.to_thread(index.search, text, self.limit, self.device_filter)
+        if generation == self._generation:
+            self._show(result)
+
+    def _set_device_filter(self, serial):
+        self.device_filter = None if serial == self.device_filter else serial
+        self._generation += 1
+        self.app_logic.page.run_task(self.search, self._generation)
+
+    def _show(self, result):
+        if result is None:
+            self.summary_text.value = ""
+            self.device_buttons.controls = []
+            self.lines_view.controls = []
             self.update()
-            print(f"[{device_id}] Executing: {' '.join(args)}")
-            self.running_process = await asyncio.create_subprocess_exec(
-                *args,
-                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            return
+        matches = sum(device["matches"] for device in result["devices"])
+        self.summary_text.value = (
+            f"{matches}{'+' if result['truncated'] else ''} matches on {len(result['devices'])} device(s) "
+            f"in {result['elapsed_ms']:.0f} ms" + (f", showing {self.device_filter}" if self.device_filter else "")
+        )
+        self.device_buttons.controls = [
+            ft.OutlinedButton(
+                text=f"{device['serial']} ({device['matches']})",
+                on_click=lambda e, serial=device["serial"]: self._set_device_filter(serial),
+                style=ft.ButtonStyle(
+                    bgcolor=ft.Colors.SECONDARY_CONTAINER if device["serial"] == self.device_filter else None,
+                ),
             )
-            async for line in self.running_process.stdout:
-                log_line = line.decode().strip()
-                print(f"[{device_id}|SCRIPT] {log_line}")
-                self.status_text.value = log_line
-                self.update()
-            await self.running_process.wait()
-            if self.running_process.returncode != 0:
-                stderr_output = await self.running_process.stderr.read()
-                error_message = stderr_output.decode()
-                print(f"[{device_id}] Script finished with error:\n{error_message}")
-                self.status_text.value = f"Error: {error_message.splitlines()[-1]}"
-            else:
-                self.status_text.value = "Finished"
-        except asyncio.CancelledError:
-            print(f"[{device_id}] Task was cancelled.")
-            self.status_text.value = "Cancelled"
-        except Exception as e:
-            print(f"Error running script on {device_id}: {e}")
-            self.status_text.value = "Error"
-        finally:
-            self.running_task = None
-            self.running_process = None
-            await self.update_ui_for_stopped_state()
-
-    async def update_ui_for_running_state(self):
-        self.play_button.icon = ft.Icons.STOP_ROUNDED
-        self.play_button.tooltip = "Stop script"
-        self.status_indicator.visible = True
-        self.checkbox.disabled = True
+            for device in result["devices"][:50]
+        ]
+        self.lines_view.controls = [
+            ft.Text(
+                f"{time.strftime('%H:%M:%S', time.localtime(line['ts']))}  {line['serial']}  {line['text']}",
+                size=12, font_family="monospace", selectable=True,
+                color=ft.Colors.ERROR if line["stream"] == STDERR else None,
+            )
+            for line in result["lines"]
+        ]
         self.update()
-
-    async def update_ui_for_stopped_state(self):
-        self.play_button.icon = ft.Icons.PLAY_ARROW_ROUNDED
-        self.play_button.tooltip = "Run script"
-        self.status_indicator.visible = False
-        self.checkbox.disabled = False
-        if self.status_text.value not in ["Finished", "Cancelled"] and "Error" not in self.status_text.value:
-            self.status_text.value = "Idle"
-        self.update()
\ No newline at end of file
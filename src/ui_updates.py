@@ -0,0 +1,85 @@
+# src/ui_updates.py
+import asyncio
+import time
+
+import flet as ft
+
+DEFAULT_UPDATE_HZ = 10
+STATS_LOG_INTERVAL_S = 30
+
+class UpdatePump:
+    """
+    Collects controls that changed and pushes them to the page in one batched
+    `page.update()` per frame. A control marked dirty several times between two
+    frames is sent once, with whatever value it holds at flush time.
+    """
+    def __init__(self, page: ft.Page, rate_hz=DEFAULT_UPDATE_HZ):
+        self.page = page
+        self.interval = 1.0 / rate_hz
+        self._dirty = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopped = False
+
+        # Counters for tuning the frame rate.
+        self.requested = 0
+        self.flushed = 0
+        self.frames = 0
+        self._last_log = time.monotonic()
+
+    @property
+    def coalesced(self):
+        """Number of update requests absorbed by a later request for the same control."""
+        return self.requested - self.flushed - len(self._dirty)
+
+    def mark_dirty(self, control: ft.Control):
+        """Schedules `control` for the next frame instead of updating it right away."""
+        if self._stopped:
+            return
+        self.requested += 1
+        self._dirty[id(control)] = control
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    def flush(self):
+        """Sends all pending controls to the page now."""
+        if not self._dirty:
+            return
+        controls = [c for c in self._dirty.values() if c.page is not None]
+        self.flushed += len(self._dirty)
+        self._dirty.clear()
+        self.frames += 1
+        if controls:
+            self.page.update(*controls)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[UpdatePump] Failed to flush UI updates: {e}")
+            self._log_stats()
+            await asyncio.sleep(self.interval)
+
+    def _log_stats(self):
+        now = time.monotonic()
+        if now - self._last_log < STATS_LOG_INTERVAL_S:
+            return
+        self._last_log = now
+        print(
+            f"[UpdatePump] {self.requested} requests, {self.flushed} controls sent in "
+            f"{self.frames} frames, {self.coalesced} coalesced"
+        )
+
+    def stop(self):
+        """Sends what is pending and ends the flush task; later requests are dropped."""
+        self._stopped = True
+        if self._task:
+            self._task.cancel()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[UpdatePump] Failed to flush UI updates: {e}")
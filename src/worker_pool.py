@@ -0,0 +1,121 @@
+# src/worker_pool.py
+import asyncio
+import collections
+import json
+import os
+import sys
+
+from src.run_stopper import process_group_kwargs
+from src.tracing import now_us
+
+if hasattr(sys, '_MEIPASS'):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_POOL_SIZE = 8
+
+def worker_command():
+    """Command line that starts one script worker (see `src.script_runner.serve_worker`)."""
+    if hasattr(sys, '_MEIPASS'):
+        # The packaged app re-launches itself in worker mode.
+        return [sys.executable, "--worker"]
+    return [sys.executable, "-u", "-m", "src.main", "--worker"]
+
+class WorkerPool:
+    """
+    Keeps a number of script workers started and idle, with the heavy modules
+    already imported, so launching a job skips the interpreter cold start.
+    Each worker runs a single job and exits; the pool refills itself in the
+    background after every launch.
+    """
+    def __init__(self, size=DEFAULT_POOL_SIZE):
+        self.size = size
+        self._idle = collections.deque()
+        self._spawning = 0
+        self._refill_tasks = set()
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    async def _spawn(self):
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        spawned_us = now_us()
+        proc = await asyncio.create_subprocess_exec(
+            *worker_command(),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            cwd=BASE_DIR, env=env,
+            # Stopping a run signals the whole group, including anything the script started.
+            **process_group_kwargs(),
+        )
+        proc.spawned_us = spawned_us  # start of the worker's startup span in traces
+        return proc
+
+    async def _fill(self, target):
+        missing = target - len(self._idle) - self._spawning
+        if missing <= 0:
+            return
+        self._spawning += missing
+        try:
+            results = await asyncio.gather(
+                *(self._spawn() for _ in range(missing)), return_exceptions=True
+            )
+        finally:
+            self._spawning -= missing
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[WorkerPool] Failed to start worker: {result}")
+            else:
+                self._idle.append(result)
+
+    def prewarm(self, count=None):
+        """Starts idle workers in the background, up to `count` (capped at the pool size)."""
+        target = self.size if count is None else min(count, self.size)
+        if target - len(self._idle) - self._spawning <= 0:
+            return
+        task = asyncio.create_task(self._fill(target))
+        self._refill_tasks.add(task)
+        task.add_done_callback(self._refill_tasks.discard)
+
+    def _take_idle(self):
+        while self._idle:
+            proc = self._idle.popleft()
+            if proc.returncode is None:
+                return proc
+        return None
+
+    async def launch(self, script_path, device_id, params=None, env=None, code_path=None):
+        """
+        Hands a job to a warm worker (or a freshly started one if none is idle)
+        and returns its `asyncio.subprocess.Process`, used exactly like a
+        process from `create_subprocess_exec`. `params` is the script's parsed
+        config section, passed along so the worker does not re-read the file.
+        `env` holds extra environment variables for the script and `code_path`
+        its compiled code from the ScriptRegistry.
+        """
+        proc = self._take_idle()
+        if proc is None:
+            proc = await self._spawn()
+        self.prewarm()
+
+        job = json.dumps({
+            "script": script_path, "device_id": device_id, "params": params, "env": env or {},
+            "code": code_path, "spawned_us": proc.spawned_us,
+        })
+        proc.stdin.write(job.encode() + b"\n")
+        await proc.stdin.drain()
+        proc.stdin.close()
+        return proc
+
+    async def shutdown(self):
+        """Stops all idle workers."""
+        for task in list(self._refill_tasks):
+            task.cancel()
+        while self._idle:
+            proc = self._idle.popleft()
+            if proc.returncode is None:
+                # Closing stdin makes an idle worker exit on its own.
+                proc.stdin.close()
+                await proc.wait()
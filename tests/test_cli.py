@@ -0,0 +1,65 @@
+# tests/test_cli.py
+import asyncio
+import io
+import json
+import os
+
+import src.cli
+from benchmarks.fleet import FakeFleet
+from src.main import CLI_COMMANDS
+from src.worker_pool import WorkerPool
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+def test_cli_commands_match_the_parser():
+    parser = src.cli.build_parser()
+    commands = next(action for action in parser._actions if action.dest == "command")
+    assert set(commands.choices) == set(CLI_COMMANDS)
+
+def _read_only_command(monkeypatch, tmp_path, argv, fleet_size=3):
+    """Runs a CLI command against a fake fleet; returns its output, exit code and the core it used."""
+    cores, prewarms = [], []
+    make_core = src.cli._make_core
+    def recording_make_core(args, read_only=False):
+        core = make_core(args, read_only)
+        shutdown = core.shutdown
+        async def recording_shutdown():
+            core.shut_down = True
+            await shutdown()
+        core.shut_down = False
+        core.shutdown = recording_shutdown
+        cores.append(core)
+        return core
+    monkeypatch.setattr(src.cli, "_make_core", recording_make_core)
+    monkeypatch.setattr(WorkerPool, "prewarm", lambda self, count=None: prewarms.append(count))
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        fleet = await FakeFleet(fleet_size).start()
+        try:
+            args = src.cli.build_parser().parse_args(
+                argv + ["--adb-port", str(fleet.port), "--script-dir", SCRIPT_DIR,
+                        "--devices-file", str(tmp_path / "devices.json")])
+            out = io.StringIO()
+            code = await args.handler(args, out)
+            return out.getvalue(), code
+        finally:
+            await fleet.stop()
+    output, code = asyncio.run(scenario())
+    return output, code, cores[0], prewarms
+
+def test_devices_starts_no_workers_and_opens_no_databases(monkeypatch, tmp_path):
+    output, code, core, prewarms = _read_only_command(monkeypatch, tmp_path, ["devices", "--json"])
+    assert code == 0
+    assert [device["serial"] for device in json.loads(output)] == ["FAKE00000", "FAKE00001", "FAKE00002"]
+    assert core.history is None and core.log_index is None and core.log_dir is None
+    assert prewarms == []
+    assert core.shut_down
+
+def test_scripts_shuts_its_core_down(monkeypatch, tmp_path):
+    output, code, core, prewarms = _read_only_command(monkeypatch, tmp_path, ["scripts"])
+    assert code == 0
+    assert "synthetic_script.py\t" in output
+    assert core.history is None and core.log_index is None
+    assert prewarms == []
+    assert core.shut_down
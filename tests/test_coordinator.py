@@ -0,0 +1,282 @@
+# tests/test_coordinator.py
+"""
+Coordinator against agents on loopback, each an Orchestrator with its own
+fake ADB server and API. Agents get no run slots (max_concurrent 0), so
+submitted runs stay queued: that is load the coordinator can see, and
+stopping them ends them as cancelled without starting any script.
+"""
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.fleet import FakeFleet
+from src.adb_client import AdbClient
+from src.api_server import ApiServer, read_ws_frame, WS_TEXT, WS_PING, WS_CLOSE
+from src.coordinator import Coordinator, AgentClient, _ws_client_frame, parse_agent, RUN_LOST, STATE_UNREACHABLE
+from src.orchestrator import Orchestrator, RUN_QUEUED, RUN_CANCELLED
+
+SCRIPT = "synthetic_script.py"
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+class Agent:
+    """One agent on loopback; `restart_api()` brings its API back on the same port."""
+    def __init__(self, size, seed=0):
+        self.size, self.seed = size, seed
+
+    async def start(self):
+        self.fleet = await FakeFleet(self.size, seed=self.seed).start()
+        self.core = Orchestrator(script_dir=SCRIPT_DIR, log_dir=None, adb=AdbClient(port=self.fleet.port),
+                                 echo_output=False, history_path=None, log_index_path=None, devices_path=None)
+        self.core.scheduler.max_concurrent = 0
+        self.core.load_scripts()
+        await self.core.scan()
+        self.server = await ApiServer(self.core, port=0).start()
+        self.port = self.server.port
+        return self
+
+    async def restart_api(self, core=None):
+        self.core = core or self.core
+        self.server = await ApiServer(self.core, port=self.port).start()
+
+    async def stop(self):
+        await self.server.stop()
+        await self.core.shutdown()
+        await self.fleet.stop()
+
+def _run(scenario):
+    asyncio.run(asyncio.wait_for(scenario(), 30))
+
+async def _wait_until(condition, timeout=10):
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("condition not met in time")
+
+def test_parse_agent():
+    assert parse_agent("lab1=10.0.0.5:8800") == ("lab1", "10.0.0.5", 8800)
+    assert parse_agent("10.0.0.5")[0:2] == (None, "10.0.0.5")
+    with pytest.raises(ValueError):
+        parse_agent("name=")
+
+def test_resolve_node_and_serial():
+    async def scenario():
+        # Two agents with the same seed list the same serials.
+        a, b = await Agent(3, 0).start(), await Agent(2, 0).start()
+        coordinator = await Coordinator([f"a=127.0.0.1:{a.port}", f"b=127.0.0.1:{b.port}"]).start(follow=False)
+        try:
+            by_node, unknown = coordinator.resolve(["a/FAKE00000", "b/FAKE00001", "FAKE00002", "FAKE00000",
+                                                    "c/FAKE00000", "NOPE"])
+            assert by_node == {"a": ["FAKE00000", "FAKE00002"], "b": ["FAKE00001"]}
+            assert unknown == {"FAKE00000": "ambiguous, use node/serial", "c/FAKE00000": "not connected",
+                               "NOPE": "not connected"}
+            assert {d["id"] for d in coordinator.inventory()} == {
+                "a/FAKE00000", "a/FAKE00001", "a/FAKE00002", "b/FAKE00000", "b/FAKE00001"}
+        finally:
+            await coordinator.shutdown()
+            await a.stop()
+            await b.stop()
+    _run(scenario)
+
+def test_repeated_hosts_are_named_by_port():
+    coordinator = Coordinator(["127.0.0.1:1", "127.0.0.1:2", "other"])
+    assert list(coordinator.nodes) == ["127.0.0.1:1", "127.0.0.1:2", "other"]
+    with pytest.raises(ValueError):
+        Coordinator(["x=127.0.0.1:1", "x=127.0.0.1:2"])
+
+def test_place_by_load():
+    async def scenario():
+        # "busy" already has 4 runs queued, as another operator would.
+        idle, busy = await Agent(5, 0).start(), await Agent(5, 1).start()
+        busy.core.submit(SCRIPT, busy.core.online_devices()[:4])
+        coordinator = await Coordinator([f"idle=127.0.0.1:{idle.port}", f"busy=127.0.0.1:{busy.port}"]).start()
+        try:
+            assert coordinator.nodes["busy"].load == 4.0
+            # The probe finds something wrong with the fake FAKE00002, which is placed last.
+            assert coordinator.nodes["idle"].devices["FAKE00002"]["attention"]
+            assert coordinator.place(SCRIPT, 5) == {"idle": ["FAKE00000", "FAKE00001", "FAKE00003", "FAKE00004"],
+                                                    "busy": ["FAKE00004"]}
+            submitted = await coordinator.submit(SCRIPT, count=3)
+            assert submitted["placement"] == {"idle": 3}
+            assert len(submitted["run_ids"]) == 3 and not submitted["skipped"]
+            await _wait_until(lambda: coordinator.nodes["idle"].queued == 3)
+            # Devices with a queued run are no longer idle; more than is idle leaves the rest skipped.
+            submitted = await coordinator.submit(SCRIPT, count=10)
+            assert submitted["placement"] == {"idle": 2, "busy": 1}
+            assert "*" in submitted["skipped"]
+            assert coordinator.place("missing.py", 1) == {}
+        finally:
+            await coordinator.shutdown()
+            await idle.stop()
+            await busy.stop()
+    _run(scenario)
+
+def test_submit_and_wait_round_trip():
+    async def scenario():
+        agent = await Agent(3, 0).start()
+        coordinator = await Coordinator([f"a=127.0.0.1:{agent.port}"]).start()
+        events = []
+        coordinator.subscribe(events.append)
+        try:
+            submitted = await coordinator.submit(SCRIPT, ids=["a/FAKE00001", "FAKE00002"])
+            assert submitted["queued"] == ["a/FAKE00001", "a/FAKE00002"]
+            await _wait_until(lambda: sum(1 for e in events if e["type"] == "run") >= 2)
+            assert {(e["id"], e["state"]) for e in events if e["type"] == "run"} == {
+                ("a/FAKE00001", RUN_QUEUED), ("a/FAKE00002", RUN_QUEUED)}
+            waiter = asyncio.ensure_future(coordinator.wait(submitted))
+            stopped = await coordinator.stop(["a/FAKE00001", "a/FAKE00002"])
+            # Queued runs only leave the queue; stop results are for runs that were running.
+            assert stopped == []
+            runs = await waiter
+            assert {device_id: run["state"] for device_id, run in runs.items()} == {
+                "a/FAKE00001": RUN_CANCELLED, "a/FAKE00002": RUN_CANCELLED}
+        finally:
+            await coordinator.shutdown()
+            await agent.stop()
+    _run(scenario)
+
+def test_run_survives_short_outage():
+    async def scenario():
+        agent = await Agent(2, 0).start()
+        coordinator = await Coordinator([f"a=127.0.0.1:{agent.port}"], lost_after=30).start()
+        node = coordinator.nodes["a"]
+        try:
+            submitted = await coordinator.submit(SCRIPT, ids=["a/FAKE00000"])
+            waiter = asyncio.ensure_future(coordinator.wait(submitted))
+            await agent.server.stop()
+            await _wait_until(lambda: not node.reachable)
+            assert {d["state"] for d in coordinator.inventory()} == {STATE_UNREACHABLE}
+            await agent.restart_api()
+            await _wait_until(lambda: node.reachable)
+            await asyncio.sleep(0.2)
+            assert not waiter.done()
+            await agent.core.stop(["FAKE00000"])
+            runs = await waiter
+            assert runs["a/FAKE00000"]["state"] == RUN_CANCELLED
+        finally:
+            await coordinator.shutdown()
+            await agent.stop()
+    _run(scenario)
+
+def test_run_lost_when_agent_stays_away():
+    async def scenario():
+        agent = await Agent(2, 0).start()
+        coordinator = await Coordinator([f"a=127.0.0.1:{agent.port}"], lost_after=0.3).start()
+        try:
+            submitted = await coordinator.submit(SCRIPT, ids=["a/FAKE00000"])
+            await agent.server.stop()
+            runs = await coordinator.wait(submitted)
+            assert runs["a/FAKE00000"]["state"] == RUN_LOST
+            assert runs["a/FAKE00000"]["serial"] == "FAKE00000"
+        finally:
+            await coordinator.shutdown()
+            await agent.core.shutdown()
+            await agent.fleet.stop()
+    _run(scenario)
+
+def test_run_lost_when_agent_restarted():
+    async def scenario():
+        agent = await Agent(2, 0).start()
+        coordinator = await Coordinator([f"a=127.0.0.1:{agent.port}"], lost_after=30).start()
+        node = coordinator.nodes["a"]
+        try:
+            submitted = await coordinator.submit(SCRIPT, ids=["a/FAKE00000"])
+            waiter = asyncio.ensure_future(coordinator.wait(submitted))
+            await agent.server.stop()
+            await _wait_until(lambda: not node.reachable)
+            # A new Orchestrator behind the same address knows nothing of the run.
+            old = agent.core
+            fresh = Orchestrator(script_dir=SCRIPT_DIR, log_dir=None, adb=AdbClient(port=agent.fleet.port),
+                                 echo_output=False, history_path=None, log_index_path=None, devices_path=None)
+            fresh.load_scripts()
+            await fresh.scan()
+            await old.shutdown()
+            await agent.restart_api(fresh)
+            runs = await waiter
+            assert runs["a/FAKE00000"]["state"] == RUN_LOST
+        finally:
+            await coordinator.shutdown()
+            await agent.stop()
+    _run(scenario)
+
+def test_unreachable_agent_at_start():
+    async def scenario():
+        agent = await Agent(2, 0).start()
+        port = agent.port
+        await agent.stop()
+        coordinator = await Coordinator([f"gone=127.0.0.1:{port}"], timeout=2).start(follow=False)
+        try:
+            node = coordinator.nodes["gone"]
+            assert not node.reachable and node.error
+            assert coordinator.place(SCRIPT, 1) == {}
+            submitted = await coordinator.submit(SCRIPT, ids=["gone/FAKE00000"])
+            assert submitted["skipped"] == {"gone/FAKE00000": "not connected"}
+        finally:
+            await coordinator.shutdown()
+    _run(scenario)
+
+def test_websocket_frames_round_trip():
+    async def scenario():
+        reader = asyncio.StreamReader()
+        for payload in (b"", b"ping", b"x" * 125):
+            reader.feed_data(_ws_client_frame(WS_PING, payload))
+        reader.feed_eof()
+        for payload in (b"", b"ping", b"x" * 125):
+            assert await read_ws_frame(reader) == (WS_PING, payload)
+    _run(scenario)
+
+def test_agent_client_request_and_events():
+    async def scenario():
+        agent = await Agent(2, 0).start()
+        client = AgentClient("127.0.0.1", agent.port, timeout=5)
+        try:
+            health = await client.request("GET", "/health")
+            assert (health["devices"], health["online"], health["running"], health["queued"]) == (2, 2, 0, 0)
+            assert [d["serial"] for d in await client.request("GET", "/devices")] == ["FAKE00000", "FAKE00001"]
+            events = client.events()
+            hello = await events.__anext__()
+            assert hello["type"] == "hello" and len(hello["devices"]) == 2
+            result = await client.request("POST", "/runs", {"script": SCRIPT, "devices": ["FAKE00001"]})
+            assert result["queued"] == ["FAKE00001"]
+            while True:
+                event = await events.__anext__()
+                if event["type"] == "run":
+                    break
+            assert (event["serial"], event["state"], event["run_id"]) == (
+                "FAKE00001", RUN_QUEUED, result["run_ids"]["FAKE00001"])
+            await events.aclose()
+        finally:
+            await agent.stop()
+    _run(scenario)
+
+def test_post_runs_with_a_repeated_serial():
+    async def scenario():
+        agent = await Agent(2, 0).start()
+        client = AgentClient("127.0.0.1", agent.port, timeout=5)
+        try:
+            result = await client.request("POST", "/runs", {"script": SCRIPT,
+                                                            "devices": ["FAKE00001", "FAKE00000", "FAKE00001"]})
+            assert result["queued"] == ["FAKE00001", "FAKE00000"]
+            assert set(result["run_ids"]) == {"FAKE00001", "FAKE00000"} and result["skipped"] == {}
+            assert agent.core.scheduler.queue_depth == 2
+        finally:
+            await agent.stop()
+    _run(scenario)
+
+def test_probe_event_updates_inventory():
+    async def scenario():
+        agent = await Agent(2, 0).start()
+        coordinator = await Coordinator([f"a=127.0.0.1:{agent.port}"]).start()
+        events = []
+        coordinator.subscribe(events.append)
+        try:
+            info = await agent.core.prober.probe("FAKE00001", force=True)
+            await _wait_until(lambda: any(e["type"] == "probe" for e in events))
+            device = coordinator.nodes["a"].devices["FAKE00001"]
+            assert info.model and (device["info"]["model"], device["info"]["battery"]) == (info.model, info.battery)
+            assert device["info"]["probed_at"] is not None
+        finally:
+            await coordinator.shutdown()
+            await agent.stop()
+    _run(scenario)
@@ -0,0 +1,188 @@
+# tests/test_device_discovery.py
+"""
+AdbClient and DeviceDiscovery against the fake ADB server on loopback.
+"""
+import asyncio
+import time
+
+import pytest
+
+import src.device_discovery
+from benchmarks.fake_adb import FakeAdbServer, ADB_SERVER_VERSION
+from src.adb_client import AdbClient, AdbError, encode_request, read_payload, read_status
+from src.device_discovery import DeviceDiscovery
+from src.device_model import DeviceModel, STATE_ONLINE, STATE_UNAUTHORIZED
+
+STATE_OFFLINE = "offline"
+
+def _run(scenario):
+    asyncio.run(asyncio.wait_for(scenario(), 30))
+
+async def _wait_until(condition, timeout=10):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met in time")
+
+@pytest.fixture(autouse=True)
+def no_real_adb(monkeypatch):
+    """Discovery must never start a real ADB server from the tests; counts the attempts instead."""
+    attempts = []
+    async def start_adb_server():
+        attempts.append(time.monotonic())
+        return False
+    monkeypatch.setattr(src.device_discovery, "start_adb_server", start_adb_server)
+    return attempts
+
+def test_framing():
+    assert encode_request("host:version") == b"000chost:version"
+    assert encode_request("") == b"0000"
+
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"OKAY" + encode_request("a\tdevice\n") + b"FAIL" + encode_request("no such device"))
+        reader.feed_data(b"WHAT")
+        reader.feed_eof()
+        await read_status(reader)
+        assert await read_payload(reader) == "a\tdevice\n"
+        with pytest.raises(AdbError, match="no such device"):
+            await read_status(reader)
+        with pytest.raises(AdbError, match="Unexpected"):
+            await read_status(reader)
+    _run(scenario)
+
+def test_client_queries():
+    async def scenario():
+        async with FakeAdbServer(shell_handler=lambda serial, command: f"{serial}:{command}",
+                                 exec_handler=lambda serial, command: b"\x89PNG" + serial.encode()) as server:
+            server.devices = {"A": STATE_ONLINE, "B": STATE_UNAUTHORIZED}
+            server.details["A"] = "usb:1-1.2 product:p model:Pixel_5 transport_id:3"
+            client = AdbClient(port=server.port)
+            assert await client.version() == ADB_SERVER_VERSION
+            assert await client.devices() == {"A": STATE_ONLINE, "B": STATE_UNAUTHORIZED}
+            devices, details = await client.devices(long=True)
+            assert devices == {"A": STATE_ONLINE, "B": STATE_UNAUTHORIZED}
+            assert details["A"] == {"usb": "1-1.2", "product": "p", "model": "Pixel_5", "transport_id": "3"}
+            assert details["B"] == {}
+            assert await client.shell("A", "getprop ro.serialno") == "A:getprop ro.serialno"
+            assert await client.exec_out("A", "screencap -p") == b"\x89PNGA"
+            # The server answers FAIL for devices it cannot switch to.
+            with pytest.raises(AdbError, match="unauthorized"):
+                await client.shell("B", "true")
+            with pytest.raises(AdbError, match="not found"):
+                await client.shell("C", "true")
+            assert server.requests[:3] == ["host:version", "host:devices", "host:devices-l"]
+    _run(scenario)
+
+def test_track_devices_yields_every_change():
+    async def scenario():
+        async with FakeAdbServer() as server:
+            server.devices["A"] = STATE_ONLINE
+            stream = AdbClient(port=server.port).track_devices()
+            assert await stream.__anext__() == {"A": STATE_ONLINE}
+            server.set_device("B", STATE_UNAUTHORIZED)
+            assert await stream.__anext__() == {"A": STATE_ONLINE, "B": STATE_UNAUTHORIZED}
+            server.remove_device("A")
+            assert await stream.__anext__() == {"B": STATE_UNAUTHORIZED}
+            await stream.aclose()
+    _run(scenario)
+
+def test_discovery_applies_transitions():
+    async def scenario():
+        async with FakeAdbServer() as server:
+            server.devices["A"] = STATE_ONLINE
+            server.details["A"] = "usb:1-1.1 model:Pixel_5"
+            model, updates = DeviceModel(), []
+            discovery = DeviceDiscovery(model, AdbClient(port=server.port),
+                                        on_update=lambda *diff: updates.append(diff))
+            discovery.start()
+            try:
+                await _wait_until(lambda: updates)
+                assert discovery.connected
+                assert updates == [(["A"], [], [])]
+                assert model.details["A"] == {"usb": "1-1.1", "model": "Pixel_5"}
+
+                # Attached, but the debugging prompt is not accepted yet; then accepted.
+                server.set_device("B", STATE_UNAUTHORIZED)
+                await _wait_until(lambda: len(updates) == 2)
+                assert updates[1] == (["B"], [], []) and model.get("B") == STATE_UNAUTHORIZED
+                server.set_device("B", STATE_ONLINE)
+                await _wait_until(lambda: len(updates) == 3)
+                assert updates[2] == ([], [], ["B"]) and model.get("B") == STATE_ONLINE
+
+                # Offline and back, then unplugged.
+                server.set_device("A", STATE_OFFLINE)
+                await _wait_until(lambda: len(updates) == 4)
+                assert updates[3] == ([], [], ["A"]) and model.get("A") == STATE_OFFLINE
+                server.set_device("A", STATE_ONLINE)
+                server.remove_device("B")
+                await _wait_until(lambda: len(updates) == 6)
+                assert updates[4:] == [([], [], ["A"]), ([], ["B"], [])]
+                assert model.devices == {"A": STATE_ONLINE}
+
+                # A list with nothing new is not reported.
+                server.set_device("A", STATE_ONLINE)
+                await asyncio.sleep(0.1)
+                assert len(updates) == 6
+            finally:
+                await discovery.stop()
+            assert not discovery.connected
+    _run(scenario)
+
+def test_discovery_reconnects_after_server_restart(no_real_adb):
+    async def scenario():
+        server = await FakeAdbServer().start()
+        port = server.port
+        server.set_device("A")
+        server.set_device("B")
+        model = DeviceModel()
+        discovery = DeviceDiscovery(model, AdbClient(port=port), retry_delay=0.05, max_retry_delay=0.2)
+        discovery.start()
+        try:
+            await _wait_until(lambda: len(model) == 2)
+            await server.stop()
+            await _wait_until(lambda: not discovery.connected)
+            # The devices stay known while the server is away.
+            assert len(model) == 2
+            # Refused: it tries to start the ADB server once, not on every retry.
+            await _wait_until(lambda: no_real_adb)
+            await asyncio.sleep(0.5)
+            assert len(no_real_adb) == 1
+
+            # Back on the same port; B went away in the meantime and C arrived.
+            server = FakeAdbServer(port=port)
+            server.devices = {"A": STATE_ONLINE, "C": STATE_UNAUTHORIZED}
+            await server.start()
+            await _wait_until(lambda: discovery.connected and "C" in model)
+            assert model.devices == {"A": STATE_ONLINE, "C": STATE_UNAUTHORIZED}
+        finally:
+            await discovery.stop()
+            await server.stop()
+    _run(scenario)
+
+class RefusingClient:
+    """AdbClient whose server is never there; notes when each connect was tried."""
+    def __init__(self):
+        self.attempts = []
+
+    async def track_devices(self, long=False):
+        self.attempts.append(time.monotonic())
+        raise ConnectionRefusedError("refused")
+        yield  # an async generator, like AdbClient.track_devices
+
+def test_discovery_backs_off():
+    async def scenario():
+        client = RefusingClient()
+        discovery = DeviceDiscovery(DeviceModel(), client, retry_delay=0.05, max_retry_delay=0.2)
+        discovery.start()
+        try:
+            await _wait_until(lambda: len(client.attempts) >= 6, timeout=5)
+        finally:
+            await discovery.stop()
+        gaps = [b - a for a, b in zip(client.attempts, client.attempts[1:])]
+        # The delay doubles after every failed attempt, up to the cap.
+        expected = [0.05, 0.1, 0.2, 0.2, 0.2]
+        for gap, delay in zip(gaps, expected):
+            assert delay * 0.9 <= gap < delay + 0.15
+    _run(scenario)
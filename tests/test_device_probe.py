@@ -0,0 +1,21 @@
+# tests/test_device_probe.py
+import asyncio
+import time
+
+from benchmarks.fleet import FakeFleet
+from src.adb_client import AdbClient
+from src.device_probe import DeviceInfo, DeviceProber
+
+def test_to_dict_reports_wall_clock_probe_time():
+    async def scenario():
+        fleet = await FakeFleet(1).start()
+        try:
+            before = time.time()
+            info = await DeviceProber(AdbClient(port=fleet.port)).probe("FAKE00000")
+            data = info.to_dict()
+            assert before - 0.01 <= data["probed_at"] <= time.time() + 0.01
+            assert data["model"] == info.model and data["error"] is None
+        finally:
+            await fleet.stop()
+    asyncio.run(scenario())
+    assert DeviceInfo().to_dict()["probed_at"] is None
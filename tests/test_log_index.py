@@ -0,0 +1,38 @@
+# tests/test_log_index.py
+import asyncio
+
+import pytest
+
+from src.batched_sqlite import BatchedSqlite
+from src.log_index import LogIndex
+
+def test_flush_queued_leaves_later_lines_to_the_flusher(tmp_path):
+    async def scenario():
+        index = LogIndex(str(tmp_path / "log_index.db"), flush_interval=60)
+        try:
+            for i in range(100):
+                index.add("A", "search_user.py", 0.0, "out", f"needle {i}")
+            flushing = asyncio.ensure_future(index.flush_queued())
+            await asyncio.sleep(0)  # its batch is on the writer thread now
+            for i in range(50):
+                index.add("B", "search_user.py", 0.0, "out", f"later {i}")
+            await flushing
+            assert (index.written, index.pending) == (100, 50)
+            result = await asyncio.to_thread(index.search, "needle", 200)
+            assert len(result["lines"]) == 100 and result["devices"] == [{"serial": "A", "matches": 100}]
+            assert (await asyncio.to_thread(index.search, "later"))["lines"] == []
+
+            await index.flush()
+            assert (index.written, index.pending) == (150, 0)
+            # Nothing queued since: returns without writing.
+            await index.flush_queued()
+            assert index.written == 150
+        finally:
+            await index.close()
+    asyncio.run(scenario())
+
+def test_batched_sqlite_needs_write_batch(tmp_path):
+    class NoWriter(BatchedSqlite):
+        pass
+    with pytest.raises(TypeError):
+        NoWriter(str(tmp_path / "x.db"), "")
@@ -0,0 +1,71 @@
+# tests/test_run_log.py
+import os
+
+from src.run_log import SegmentSpill
+
+def _read_span(span, spill):
+    """The text between the two positions of `span`, read across the segments in order."""
+    first_path, start, last_path, end = span
+    paths = [spill._segment_path(index) for index in range(spill.keep - 1, -1, -1)]
+    paths = paths[paths.index(first_path):]
+    text = b""
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        text += data[start if path == first_path else 0:end if path == last_path else None]
+    return text.decode()
+
+def test_span_within_one_segment(tmp_path):
+    spill = SegmentSpill(str(tmp_path), "dev")
+    spill.write("before\n")
+    mark = spill.mark()
+    spill.write("one\ntwo\n")
+    span = spill.span(mark)
+    spill.close()
+    assert span == (spill.path, 7, spill.path, 15)
+    assert _read_span(span, spill) == "one\ntwo\n"
+
+def test_span_across_rotations(tmp_path):
+    spill = SegmentSpill(str(tmp_path), "dev", segment_bytes=100, keep=5)
+    spill.write("x" * 60 + "\n")
+    mark = spill.mark()
+    lines = [f"line {i:03d} " + "y" * 20 + "\n" for i in range(10)]
+    for line in lines:
+        spill.write(line)
+    span = spill.span(mark)
+    spill.close()
+    assert spill.rotations == 2
+    assert span[0] == os.path.join(str(tmp_path), "dev.2.log") and span[1] == 61
+    assert span[2] == spill.path
+    assert _read_span(span, spill) == "".join(lines)
+
+def test_span_whose_start_was_deleted(tmp_path):
+    spill = SegmentSpill(str(tmp_path), "dev", segment_bytes=10, keep=2)
+    mark = spill.mark()
+    for i in range(5):
+        spill.write(f"line {i:05d}\n")
+    span = spill.span(mark)
+    spill.close()
+    # Only the newest two segments are left; the span starts at the older one.
+    assert span[:2] == (os.path.join(str(tmp_path), "dev.1.log"), 0)
+    assert _read_span(span, spill) == "line 00003\nline 00004\n"
+
+def test_new_instance_appends_to_the_current_segment(tmp_path):
+    spill = SegmentSpill(str(tmp_path), "dev")
+    spill.write("first run\n")
+    spill.close()
+    spill = SegmentSpill(str(tmp_path), "dev")
+    mark = spill.mark()
+    spill.write("second run\n")
+    assert spill.span(mark) == (spill.path, 10, spill.path, 21)
+    spill.close()
+
+def test_segments_are_sized_in_bytes(tmp_path):
+    spill = SegmentSpill(str(tmp_path), "dev", segment_bytes=100, keep=10)
+    line = "é" * 30 + "\n"  # 31 characters, 61 bytes
+    for _ in range(6):
+        spill.write(line)
+    spill.close()
+    # A segment is rotated once it holds segment_bytes, so it ends at most one line past it.
+    sizes = [os.path.getsize(spill._segment_path(index)) for index in range(spill.rotations + 1)]
+    assert sizes == [122, 122, 122]
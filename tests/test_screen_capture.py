@@ -0,0 +1,33 @@
+# tests/test_screen_capture.py
+import asyncio
+import time
+
+import pytest
+
+from src.screen_capture import PERIODS_S, ScreenCapturer
+
+class FailingAdb:
+    """exec_out raises `error` every time."""
+    def __init__(self, error):
+        self.error = error
+
+    async def exec_out(self, serial, command):
+        raise self.error
+
+@pytest.mark.parametrize("error", [asyncio.IncompleteReadError(b"", 4), RuntimeError("bug")])
+def test_failed_capture_gives_its_slot_back(error):
+    async def scenario():
+        capturer = ScreenCapturer(FailingAdb(error), on_frame=lambda serial, image: None)
+        try:
+            capturer.track("A", "t")
+            now = time.monotonic()
+            capturer._launch_due(now)
+            assert capturer._in_flight == 1
+            await asyncio.gather(*capturer._captures)
+            state = capturer.screens["A"]
+            assert (capturer._in_flight, state.in_flight, capturer._busy_transports) == (0, False, set())
+            assert capturer.failed == 1
+            assert state.due_at > now + PERIODS_S[0]  # backed off
+        finally:
+            await capturer.close()
+    asyncio.run(scenario())
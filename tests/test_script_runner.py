@@ -0,0 +1,35 @@
+# tests/test_script_runner.py
+import importlib.util
+import marshal
+import sys
+
+import pytest
+
+from src.script_runner import run_script
+
+SCRIPT = """
+import dataclasses
+import sys
+
+@dataclasses.dataclass
+class Result:
+    device_id: str
+
+def main(device_id):
+    print(Result(device_id), sys.modules[__name__] is sys.modules["job"])
+"""
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_script_module_is_registered(tmp_path, capsys, monkeypatch, cached):
+    script = tmp_path / "job.py"
+    script.write_text(SCRIPT)
+    code_path = None
+    if cached:
+        code_path = tmp_path / "job.pyc"
+        code_path.write_bytes(importlib.util.MAGIC_NUMBER + marshal.dumps(compile(SCRIPT, str(script), "exec")))
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    try:
+        run_script(str(script), "A", code_path=code_path and str(code_path))
+    finally:
+        sys.modules.pop("job", None)
+    assert capsys.readouterr().out == "Result(device_id='A') True\n"
@@ -0,0 +1,54 @@
+# tests/test_session_broker.py
+import asyncio
+import threading
+import time
+
+from src.session_broker import SessionBroker
+
+class SlowConnect:
+    """Blocking connect that takes `delays[serial]` seconds; notes when each ran and how many ran at once."""
+    def __init__(self, delays):
+        self.delays = delays
+        self.spans = {}
+        self.active = self.most_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, serial):
+        with self._lock:
+            self.active += 1
+            self.most_active = max(self.most_active, self.active)
+        started = time.monotonic()
+        time.sleep(self.delays[serial])
+        with self._lock:
+            self.active -= 1
+        self.spans[serial] = (started, time.monotonic())
+        return object()
+
+def test_timeout_starts_when_a_thread_is_free():
+    async def scenario():
+        connect = SlowConnect({"stuck": 0.6, "A": 0.2})
+        broker = SessionBroker(connect=connect, connect_timeout=0.4, max_workers=1)
+        try:
+            stuck = asyncio.ensure_future(broker.ensure("stuck"))
+            await asyncio.sleep(0.05)
+            # Waits for the one thread longer than the timeout, but connects in time once it has it.
+            assert await broker.ensure("A")
+            assert not await stuck
+            # The timed-out connect kept its thread; A only started after it returned.
+            assert connect.spans["A"][0] >= connect.spans["stuck"][1]
+        finally:
+            await broker.shutdown()
+    asyncio.run(scenario())
+
+def test_connects_are_limited_to_max_workers():
+    async def scenario():
+        serials = [f"D{i}" for i in range(6)]
+        connect = SlowConnect(dict.fromkeys(serials, 0.05))
+        broker = SessionBroker(connect=connect, max_workers=2)
+        try:
+            assert all(await asyncio.gather(*(broker.ensure(serial) for serial in serials)))
+            assert connect.most_active == 2
+            assert all(broker.is_healthy(serial) for serial in serials)
+        finally:
+            await broker.shutdown()
+    asyncio.run(scenario())
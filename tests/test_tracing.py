@@ -0,0 +1,69 @@
+# tests/test_tracing.py
+import io
+import json
+import signal
+import sys
+import time
+
+import pytest
+
+import src.script_runner
+from src.tracing import TRACE_ENV, Tracer, trace_enabled
+
+SCRIPT = """
+def main(device_id):
+    print("ran on", device_id)
+"""
+
+@pytest.mark.parametrize("value, enabled", [(None, False), ("", False), ("0", False), ("1", True), ("/tmp/t", True)])
+def test_trace_enabled(monkeypatch, value, enabled):
+    if value is None:
+        monkeypatch.delenv(TRACE_ENV, raising=False)
+    else:
+        monkeypatch.setenv(TRACE_ENV, value)
+    assert trace_enabled() is enabled
+    assert Tracer.from_env("traces").enabled is enabled
+
+def _serve_one_job(monkeypatch, tmp_path):
+    """Runs serve_worker() on one job in this process; returns its stdout lines."""
+    script = tmp_path / "job.py"
+    script.write_text(SCRIPT)
+    job = {"script": str(script), "device_id": "A", "params": None, "env": {}, "spawned_us": 0}
+    out = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+    monkeypatch.setattr(sys, "stdin", io.StringIO(json.dumps(job) + "\n"))
+    monkeypatch.setattr(sys, "stdout", out)
+    monkeypatch.setattr(sys, "argv", list(sys.argv))
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    monkeypatch.setattr(src.script_runner, "prewarm", lambda: None)
+    # Undone after the test if the worker instruments them.
+    monkeypatch.setattr(time, "sleep", time.sleep)
+    handlers = {name: signal.getsignal(getattr(signal, name)) for name in ("SIGTERM",)}
+    try:
+        assert src.script_runner.serve_worker() == 0
+    finally:
+        for name, handler in handlers.items():
+            signal.signal(getattr(signal, name), handler)
+        sys.modules.pop("job", None)
+    out.flush()
+    # Not splitlines(): the event prefix \x1e counts as a line break there.
+    return out.buffer.getvalue().decode().split("\n")[:-1]
+
+def test_worker_with_tracing_off_does_not_instrument(monkeypatch, tmp_path):
+    monkeypatch.setenv(TRACE_ENV, "0")
+    sleep = time.sleep
+    lines = _serve_one_job(monkeypatch, tmp_path)
+    assert lines == ["ran on A"]
+    assert time.sleep is sleep
+
+def test_worker_with_tracing_on_sends_spans(monkeypatch, tmp_path):
+    monkeypatch.setenv(TRACE_ENV, "1")
+    uiautomator2 = pytest.importorskip("uiautomator2")
+    from uiautomator2._selector import UiObject
+    monkeypatch.setattr(uiautomator2, "connect", uiautomator2.connect)
+    monkeypatch.setattr(UiObject, "wait", UiObject.wait)
+    sleep = time.sleep
+    lines = _serve_one_job(monkeypatch, tmp_path)
+    spans = [json.loads(line[1:])["name"] for line in lines if line.startswith("\x1e")]
+    assert spans == ["startup", "prewarm", "idle in pool", "load script", "main()"]
+    assert "ran on A" in lines
+    assert time.sleep is not sleep
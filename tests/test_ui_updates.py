@@ -0,0 +1,30 @@
+# tests/test_ui_updates.py
+import asyncio
+
+from src.ui_updates import UpdatePump
+
+class RecordingPage:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, *controls):
+        self.updates.append(controls)
+
+class Control:
+    """Stands in for a control that is on `page`."""
+    def __init__(self, page):
+        self.page = page
+
+def test_stop_flushes_and_drops_later_updates():
+    async def scenario():
+        page = RecordingPage()
+        pump = UpdatePump(page, rate_hz=1000)
+        text = Control(page)
+        pump.mark_dirty(text)
+        pump.stop()
+        assert page.updates == [(text,)]
+        await asyncio.sleep(0.01)  # the flush task has ended
+        pump.mark_dirty(text)
+        await asyncio.sleep(0.01)
+        assert page.updates == [(text,)] and pump._task.done()
+    asyncio.run(scenario())